@@ -1,218 +1,271 @@
 # app/api/chat.py
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 import time
-import uuid
+from typing import Optional
 from app.models.chat import (
-    ChatRequest, ChatResponse, 
+    ChatRequest, ChatResponse,
     ConversationCreate, ConversationResponse, ConversationUpdate,
     MessageCreate, MessageResponse,
     ConversationListResponse, MessageListResponse
 )
-from app.services import llm_service
+from app.services import llm_service, sql_service, usage_service
+from app.utils.db_utils import connection_label
 from app.utils.prompt_builder import build_chat_prompt
-from app.utils.colors import Colors as C
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger
+
+# The stores pull in SQLAlchemy; load them on first use, not at startup
+chat_store = lazy_import("app.services.chat_store")
+summary_service = lazy_import("app.services.summary_service")
+connection_store = lazy_import("app.services.connection_store")
 
 router = APIRouter(tags=["chat"])
+log = get_logger("api")
+
+def get_user_id(request: Request) -> str:
+    """User the request acts for; 'anonymous' until auth sets request.state.user_id"""
+    return request.state.user_id if hasattr(request.state, "user_id") else "anonymous"
+
+async def registered_connection(connection_id: str, user_id: str) -> dict:
+    """Decrypted config of a registered connection; 404 if it is unknown or belongs to another user"""
+    db_config = await run_in_threadpool(connection_store.get_connection_store().get_config, connection_id, user_id)
+    if db_config is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return db_config
+
+async def open_conversation(store, conversation_id: Optional[str], user_id: str, title: str) -> tuple:
+    """(conversation, summary, history): the stored context of a conversation, or a new one; 404 if unknown"""
+    if conversation_id is None:
+        conversation = await run_in_threadpool(store.create_conversation, user_id, title=title)
+        usage_service.annotate(conversation_id=conversation["id"])
+        return conversation, None, []
+    conversation = await run_in_threadpool(store.get_conversation, conversation_id, user_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    usage_service.annotate(conversation_id=conversation_id)
+    summary, history = await run_in_threadpool(summary_service.conversation_context, conversation_id)
+    return conversation, summary, history
+
+async def chat_db_config(req: ChatRequest, conversation: dict, user_id: str) -> Optional[dict]:
+    """The database a chat turn talks about; an inline connection wins over a registered one,
+    and the conversation's connection is the default"""
+    if req.db_connection is not None:
+        db_config = req.db_connection.dict()
+        usage_service.annotate(connection=connection_label(db_config))
+        return db_config
+    connection_id = req.connection_id or conversation.get("db_connection_id")
+    if connection_id:
+        db_config = await registered_connection(connection_id, user_id)
+        usage_service.annotate(connection=connection_id)
+        return db_config
+    return None
+
+def chat_llm_config(req: ChatRequest) -> tuple:
+    """(provider, model, url) for a chat turn, defaulting to the local Ollama model"""
+    llm_config = req.llm_config.dict() if req.llm_config else {}
+    return (
+        llm_config.get("provider") or "ollama",
+        llm_config.get("model") or "llama3.2",
+        llm_config.get("url") or "http://localhost:11434/api/generate",
+    )
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(request: Request, req: ChatRequest):
     """Send a chat message and get a response"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} Chat request received: '{req.message[:50]}...'")
+    log.info(f"Chat request received: '{req.message[:50]}...'")
     start_time = time.time()
-    
+    store = chat_store.get_chat_store()
+    user_id = get_user_id(request)
+
     try:
-        # Determine if this is a new or existing conversation
-        conversation_id = req.conversation_id
-        is_new_conversation = conversation_id is None
-        
-        # TODO: If using Supabase, you'll interact with it here
-        # For now, let's just generate a response from the LLM
-        
-        # Build the prompt for the LLM
-        # This will need to include context from previous messages
-        # if it's an existing conversation
+        # Load (or create) the conversation; history comes from the store, not the request
+        conversation, summary, history = await open_conversation(store, req.conversation_id, user_id, req.message[:80])
+        conversation_id = conversation["id"]
+
+        schema_str = ""
+        db_config = await chat_db_config(req, conversation, user_id)
+        if db_config is not None:
+            schema_str, _ = await run_in_threadpool(sql_service.get_schema, db_config)
+
+        # Build the prompt for the LLM with the stored conversation context
         prompt = build_chat_prompt(
-            user_message=req.message,
-            conversation_id=conversation_id,
-            db_connection=req.db_connection
+            user_prompt=req.message,
+            schema=schema_str,
+            conversation_history=history,
+            summary=summary
         )
-        
+
         # Generate response using LLM service
-        llm_config = req.llm_config or {
-            "provider": "ollama",
-            "model": "llama3.2",
-            "url": "http://localhost:11434/api/generate"
-        }
-        
-        # Call LLM service
+        provider, model, url = chat_llm_config(req)
         response = await llm_service.generate_chat_response(
-            provider=llm_config.get("provider", "ollama"),
-            model=llm_config.get("model", "llama3.2"),
-            url=llm_config.get("url", "http://localhost:11434/api/generate"),
+            provider=provider,
+            model=model,
+            url=url,
             prompt=prompt
         )
-        
+
         # Extract SQL if any was generated
         sql = None
         result = None
         if "sql" in response:
             sql = response["sql"]
             # Here you would execute the SQL if needed
-        
+
         process_time = time.time() - start_time
-        print(f"{C.API}[API:{request_id}]{C.RESET} Chat response generated in {process_time:.2f}s")
-        
-        # For this mock implementation, we'll return a simulated response
-        # In a real implementation, you'd store the conversation and messages in Supabase
-        
-        if is_new_conversation:
-            conversation_id = str(uuid.uuid4())
-        
+        log.info(f"Chat response generated in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
+
+        # Persist both sides of the turn; writes are batched off the request path
+        store.append_message(conversation_id, "user", req.message)
+        message = store.append_message(
+            conversation_id, "assistant",
+            response.get("content", "I'm sorry, I couldn't process your request."),
+            sql=sql,
+            tokens_used=response.get("tokens_used", 0),
+            metadata={"usage": response["usage"]} if response.get("usage") else None
+        )
+        summary_service.schedule_summary(conversation_id)
+
         return ChatResponse(
             conversation_id=conversation_id,
-            message=MessageResponse(
-                id=str(uuid.uuid4()),
-                conversation_id=conversation_id,
-                role="assistant",
-                content=response.get("content", "I'm sorry, I couldn't process your request."),
-                created_at=time.time(),
-                sql=sql,
-                result=result,
-                tokens_used=response.get("tokens_used", 0)
-            ),
+            message=MessageResponse(**message, result=result),
             sql=sql,
             result=result
         )
-    
+
+    except HTTPException:
+        raise
     except Exception as e:
         process_time = time.time() - start_time
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} Chat request failed after {process_time:.2f}s: {str(e)}")
+        log.error(f"Chat request failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/conversations", response_model=ConversationResponse)
 async def create_conversation(request: Request, req: ConversationCreate):
     """Create a new conversation"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} Create conversation request")
-    
+    log.info("Create conversation request")
+    if req.db_connection_id:
+        await registered_connection(req.db_connection_id, get_user_id(request))
+
     try:
-        # TODO: In a real implementation, you'd create a conversation in Supabase
-        # For now, we'll just return a mock response
-        
-        conversation_id = str(uuid.uuid4())
-        return ConversationResponse(
-            id=conversation_id,
-            user_id=request.state.user_id if hasattr(request.state, "user_id") else "anonymous",
+        conversation = await run_in_threadpool(
+            chat_store.get_chat_store().create_conversation,
+            get_user_id(request),
             title=req.title or "New Conversation",
-            created_at=time.time(),
-            updated_at=time.time(),
             model_type=req.model_type,
-            model_config=req.model_config or {},
+            model_settings=req.model_settings or {},
             db_connection_id=req.db_connection_id,
             metadata=req.metadata or {}
         )
-    
+        return ConversationResponse(**conversation)
+
     except Exception as e:
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} Create conversation failed: {str(e)}")
+        log.error(f"Create conversation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/conversations", response_model=ConversationListResponse)
-async def list_conversations(request: Request):
-    """List all conversations for the current user"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} List conversations request")
-    
+async def list_conversations(request: Request, limit: int = 50, cursor: Optional[str] = None):
+    """List conversations for the current user, most recently updated first"""
+    log.info("List conversations request")
+
     try:
-        # TODO: In a real implementation, you'd fetch conversations from Supabase
-        # For now, we'll just return an empty list
-        
-        return ConversationListResponse(conversations=[])
-    
+        conversations, next_cursor = await run_in_threadpool(
+            chat_store.get_chat_store().list_conversations, get_user_id(request), min(max(limit, 1), 200), cursor
+        )
+        return ConversationListResponse(
+            conversations=[ConversationResponse(**c) for c in conversations],
+            next_cursor=next_cursor
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} List conversations failed: {str(e)}")
+        log.error(f"List conversations failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/conversations/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(request: Request, conversation_id: str):
     """Get a specific conversation"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} Get conversation request: {conversation_id}")
-    
-    try:
-        # TODO: In a real implementation, you'd fetch the conversation from Supabase
-        # For now, we'll just return a mock response
-        
-        return ConversationResponse(
-            id=conversation_id,
-            user_id=request.state.user_id if hasattr(request.state, "user_id") else "anonymous",
-            title="Mock Conversation",
-            created_at=time.time(),
-            updated_at=time.time(),
-            model_type="ollama",
-            model_config={},
-            db_connection_id=None,
-            metadata={}
-        )
-    
-    except Exception as e:
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} Get conversation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    log.info(f"Get conversation request: {conversation_id}")
+
+    conversation = await run_in_threadpool(chat_store.get_chat_store().get_conversation, conversation_id, get_user_id(request))
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return ConversationResponse(**conversation)
 
 @router.put("/conversations/{conversation_id}", response_model=ConversationResponse)
 async def update_conversation(request: Request, conversation_id: str, req: ConversationUpdate):
     """Update a conversation"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} Update conversation request: {conversation_id}")
-    
+    log.info(f"Update conversation request: {conversation_id}")
+
     try:
-        # TODO: In a real implementation, you'd update the conversation in Supabase
-        # For now, we'll just return a mock response
-        
-        return ConversationResponse(
-            id=conversation_id,
-            user_id=request.state.user_id if hasattr(request.state, "user_id") else "anonymous",
-            title=req.title or "Updated Conversation",
-            created_at=time.time(),
-            updated_at=time.time(),
-            model_type=req.model_type or "ollama",
-            model_config=req.model_config or {},
-            db_connection_id=None,
-            metadata=req.metadata or {}
+        conversation = await run_in_threadpool(
+            chat_store.get_chat_store().update_conversation,
+            conversation_id,
+            get_user_id(request),
+            title=req.title,
+            model_type=req.model_type,
+            model_settings=req.model_settings,
+            metadata=req.metadata
         )
-    
     except Exception as e:
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} Update conversation failed: {str(e)}")
+        log.error(f"Update conversation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return ConversationResponse(**conversation)
+
 @router.delete("/conversations/{conversation_id}")
 async def delete_conversation(request: Request, conversation_id: str):
     """Delete a conversation"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} Delete conversation request: {conversation_id}")
-    
+    log.info(f"Delete conversation request: {conversation_id}")
+
     try:
-        # TODO: In a real implementation, you'd delete the conversation from Supabase
-        # For now, we'll just return a success response
-        
-        return {"success": True}
-    
+        deleted = await run_in_threadpool(chat_store.get_chat_store().delete_conversation, conversation_id, get_user_id(request))
     except Exception as e:
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} Delete conversation failed: {str(e)}")
+        log.error(f"Delete conversation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"success": True}
+
 @router.get("/conversations/{conversation_id}/messages", response_model=MessageListResponse)
-async def list_messages(request: Request, conversation_id: str):
-    """List all messages for a conversation"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"{C.API}[API:{request_id}]{C.RESET} List messages request for conversation: {conversation_id}")
-    
+async def list_messages(request: Request, conversation_id: str, limit: int = 100, cursor: Optional[str] = None):
+    """List messages for a conversation, oldest first"""
+    log.info(f"List messages request for conversation: {conversation_id}")
+    store = chat_store.get_chat_store()
+
+    conversation = await run_in_threadpool(store.get_conversation, conversation_id, get_user_id(request))
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
     try:
-        # TODO: In a real implementation, you'd fetch messages from Supabase
-        # For now, we'll just return an empty list
-        
-        return MessageListResponse(messages=[])
-    
+        messages, next_cursor = await run_in_threadpool(
+            store.list_messages, conversation_id, min(max(limit, 1), 500), cursor
+        )
+        return MessageListResponse(messages=[MessageResponse(**m) for m in messages], next_cursor=next_cursor)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"{C.ERROR}[ERROR:{request_id}]{C.RESET} List messages failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        log.error(f"List messages failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/conversations/{conversation_id}/messages", response_model=MessageResponse)
+async def create_message(request: Request, conversation_id: str, req: MessageCreate):
+    """Append a message to a conversation"""
+    log.info(f"Create message request for conversation: {conversation_id}")
+    store = chat_store.get_chat_store()
+
+    conversation = await run_in_threadpool(store.get_conversation, conversation_id, get_user_id(request))
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    message = store.append_message(
+        conversation_id, req.role, req.content,
+        sql=req.sql, tokens_used=req.tokens_used, metadata=req.metadata
+    )
+    summary_service.schedule_summary(conversation_id)
+    return MessageResponse(**message)
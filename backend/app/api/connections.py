@@ -0,0 +1,110 @@
+# app/api/connections.py
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from app.api.chat import get_user_id, registered_connection
+from app.models.db import ConnectionCreate, ConnectionResponse, DbConnectionRequest
+from app.services import sql_service, usage_service
+from app.utils.db_utils import connection_label
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger
+
+# The store pulls in SQLAlchemy and cryptography; load it on first use, not at startup
+connection_store = lazy_import("app.services.connection_store")
+
+router = APIRouter(tags=["connections"])
+log = get_logger("api")
+
+async def resolve_db_config(request: Request, db_connection: Optional[DbConnectionRequest], connection_id: Optional[str]) -> dict:
+    """The connection config for a request: the registered connection_id if given, else the inline db_connection"""
+    if connection_id:
+        db_config = await registered_connection(connection_id, get_user_id(request))
+        usage_service.annotate(connection=connection_id)
+        return db_config
+    if db_connection is None:
+        raise HTTPException(status_code=400, detail="Either connection_id or db_connection is required")
+    db_config = db_connection.dict()
+    usage_service.annotate(connection=connection_label(db_config))
+    return db_config
+
+def connection_config(req: ConnectionCreate) -> dict:
+    return DbConnectionRequest(**req.dict()).dict()
+
+async def check_connection(db_config: dict):
+    result = await run_in_threadpool(sql_service.test_db_connection, db_config)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+
+@router.post("/connections", response_model=ConnectionResponse)
+async def create_connection(request: Request, req: ConnectionCreate):
+    """Register a database connection and return its connection_id"""
+    log.info("Create connection request")
+    db_config = connection_config(req)
+    if req.validate_connection:
+        await check_connection(db_config)
+
+    try:
+        connection = await run_in_threadpool(
+            connection_store.get_connection_store().create, get_user_id(request), req.name, db_config
+        )
+        return ConnectionResponse(**connection)
+    except Exception as e:
+        log.error(f"Create connection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/connections", response_model=List[ConnectionResponse])
+async def list_connections(request: Request):
+    """List the current user's registered connections, oldest first"""
+    log.info("List connections request")
+
+    try:
+        connections = await run_in_threadpool(connection_store.get_connection_store().list, get_user_id(request))
+        return [ConnectionResponse(**c) for c in connections]
+    except Exception as e:
+        log.error(f"List connections failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/connections/{connection_id}", response_model=ConnectionResponse)
+async def get_connection(request: Request, connection_id: str):
+    """Get a registered connection (without its password)"""
+    log.info(f"Get connection request: {connection_id}")
+
+    connection = await run_in_threadpool(connection_store.get_connection_store().get, connection_id, get_user_id(request))
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return ConnectionResponse(**connection)
+
+@router.put("/connections/{connection_id}", response_model=ConnectionResponse)
+async def update_connection(request: Request, connection_id: str, req: ConnectionCreate):
+    """Replace a registered connection's settings; the connection_id stays the same"""
+    log.info(f"Update connection request: {connection_id}")
+    db_config = connection_config(req)
+    if req.validate_connection:
+        await check_connection(db_config)
+
+    try:
+        connection = await run_in_threadpool(
+            connection_store.get_connection_store().update, connection_id, get_user_id(request), req.name, db_config
+        )
+    except Exception as e:
+        log.error(f"Update connection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if connection is None:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return ConnectionResponse(**connection)
+
+@router.delete("/connections/{connection_id}")
+async def delete_connection(request: Request, connection_id: str):
+    """Delete a registered connection"""
+    log.info(f"Delete connection request: {connection_id}")
+
+    try:
+        deleted = await run_in_threadpool(connection_store.get_connection_store().delete, connection_id, get_user_id(request))
+    except Exception as e:
+        log.error(f"Delete connection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    return {"success": True}
@@ -0,0 +1,113 @@
+# app/api/jobs.py
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import json
+from app.api.chat import get_user_id
+from app.api.connections import resolve_db_config
+from app.config import settings
+from app.models.jobs import JobCreate, JobResponse, JobListResponse, JobResultPage
+from app.services import job_queue
+from app.utils import serialization
+from app.utils.logger import get_logger
+
+router = APIRouter(tags=["jobs"])
+log = get_logger("api")
+
+def require_jobs():
+    if not settings.JOBS_ENABLED:
+        raise HTTPException(status_code=404, detail="Jobs are disabled")
+
+@router.post("/jobs", response_model=JobResponse)
+async def submit_job(request: Request, req: JobCreate):
+    """Queue a query and return its job at once; poll /jobs/{id} or stream /jobs/{id}/events"""
+    log.info("Submit job request")
+    require_jobs()
+    db_config = await resolve_db_config(request, req.db_connection, req.connection_id)
+
+    try:
+        job = await run_in_threadpool(job_queue.submit, get_user_id(request), req.sql, db_config, req.connection_id)
+        return JobResponse(**job)
+    except job_queue.JobLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        log.error(f"Submit job failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs", response_model=JobListResponse)
+async def list_jobs(request: Request, limit: int = 50):
+    """List the current user's jobs, newest first"""
+    log.info("List jobs request")
+    require_jobs()
+
+    try:
+        jobs = await run_in_threadpool(job_queue.list_jobs, get_user_id(request), min(max(limit, 1), 200))
+        return JobListResponse(jobs=[JobResponse(**job) for job in jobs])
+    except Exception as e:
+        log.error(f"List jobs failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(request: Request, job_id: str):
+    """Get a job's status and progress (rows fetched so far)"""
+    require_jobs()
+    job = await run_in_threadpool(job_queue.get, job_id, get_user_id(request))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job)
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Stream the job as NDJSON whenever its status or progress changes, ending when it finishes"""
+    require_jobs()
+    user_id = get_user_id(request)
+    if await run_in_threadpool(job_queue.get, job_id, user_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        async for job in job_queue.watch(job_id, user_id):
+            yield json.dumps(job) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/jobs/{job_id}/result", response_model=JobResultPage)
+async def get_job_result(request: Request, job_id: str, offset: int = 0, limit: int = 1000):
+    """Read a page of a succeeded job's rows"""
+    require_jobs()
+
+    try:
+        page = await run_in_threadpool(
+            job_queue.read_page, job_id, get_user_id(request), max(offset, 0), min(max(limit, 1), 50000)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return serialization.json_response(page, request.headers.get("accept-encoding", ""))
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(request: Request, job_id: str):
+    """Cancel a queued or running job (a running statement is interrupted where the driver allows)"""
+    log.info(f"Cancel job request: {job_id}")
+    require_jobs()
+
+    job = await run_in_threadpool(job_queue.cancel, job_id, get_user_id(request))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobResponse(**job)
+
+@router.delete("/jobs/{job_id}")
+async def delete_job(request: Request, job_id: str):
+    """Cancel a job if needed and delete it and its result"""
+    log.info(f"Delete job request: {job_id}")
+    require_jobs()
+
+    try:
+        deleted = await run_in_threadpool(job_queue.delete, job_id, get_user_id(request))
+    except Exception as e:
+        log.error(f"Delete job failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"success": True}
@@ -1,41 +1,53 @@
 # app/api/llm.py
 from fastapi import APIRouter, HTTPException, Request
 import time
-import uuid
 from app.models.llm import LLMProbeRequest
-from app.services import llm_service
+from app.services import llm_service, llm_router
+from app.utils.logger import get_logger
+from app.config import settings
 
 router = APIRouter(tags=["llm"])
+log = get_logger("api")
 
 @router.get("/supported_llm_providers")
 async def supported_llm_providers(request: Request):
     """Return a list of supported LLM providers and their configuration options"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Get supported LLM providers request")
+    log.info("Get supported LLM providers request")
     
     try:
         providers = llm_service.get_supported_providers()
-        print(f"[API:{request_id}] Returned {len(providers['providers'])} providers")
+        log.info(f"Returned {len(providers['providers'])} providers")
         return providers
     except Exception as e:
-        print(f"[ERROR:{request_id}] Failed to get providers: {str(e)}")
+        log.error(f"Failed to get providers: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/probe_llm")
 async def probe_llm(request: Request, req: LLMProbeRequest):
     """Probe an LLM provider to discover available models and capabilities"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Probe LLM request for {req.provider} at {req.url}")
+    log.info(f"Probe LLM request for {req.provider} at {req.url}")
     start_time = time.time()
     
     try:
         result = await llm_service.probe_llm_provider(req.provider, req.url)
         
         process_time = time.time() - start_time
-        print(f"[API:{request_id}] LLM probe completed in {process_time:.2f}s")
+        log.info(f"LLM probe completed in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
         
         return result
     except Exception as e:
         process_time = time.time() - start_time
-        print(f"[ERROR:{request_id}] LLM probe failed after {process_time:.2f}s: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        log.error(f"LLM probe failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/llm_router_status")
+async def llm_router_status(request: Request):
+    """Return circuit state and EWMA latency/error rate for each provider/model the router has used"""
+    log.info("LLM router status request")
+    return {
+        "enabled": settings.LLM_ROUTER_ENABLED,
+        "fallback_chain": [
+            {"provider": p, "model": m, "url": u} for p, m, u in llm_router.parse_chain(settings.LLM_FALLBACK_CHAIN)
+        ],
+        "targets": llm_router.snapshot(),
+    }
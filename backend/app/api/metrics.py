@@ -0,0 +1,14 @@
+# app/api/metrics.py
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from app.config import settings
+from app.utils import metrics
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint with per-stage latency histograms and counters"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
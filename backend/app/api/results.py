@@ -0,0 +1,96 @@
+# app/api/results.py
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional
+import csv
+import io
+from app.api.chat import get_user_id
+from app.config import settings
+from app.services import job_queue, result_store
+from app.utils import serialization
+from app.utils.logger import get_logger
+
+router = APIRouter(tags=["results"])
+log = get_logger("api")
+
+class AggregateRequest(BaseModel):
+    """Chart data computed over a spilled result without loading it"""
+    group_by: str
+    value: Optional[str] = None  # Not needed for op="count"
+    op: str = "count"  # count, sum, avg, min or max
+    limit: int = 50
+
+def open_spill(result_id: str, user_id: str):
+    """A spilled /execute_sql result or a succeeded job's result; 404/409 otherwise"""
+    spill = result_store.open_result(result_id, user_id)
+    if spill is None and settings.JOBS_ENABLED:
+        try:
+            spill = job_queue.open_result(result_id, user_id)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    if spill is None:
+        raise HTTPException(status_code=404, detail="Result not found (or expired)")
+    return spill
+
+def spilled_result_chunks(result_id: str, user_id: str):
+    """The full {"columns", "rows", "result_id", "total_rows"} body of a spilled result, as byte chunks"""
+    with open_spill(result_id, user_id) as spill:
+        yield from result_store.encoded_response_chunks(
+            spill, {"result_id": result_id, "total_rows": spill.row_count}
+        )
+
+def csv_chunks(spill, rows_per_chunk: int = 1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(spill.columns)
+    for offset in range(0, spill.row_count, rows_per_chunk):
+        writer.writerows(spill.rows(offset, rows_per_chunk))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def ndjson_chunks(spill, rows_per_chunk: int = 1000):
+    for offset in range(0, spill.row_count, rows_per_chunk):
+        yield b"\n".join(spill.encoded_rows(offset, rows_per_chunk)) + b"\n"
+
+@router.get("/results/{result_id}")
+async def get_result_page(request: Request, result_id: str, offset: int = 0, limit: int = 1000):
+    """A page of a spilled result (or of a succeeded job's result)"""
+    spill = await run_in_threadpool(open_spill, result_id, get_user_id(request))
+    with spill:
+        page = await run_in_threadpool(result_store.page, spill, max(offset, 0), min(max(limit, 1), 50000))
+    return serialization.json_response(page, request.headers.get("accept-encoding", ""))
+
+@router.get("/results/{result_id}/export")
+async def export_result(request: Request, result_id: str, format: str = "csv"):
+    """Download a whole result as CSV or NDJSON, streamed from disk"""
+    log.info(f"Export result request: {result_id} ({format})")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    user_id = get_user_id(request)
+    spill = await run_in_threadpool(open_spill, result_id, user_id)
+    spill.close()  # Reopened by the stream, which may outlive this handler
+
+    def stream():
+        with open_spill(result_id, user_id) as spill:
+            yield from (csv_chunks(spill) if format == "csv" else ndjson_chunks(spill))
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{result_id}.{format}"'}
+    return serialization.streaming_response(stream(), request.headers.get("accept-encoding", ""), media_type, headers)
+
+@router.post("/results/{result_id}/aggregate")
+async def aggregate_result(request: Request, result_id: str, req: AggregateRequest):
+    """Group and aggregate a result for charting, reading only the two columns involved"""
+    log.info(f"Aggregate result request: {result_id}")
+    spill = await run_in_threadpool(open_spill, result_id, get_user_id(request))
+    with spill:
+        try:
+            return await run_in_threadpool(
+                result_store.aggregate, spill, req.group_by, req.value, req.op, min(max(req.limit, 1), 1000)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
@@ -1,75 +1,266 @@
 # app/api/sql.py
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import time
-import uuid
 import json
 import re
-from app.models.sql import GenerateSQLRequest, GenerateSQLResponse, ExecuteSQLRequest, ExecuteSQLResponse, RegenerateSQLRequest
-from app.services import sql_service, llm_service
+from app.models.sql import (
+    ChatMessage, GenerateSQLRequest, GenerateSQLResponse, ExecuteSQLRequest, ExecuteSQLResponse, RegenerateSQLRequest,
+    BatchGenerateSQLRequest, BatchSQLItem, ExplainSQLRequest, ExplainSQLResponse
+)
+from app.api.chat import get_user_id
+from app.api.connections import resolve_db_config
+from app.api import results as results_api
+from app.services import sql_service, llm_service, model_tiering, replica_router, column_profiler, usage_service
+from app.utils.db_utils import connection_fingerprint, is_read_only, split_statements, EXPLAIN_PREFIXES
+from app.config import settings
 from app.utils.prompt_builder import build_llm_prompt, build_llm_prompt_with_history, build_llm_prompt_for_regeneration
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger, truncate
+from app.utils import metrics, serialization
+
+# The stores pull in SQLAlchemy; load them on first use, not at startup
+chat_store = lazy_import("app.services.chat_store")
+summary_service = lazy_import("app.services.summary_service")
+example_store = lazy_import("app.services.example_store")
 
 router = APIRouter(tags=["sql"])
+log = get_logger("api")
+
+async def load_history(request: Request, req) -> tuple:
+    """(message history, summary) for a request: as sent, or the stored context of req.conversation_id
+
+    The conversation must belong to the caller (404 otherwise), since the turn is also appended to it.
+    """
+    if not req.conversation_id:
+        return req.message_history, None
+    conversation = await run_in_threadpool(
+        chat_store.get_chat_store().get_conversation, req.conversation_id, get_user_id(request)
+    )
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    usage_service.annotate(conversation_id=req.conversation_id)
+    if req.message_history is not None:
+        return req.message_history, None
+    with metrics.track_stage("history"):
+        summary, messages = await run_in_threadpool(summary_service.conversation_context, req.conversation_id)
+    return [ChatMessage(role=m["role"], content=m["content"]) for m in messages], summary
+
+async def load_examples(db_config: dict, questions: list) -> list:
+    """Stored few-shot examples similar to each question (best effort: [] per question on error)"""
+    if not settings.EXAMPLES_ENABLED:
+        return [None] * len(questions)
+    connection = connection_fingerprint(db_config)
+    store = example_store.get_example_store()
+    try:
+        with metrics.track_stage("examples"):
+            return await run_in_threadpool(lambda: [store.similar(connection, q) for q in questions])
+    except Exception as e:
+        log.warning(f"Few-shot example lookup failed: {str(e)}")
+        return [None] * len(questions)
+
+def load_column_hints(db_config: dict, question: str, schema_dict: dict) -> dict:
+    """Sampled column values for the tables a question is about (best effort: {} on error)"""
+    try:
+        return column_profiler.column_hints(db_config, question, schema_dict)
+    except Exception as e:
+        log.warning(f"Column hint lookup failed: {str(e)}")
+        return {}
+
+def record_example(db_config: dict, question: str, sql: str):
+    """Keep a question and the SQL that just executed for it as a future few-shot example"""
+    try:
+        example_store.get_example_store().record(connection_fingerprint(db_config), question, sql)
+    except Exception as e:
+        log.warning(f"Could not record example: {str(e)}")
+
+def record_example_failure(db_config: dict, sql: str):
+    try:
+        example_store.get_example_store().record_failure(connection_fingerprint(db_config), sql)
+    except Exception as e:
+        log.warning(f"Could not record example failure: {str(e)}")
+
+def remember_turn(conversation_id: str, user_prompt: str, sql: str):
+    """Queue the prompt and generated SQL onto the conversation (no-op without one); load_history has checked its owner"""
+    if not conversation_id:
+        return
+    store = chat_store.get_chat_store()
+    store.append_message(conversation_id, "user", user_prompt)
+    store.append_message(conversation_id, "assistant", sql, sql=sql)
+    summary_service.schedule_summary(conversation_id)
 
 @router.post("/generate_sql", response_model=GenerateSQLResponse)
 async def generate_sql(request: Request, req: GenerateSQLRequest):
     """Generate SQL from natural language"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Generate SQL request received: '{req.user_prompt[:50]}...'")
+    log.info(f"Generate SQL request received: '{req.user_prompt[:50]}...'")
     start_time = time.time()
     
+    db_config = await resolve_db_config(request, req.db_connection, req.connection_id)
     try:
         # Get database schema
-        schema_str, _ = sql_service.get_schema(req.db_connection.dict())
+        schema_str, schema_dict = sql_service.get_schema(db_config)
         
         # Create prompt with schema and message history
-        print(f"[API:{request_id}] Creating prompt with schema and history")
-        prompt = build_llm_prompt_with_history(
-            req.user_prompt, 
-            schema_str,
-            req.message_history
-        )
+        log.debug("Creating prompt with schema and history")
+        message_history, summary = await load_history(request, req)
+        examples, = await load_examples(db_config, [req.user_prompt])
+        with metrics.track_stage("prompt"):
+            prompt = build_llm_prompt_with_history(
+                req.user_prompt, 
+                schema_str,
+                message_history,
+                summary=summary,
+                examples=examples,
+                column_hints=load_column_hints(db_config, req.user_prompt, schema_dict)
+            )
+        metrics.observe_prompt(prompt)
         
         # Generate SQL
         provider = req.llm_config.provider
         model = req.llm_config.model or "llama3.2"
         url = req.llm_config.url or "http://localhost:11434/api/generate"
         
-        print(f"[API:{request_id}] Calling LLM service")
-        sql = await llm_service.generate_sql(
+        # Simple questions try the fast model tier first
+        features = model_tiering.request_features(req.user_prompt, schema_dict, message_history)
+        
+        log.debug("Calling LLM service")
+        sql, tier = await model_tiering.generate_sql_tiered(
             provider=provider,
             model=model,
             url=url,
-            prompt=prompt
+            prompt=prompt,
+            features=features,
+            hedge=req.llm_config.hedge,
+            db_config=db_config
         )
         
         process_time = time.time() - start_time
-        print(f"[API:{request_id}] SQL generation completed in {process_time:.2f}s")
+        log.info(f"SQL generation completed in {process_time:.2f}s ({tier} tier)", duration_ms=round(process_time * 1000, 1))
+        remember_turn(req.conversation_id, req.user_prompt, sql)
         
-        return GenerateSQLResponse(sql=sql)
+        return GenerateSQLResponse(sql=sql, model_tier=tier)
+    except HTTPException as e:
+        # Keep the LLM layer's status (e.g. 503 when every provider's circuit is open)
+        process_time = time.time() - start_time
+        log.error(f"SQL generation failed after {process_time:.2f}s: {e.detail}", duration_ms=round(process_time * 1000, 1))
+        raise
     except Exception as e:
         process_time = time.time() - start_time
-        print(f"[ERROR:{request_id}] SQL generation failed after {process_time:.2f}s: {str(e)}")
+        log.error(f"SQL generation failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate_sql_batch")
+async def generate_sql_batch(request: Request, req: BatchGenerateSQLRequest):
+    """Generate (and optionally execute) SQL for many prompts, streaming NDJSON results as they complete"""
+    log.info(f"Batch SQL request received: {len(req.prompts)} prompts")
+    start_time = time.time()
+    
+    if not req.prompts:
+        raise HTTPException(status_code=400, detail="No prompts provided")
+    if len(req.prompts) > settings.SQL_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.SQL_BATCH_MAX_ITEMS} prompts")
+    
+    db_config = await resolve_db_config(request, req.db_connection, req.connection_id)
+    try:
+        # Reflect the schema once for the whole batch
+        schema_str, schema_dict = await run_in_threadpool(sql_service.get_schema, db_config)
+    except Exception as e:
+        log.error(f"Batch schema reflection failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    examples = await load_examples(db_config, req.prompts)
+    with metrics.track_stage("prompt"):
+        prompts = [
+            build_llm_prompt(user_prompt, schema_str, examples[i], load_column_hints(db_config, user_prompt, schema_dict))
+            for i, user_prompt in enumerate(req.prompts)
+        ]
+    
+    provider = req.llm_config.provider
+    model = req.llm_config.model or "llama3.2"
+    url = req.llm_config.url or "http://localhost:11434/api/generate"
+    concurrency = max(1, min(req.concurrency or settings.SQL_BATCH_CONCURRENCY, settings.SQL_BATCH_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_item(index: int, prompt: str) -> BatchSQLItem:
+        item_start = time.perf_counter()
+        item = {"index": index, "prompt": req.prompts[index], "success": False}
+        async with semaphore:
+            try:
+                item["sql"], item["model_tier"] = await model_tiering.generate_sql_tiered(
+                    provider=provider, model=model, url=url, prompt=prompt,
+                    features=model_tiering.request_features(req.prompts[index], schema_dict),
+                    hedge=req.llm_config.hedge, db_config=db_config
+                )
+                if req.execute:
+                    item["result"] = await run_in_threadpool(sql_service.execute_sql, item["sql"], db_config)
+                item["success"] = True
+            except Exception as e:
+                # A failed item is reported on its own line; the rest of the batch carries on
+                item["error"] = e.detail if isinstance(e, HTTPException) else str(e)
+        item["duration_ms"] = round((time.perf_counter() - item_start) * 1000, 1)
+        return BatchSQLItem(**item)
+    
+    async def stream():
+        tasks = [asyncio.create_task(run_item(i, prompt)) for i, prompt in enumerate(prompts)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                succeeded += item.success
+                yield json.dumps(jsonable_encoder(item)) + "\n"
+        finally:
+            # Stops outstanding LLM calls if the client goes away mid-stream
+            for task in tasks:
+                task.cancel()
+        
+        process_time = time.time() - start_time
+        log.info(f"Batch of {len(prompts)} completed in {process_time:.2f}s ({succeeded} succeeded)",
+                 duration_ms=round(process_time * 1000, 1))
+        yield json.dumps({"done": True, "total": len(prompts), "succeeded": succeeded, "failed": len(prompts) - succeeded}) + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 @router.post("/execute_sql", response_model=ExecuteSQLResponse)
 async def execute_sql(request: Request, req: ExecuteSQLRequest):
     """Execute SQL and return results"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Execute SQL request received")
+    log.info("Execute SQL request received")
     start_time = time.time()
+    db_config = await resolve_db_config(request, req.db_connection, req.connection_id)
     
     try:
-        print(f"[API:{request_id}] Executing SQL: {req.sql}")
+        log.debug(f"Executing SQL: {truncate(req.sql)}")
         
-        result = sql_service.execute_sql(req.sql, req.db_connection.dict())
+        # Both block on a database; keep them off the event loop
+        result = await run_in_threadpool(sql_service.execute_sql_buffered, req.sql, db_config, get_user_id(request))
+        if req.question and settings.EXAMPLES_ENABLED:
+            await run_in_threadpool(record_example, db_config, req.question, req.sql)
+        
+        # Validate and encode here (rather than in FastAPI) so serialization shows up as its own stage
+        with metrics.track_stage("serialize"):
+            if result.spilled:
+                # Stream the rows back out of the memory-mapped spill file instead of materializing them
+                response = serialization.streaming_response(
+                    results_api.spilled_result_chunks(result.result_id, get_user_id(request)),
+                    request.headers.get("accept-encoding", "")
+                )
+            elif settings.FAST_RESULTS_ENABLED:
+                # Rows come straight from the DBAPI; skip per-row pydantic validation and re-encoding
+                response = serialization.json_response(result.to_dict(), request.headers.get("accept-encoding", ""))
+            else:
+                response = JSONResponse(jsonable_encoder(ExecuteSQLResponse(**result.to_dict())))
         
         process_time = time.time() - start_time
-        print(f"[API:{request_id}] SQL execution completed in {process_time:.2f}s")
+        log.info(f"SQL execution completed in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
         
-        return ExecuteSQLResponse(**result)
+        return response
     except Exception as e:
         process_time = time.time() - start_time
-        print(f"[ERROR:{request_id}] SQL execution failed after {process_time:.2f}s: {str(e)}")
+        log.error(f"SQL execution failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
+        if settings.EXAMPLES_ENABLED:
+            await run_in_threadpool(record_example_failure, db_config, req.sql)
         
         # Return a structured error response
         raise HTTPException(
@@ -81,89 +272,141 @@ async def execute_sql(request: Request, req: ExecuteSQLRequest):
             }
         )
     
+@router.post("/explain_sql", response_model=ExplainSQLResponse)
+async def explain_sql(request: Request, req: ExplainSQLRequest):
+    """Show how the database runs a statement: its plan, the costliest steps and candidate indexes"""
+    log.info(f"Explain SQL request received{' (analyze)' if req.analyze else ''}")
+    start_time = time.time()
+    if len(split_statements(req.sql)) != 1:
+        raise HTTPException(status_code=400, detail="Explain one statement at a time")
+    if req.analyze:
+        # ANALYZE really runs the statement
+        if not settings.EXPLAIN_ANALYZE_ENABLED:
+            raise HTTPException(status_code=403, detail="EXPLAIN ANALYZE is disabled")
+        if not is_read_only(req.sql):
+            raise HTTPException(status_code=400, detail="Only read-only statements can be analyzed")
+    db_config = await resolve_db_config(request, req.db_connection, req.connection_id)
+    if db_config.get("db_type") not in EXPLAIN_PREFIXES:
+        raise HTTPException(status_code=400, detail=f"EXPLAIN is not supported for {db_config.get('db_type')}")
+    
+    try:
+        result = await run_in_threadpool(sql_service.explain_sql, req.sql, db_config, req.analyze)
+        
+        process_time = time.time() - start_time
+        log.info(f"SQL explained in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
+        
+        return ExplainSQLResponse(**result)
+    except Exception as e:
+        process_time = time.time() - start_time
+        log.error(f"SQL explain failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
+        raise HTTPException(status_code=422, detail={"error": str(e), "sql": req.sql})
+
 @router.post("/regenerate_sql", response_model=GenerateSQLResponse)
 async def regenerate_sql(request: Request, req: RegenerateSQLRequest):
     """Regenerate SQL after a failed attempt"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Regenerate SQL request received: '{req.user_prompt[:50]}...'")
+    log.info(f"Regenerate SQL request received: '{req.user_prompt[:50]}...'")
     start_time = time.time()
     
+    db_config = await resolve_db_config(request, req.db_connection, req.connection_id)
     try:
         # Get database schema
-        schema_str, _ = sql_service.get_schema(req.db_connection.dict())
+        schema_str, schema_dict = sql_service.get_schema(db_config)
         
         # Create prompt with schema, message history, and error information
-        print(f"[API:{request_id}] Creating prompt with schema, history, and error info")
-        prompt = build_llm_prompt_for_regeneration(
-            req.user_prompt, 
-            schema_str,
-            req.message_history,
-            req.failed_sql,
-            req.error_message
-        )
+        log.debug("Creating prompt with schema, history, and error info")
+        message_history, summary = await load_history(request, req)
+        with metrics.track_stage("prompt"):
+            prompt = build_llm_prompt_for_regeneration(
+                req.user_prompt, 
+                schema_str,
+                message_history,
+                req.failed_sql,
+                req.error_message,
+                summary=summary,
+                column_hints=load_column_hints(db_config, req.user_prompt, schema_dict)
+            )
+        metrics.observe_prompt(prompt)
         
         # Generate SQL
         provider = req.llm_config.provider
         model = req.llm_config.model or "llama3.2"
         url = req.llm_config.url or "http://localhost:11434/api/generate"
         
-        print(f"[API:{request_id}] Calling LLM service for regeneration")
+        log.debug("Calling LLM service for regeneration")
         sql = await llm_service.generate_sql(
             provider=provider,
             model=model,
             url=url,
-            prompt=prompt
+            prompt=prompt,
+            hedge=req.llm_config.hedge,
+            db_config=db_config
         )
         
+        # A failed execution always escalates: regeneration uses the full model
+        model_tiering.model_tier_total.inc(tier=model_tiering.FULL, outcome="regenerate")
+        
         process_time = time.time() - start_time
-        print(f"[API:{request_id}] SQL regeneration completed in {process_time:.2f}s")
+        log.info(f"SQL regeneration completed in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
+        remember_turn(req.conversation_id, req.user_prompt, sql)
         
-        return GenerateSQLResponse(sql=sql)
+        return GenerateSQLResponse(sql=sql, model_tier=model_tiering.FULL)
+    except HTTPException as e:
+        # Keep the LLM layer's status (e.g. 503 when every provider's circuit is open)
+        process_time = time.time() - start_time
+        log.error(f"SQL regeneration failed after {process_time:.2f}s: {e.detail}", duration_ms=round(process_time * 1000, 1))
+        raise
     except Exception as e:
         process_time = time.time() - start_time
-        print(f"[ERROR:{request_id}] SQL regeneration failed after {process_time:.2f}s: {str(e)}")
+        log.error(f"SQL regeneration failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
         raise HTTPException(status_code=500, detail=str(e))
     
 
 @router.post("/test_db_connection")
 async def test_db_connection(request: Request, db_config: dict):
-    """Test if a database connection is valid"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Test database connection request")
+    """Test if a database connection is valid (a connection config, or {"connection_id": ...})"""
+    log.info("Test database connection request")
+    if db_config.get("connection_id"):
+        db_config = await resolve_db_config(request, None, db_config["connection_id"])
     
     try:
         result = sql_service.test_db_connection(db_config)
-        print(f"[API:{request_id}] Connection test result: {result['success']}")
+        log.info(f"Connection test result: {result['success']}")
         return result
     except Exception as e:
-        print(f"[ERROR:{request_id}] Connection test error: {str(e)}")
+        log.error(f"Connection test error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/db_router_status")
+async def db_router_status(request: Request):
+    """Return outstanding statements, latency, lag and health for each database primary/replica used so far"""
+    log.info("DB router status request")
+    return {"enabled": settings.REPLICA_ROUTING_ENABLED, "targets": replica_router.snapshot()}
+
 @router.post("/get_db_schema")
 async def get_db_schema_endpoint(request: Request, db_config: dict):
-    """Get the database schema in a structured format"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Get database schema request")
+    """Get the database schema in a structured format (a connection config, or {"connection_id": ...})"""
+    log.info("Get database schema request")
     start_time = time.time()
+    if db_config.get("connection_id"):
+        db_config = await resolve_db_config(request, None, db_config["connection_id"])
     
     try:
         # Get the schema
         _, schema_dict = sql_service.get_schema(db_config)
         
         process_time = time.time() - start_time
-        print(f"[API:{request_id}] Schema processed in {process_time:.2f}s")
+        log.info(f"Schema processed in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
         
         return {"success": True, "schema": schema_dict}
     except Exception as e:
         process_time = time.time() - start_time
-        print(f"[ERROR:{request_id}] Schema processing failed after {process_time:.2f}s: {str(e)}")
+        log.error(f"Schema processing failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
         return {"success": False, "message": str(e)}
     
 @router.post("/recommend_visualization")
 async def recommend_visualization(request: Request, req: dict):
     """Recommend visualization for query results"""
-    request_id = str(uuid.uuid4())[:8]
-    print(f"[API:{request_id}] Visualization recommendation request")
+    log.info("Visualization recommendation request")
     
     try:
         # Extract the data from the request
@@ -178,43 +421,46 @@ async def recommend_visualization(request: Request, req: dict):
         
         # Create prompt for LLM using the prompt builder
         from app.utils.prompt_builder import build_visualization_prompt
-        prompt = build_visualization_prompt(user_question, columns, rows)
+        with metrics.track_stage("prompt"):
+            prompt = build_visualization_prompt(user_question, columns, rows)
+        metrics.observe_prompt(prompt)
         
         # Send to LLM service
         provider = llm_config.get("provider", "ollama")
         model = llm_config.get("model", "llama3.2")
         url = llm_config.get("url", "http://localhost:11434/api/generate")
         
-        print(f"[API:{request_id}] Sending visualization recommendation request to LLM")
+        log.debug("Sending visualization recommendation request to LLM")
         
         # Get LLM response
         llm_response = await llm_service.generate_sql(
             provider=provider,
             model=model,
             url=url,
-            prompt=prompt
+            prompt=prompt,
+            hedge="off"  # The response is a chart spec, not SQL, so SQL validation does not apply
         )
         
-        print(f"[API:{request_id}] Received response from LLM: {llm_response[:100]}...")
+        log.debug(f"Received response from LLM: {truncate(llm_response, 100)}")
         
         # Parse JSON from LLM response
         try:
             # Try to parse as JSON directly
             recommendation = json.loads(llm_response)
-            print(f"[API:{request_id}] Successfully parsed JSON directly")
+            log.debug("Successfully parsed JSON directly")
         except json.JSONDecodeError:
             # If not valid JSON, try to extract JSON with regex
-            print(f"[API:{request_id}] Failed to parse JSON directly, trying regex")
+            log.debug("Failed to parse JSON directly, trying regex")
             match = re.search(r'\{.*\}', llm_response, re.DOTALL)
             if match:
                 try:
                     recommendation = json.loads(match.group(0))
-                    print(f"[API:{request_id}] Successfully extracted JSON with regex")
+                    log.debug("Successfully extracted JSON with regex")
                 except:
-                    print(f"[API:{request_id}] Failed to parse extracted JSON")
+                    log.debug("Failed to parse extracted JSON")
                     recommendation = {"visualization": False, "explanation": "Failed to parse LLM response"}
             else:
-                print(f"[API:{request_id}] Failed to extract JSON with regex")
+                log.debug("Failed to extract JSON with regex")
                 recommendation = {"visualization": False, "explanation": "Failed to extract recommendation"}
         
         # Fallback detection logic - if LLM says no visualization but we have appropriate data
@@ -236,7 +482,7 @@ async def recommend_visualization(request: Request, req: dict):
             
             # If we have a string column and a numeric column, we can create a bar chart
             if string_columns and numeric_columns:
-                print(f"[API:{request_id}] LLM said no visualization, but we have appropriate data. Overriding.")
+                log.info("LLM said no visualization, but we have appropriate data. Overriding.")
                 recommendation = {
                     "visualization": True,
                     "chartType": "bar",
@@ -249,5 +495,5 @@ async def recommend_visualization(request: Request, req: dict):
         return recommendation
         
     except Exception as e:
-        print(f"[ERROR:{request_id}] Visualization recommendation failed: {str(e)}")
+        log.error(f"Visualization recommendation failed: {str(e)}")
         return {"visualization": False, "error": str(e)}
\ No newline at end of file
@@ -0,0 +1,50 @@
+# app/api/usage.py
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from app.api.chat import get_user_id
+from app.config import settings
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger
+
+# The store pulls in SQLAlchemy; load it on first use, not at startup
+usage_store = lazy_import("app.services.usage_store")
+
+router = APIRouter(tags=["usage"])
+log = get_logger("api")
+
+@router.get("/usage")
+async def get_usage(
+    request: Request,
+    group_by: Optional[str] = None,
+    since: Optional[float] = None,
+    limit: int = 50,
+    endpoint: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    connection: Optional[str] = None,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+):
+    """The current user's LLM tokens and latency, overall or per endpoint, conversation, connection, provider or model
+
+    `since` is a Unix timestamp; the other filters narrow to one value of that attribute.
+    """
+    if not settings.USAGE_STORE_ENABLED:
+        raise HTTPException(status_code=404, detail="Usage accounting is disabled")
+    if group_by is not None and group_by not in usage_store.GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(usage_store.GROUPS)}")
+
+    try:
+        rows = await run_in_threadpool(
+            usage_store.get_usage_store().report,
+            get_user_id(request), group_by=group_by, since=since, limit=min(max(limit, 1), 500),
+            endpoint=endpoint, conversation_id=conversation_id, connection=connection,
+            provider=provider, model=model,
+        )
+    except Exception as e:
+        log.error(f"Usage report failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if group_by is None:
+        return {"total": rows[0] if rows else None}
+    return {"group_by": group_by, "groups": rows}
@@ -0,0 +1,322 @@
+# app/api/ws.py
+#
+# /ws/chat: one socket per client session, carrying any number of conversations at once.
+#
+#   client -> server   {"type": "chat", "id": ..., <ChatRequest fields>, "execute": true}
+#                      {"type": "cancel", "id": ...}
+#                      {"type": "ping"}
+#   server -> client   conversation, progress, token, sql, rows, result, done, cancelled, error
+#                      (each with the "id" of the turn it belongs to), pong
+#
+# A new chat frame for a conversation that already has a turn in flight supersedes it. Cancelling
+# a turn aborts its LLM stream and interrupts its DB statement. Outgoing frames go through a
+# bounded per-socket queue with a single sender, so a client that reads slowly holds back token
+# streaming and the DB cursor rather than growing server memory.
+import asyncio
+import concurrent.futures
+import threading
+import time
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from app.api import chat
+from app.config import settings
+from app.models.chat import ChatSocketRequest, MessageResponse
+from app.services import llm_service, replica_router, result_store, sql_service, usage_service
+from app.utils import db_utils, metrics, serialization
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger, new_request_id, request_id_var
+from app.utils.prompt_builder import build_chat_prompt
+
+# The stores pull in SQLAlchemy; load them on first use, not at startup
+chat_store = lazy_import("app.services.chat_store")
+summary_service = lazy_import("app.services.summary_service")
+
+router = APIRouter(tags=["chat"])
+log = get_logger("api")
+
+_sockets = set()
+
+def socket_counts() -> dict:
+    sockets = list(_sockets)
+    return {("sockets",): len(sockets), ("turns",): sum(len(socket.turns) for socket in sockets)}
+
+metrics.register(metrics.Gauge(
+    "sql_assistant_ws_active", "Open /ws/chat sockets and chat turns in flight on them",
+    ("kind",), callback=socket_counts,
+))
+
+class SlowClient(Exception):
+    """The client stopped reading: a frame could not be sent within WS_SEND_TIMEOUT_S"""
+
+class Turn:
+    """One chat request in flight on a socket"""
+
+    def __init__(self, socket, turn_id: str, conversation_id: str = None):
+        self.socket = socket
+        self.id = turn_id
+        self.conversation_id = conversation_id
+        self.task = None
+        self.cancelled = threading.Event()
+        self.dbapi_connection = None  # Set while its statement runs, so cancel() can interrupt it
+
+    async def send(self, frame_type: str, **fields):
+        await self.socket.send({"type": frame_type, "id": self.id, **fields}, self)
+
+    def send_blocking(self, frame_type: str, **fields):
+        """send() for worker threads: waits (holding back the DB cursor) while the client is behind"""
+        future = asyncio.run_coroutine_threadsafe(self.send(frame_type, **fields), self.socket.loop)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except concurrent.futures.TimeoutError:
+                if self.cancelled.is_set():
+                    future.cancel()
+                    raise replica_router.StatementAborted("Cancelled")
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.dbapi_connection is not None:
+            try:
+                db_utils.interrupt_connection(self.dbapi_connection)
+            except Exception as e:
+                log.warning(f"Could not interrupt statement of turn {self.id}: {str(e)}")
+        if self.task is not None:
+            self.task.cancel()
+
+class ChatSocket:
+    """State of one /ws/chat connection"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.user_id = chat.get_user_id(websocket)
+        self.loop = asyncio.get_running_loop()
+        self.outgoing = asyncio.Queue(maxsize=max(settings.WS_SEND_QUEUE_FRAMES, 1))
+        self.turns = {}
+
+    async def send(self, frame: dict, turn: Turn = None):
+        """Queue a frame; waits while the queue is full (backpressure)"""
+        await self.outgoing.put((turn, frame))
+
+    async def run_sender(self):
+        while True:
+            turn, frame = await self.outgoing.get()
+            if turn is not None and turn.cancelled.is_set() and frame["type"] != "cancelled":
+                continue  # Left over from a cancelled turn
+            try:
+                await asyncio.wait_for(
+                    self.websocket.send_text(serialization.dumps(frame).decode("utf-8")), settings.WS_SEND_TIMEOUT_S
+                )
+            except asyncio.TimeoutError:
+                raise SlowClient(f"No frame sent in {settings.WS_SEND_TIMEOUT_S:.0f}s")
+
+    async def run_receiver(self):
+        while True:
+            try:
+                data = await self.websocket.receive_json()
+            except ValueError:
+                await self.send({"type": "error", "id": None, "status": 400, "detail": "Frames must be JSON"})
+                continue
+            if not isinstance(data, dict):
+                await self.send({"type": "error", "id": None, "status": 400, "detail": "Frames must be JSON objects"})
+                continue
+
+            frame_type = data.get("type")
+            if frame_type == "chat":
+                await self.start_turn(data)
+            elif frame_type == "cancel":
+                await self.cancel_turn(data.get("id"))
+            elif frame_type == "ping":
+                await self.send({"type": "pong", "id": data.get("id")})
+            else:
+                await self.send({"type": "error", "id": data.get("id"), "status": 400,
+                                 "detail": f"Unknown frame type: {frame_type}"})
+
+    async def start_turn(self, data: dict):
+        try:
+            req = ChatSocketRequest(**data)
+        except ValidationError as e:
+            await self.send({"type": "error", "id": data.get("id"), "status": 422, "detail": str(e)})
+            return
+        if req.id in self.turns:
+            await self.send({"type": "error", "id": req.id, "status": 409, "detail": "A turn with this id is in flight"})
+            return
+
+        # A new message on a conversation replaces the answer still being generated for it
+        if req.conversation_id is not None:
+            for other in list(self.turns.values()):
+                if other.conversation_id == req.conversation_id:
+                    await self.cancel_turn(other.id, reason="superseded")
+
+        if len(self.turns) >= settings.WS_MAX_INFLIGHT:
+            await self.send({"type": "error", "id": req.id, "status": 429,
+                             "detail": f"At most {settings.WS_MAX_INFLIGHT} turns in flight per connection"})
+            return
+
+        turn = Turn(self, req.id, req.conversation_id)
+        self.turns[turn.id] = turn
+        turn.task = asyncio.create_task(self.run_turn(turn, req))
+
+    async def cancel_turn(self, turn_id: str, reason: str = "cancelled"):
+        turn = self.turns.pop(turn_id, None)
+        if turn is None:
+            await self.send({"type": "error", "id": turn_id, "status": 404, "detail": "No turn in flight with this id"})
+            return
+        log.info(f"Chat turn {turn_id} {reason}")
+        turn.cancel()
+        await turn.send("cancelled", reason=reason)
+
+    def close(self):
+        for turn in list(self.turns.values()):
+            turn.cancel()
+        self.turns.clear()
+
+    async def run_turn(self, turn: Turn, req: ChatSocketRequest):
+        """Answer one chat message, streaming each step to the client"""
+        request_id_var.set(new_request_id())
+        log.info(f"Chat turn {turn.id} received: '{req.message[:50]}...'")
+        start_time = time.time()
+        store = chat_store.get_chat_store()
+        usage, usage_token = usage_service.start_tracking(endpoint="/ws/chat", user_id=self.user_id)
+
+        try:
+            conversation, summary, history = await chat.open_conversation(
+                store, req.conversation_id, self.user_id, req.message[:80]
+            )
+            turn.conversation_id = conversation["id"]
+            await turn.send("conversation", conversation_id=turn.conversation_id)
+
+            schema_str = ""
+            db_config = await chat.chat_db_config(req, conversation, self.user_id)
+            if db_config is not None:
+                await turn.send("progress", stage="schema")
+                schema_str, _ = await run_in_threadpool(sql_service.get_schema, db_config)
+
+            prompt = build_chat_prompt(
+                user_prompt=req.message,
+                schema=schema_str,
+                conversation_history=history,
+                summary=summary
+            )
+
+            await turn.send("progress", stage="generating")
+            provider, model, url = chat.chat_llm_config(req)
+            pieces = []
+            async for text in llm_service.stream_completion(provider, model, url, prompt):
+                pieces.append(text)
+                await turn.send("token", text=text)
+            content = "".join(pieces)
+
+            # Only read-only statements run on their own; anything else is left to the user
+            sql = llm_service.extract_chat_sql(content)
+            metadata = None
+            if sql is not None:
+                execute = req.execute and db_config is not None and db_utils.is_read_only(sql)
+                await turn.send("sql", sql=sql, execute=execute)
+                if execute:
+                    metadata = await self.execute(turn, sql, db_config)
+
+            totals = usage.totals()
+            if totals.calls:
+                metadata = {**(metadata or {}), "usage": totals.to_dict()}
+            store.append_message(turn.conversation_id, "user", req.message)
+            message = store.append_message(
+                turn.conversation_id, "assistant",
+                content or "I'm sorry, I couldn't process your request.",
+                sql=sql,
+                tokens_used=totals.tokens_used,
+                metadata=metadata
+            )
+            summary_service.schedule_summary(turn.conversation_id)
+
+            process_time = time.time() - start_time
+            log.info(f"Chat turn {turn.id} finished in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
+            await turn.send("done", conversation_id=turn.conversation_id, message=MessageResponse(**message).dict())
+
+        except asyncio.CancelledError:
+            raise  # cancel_turn() has told the client
+        except HTTPException as e:
+            await turn.send("error", status=e.status_code, detail=e.detail)
+        except Exception as e:
+            process_time = time.time() - start_time
+            log.error(f"Chat turn {turn.id} failed after {process_time:.2f}s: {str(e)}", duration_ms=round(process_time * 1000, 1))
+            await turn.send("error", status=500, detail=str(e))
+        finally:
+            usage_service.end_tracking(usage, usage_token)
+            if self.turns.get(turn.id) is turn:
+                del self.turns[turn.id]
+
+    async def execute(self, turn: Turn, sql: str, db_config: dict) -> dict:
+        """Run a turn's SQL, sending rows as they are fetched; returns what the stored message keeps"""
+        await turn.send("progress", stage="executing", rows_fetched=0)
+        streamed = 0
+
+        def remember_connection(dbapi_connection):
+            turn.dbapi_connection = dbapi_connection
+
+        def send_batch(buffer, rows):
+            nonlocal streamed
+            if turn.cancelled.is_set():
+                raise replica_router.StatementAborted("Cancelled")
+            rows = rows[:max(settings.WS_RESULT_MAX_ROWS - streamed, 0)]
+            if rows:
+                turn.send_blocking("rows", offset=streamed, columns=buffer.columns, rows=rows)
+                streamed += len(rows)
+            if buffer.row_count > settings.WS_RESULT_MAX_ROWS and not buffer.spilled:
+                buffer.spill()  # Rows past the streamed ones stay readable at /results/{result_id}
+            turn.send_blocking("progress", stage="executing", rows_fetched=buffer.row_count)
+
+        def run(sql: str, config: dict):
+            try:
+                return result_store.fetch(
+                    sql, config, self.user_id, batch_rows=settings.WS_RESULT_CHUNK_ROWS,
+                    on_connect=remember_connection, on_batch=send_batch,
+                )
+            except replica_router.StatementAborted:
+                raise
+            except Exception as e:
+                if turn.cancelled.is_set():
+                    raise replica_router.StatementAborted("Cancelled") from e
+                if streamed:
+                    # Rows already went out; retrying on the primary would send them again
+                    raise replica_router.StatementAborted(str(e)) from e
+                raise
+            finally:
+                turn.dbapi_connection = None
+
+        start_time = time.time()
+        with metrics.track_stage("db"):
+            buffer = await asyncio.to_thread(replica_router.execute, sql, db_config, run)
+        log.info(f"Chat turn {turn.id} query returned {buffer.row_count} rows in {time.time() - start_time:.2f}s")
+
+        summary = {"columns": buffer.columns, "total_rows": buffer.row_count, "result_id": buffer.result_id}
+        await turn.send("result", **summary)
+        return summary
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """Multiplexed, streaming chat; see the frame protocol at the top of this module"""
+    await websocket.accept()
+    socket = ChatSocket(websocket)
+    _sockets.add(socket)
+    log.info("Chat socket opened")
+
+    tasks = [asyncio.create_task(socket.run_sender()), asyncio.create_task(socket.run_receiver())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if isinstance(error, SlowClient):
+                log.warning(f"Closing chat socket: {str(error)}")
+                await websocket.close(code=1008, reason="Client too slow")
+            elif error is not None and not isinstance(error, WebSocketDisconnect):
+                log.error(f"Chat socket failed: {str(error)}")
+                await websocket.close(code=1011)
+    except Exception as e:
+        log.debug(f"Chat socket close failed: {str(e)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        socket.close()
+        _sockets.discard(socket)
+        log.info("Chat socket closed")
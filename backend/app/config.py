@@ -15,12 +15,201 @@ class Settings(BaseSettings):
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     BEDROCK_MODEL_ID: str = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-7-sonnet-20250219-v1:0")
     CLAUDE_37_PROFILE_ARN: str = os.getenv("CLAUDE_37_PROFILE_ARN", "")
+    # Mark the instructions + schema prefix with cache_control once it is long enough to be cacheable
+    BEDROCK_PROMPT_CACHING: bool = os.getenv("BEDROCK_PROMPT_CACHING", "true").lower() == "true"
+    BEDROCK_CACHE_MIN_TOKENS: int = int(os.getenv("BEDROCK_CACHE_MIN_TOKENS", "1024"))
+    
+    # Record/replay LLM provider ("replay" mode serves recordings, "record" captures them)
+    LLM_REPLAY_MODE: str = os.getenv("LLM_REPLAY_MODE", "replay")
+    LLM_REPLAY_UPSTREAM: str = os.getenv("LLM_REPLAY_UPSTREAM", "bedrock")
+    LLM_CASSETTE_PATH: str = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl.gz")
+    LLM_REPLAY_LATENCY_MS: float = float(os.getenv("LLM_REPLAY_LATENCY_MS", "-1"))  # -1 = recorded latency
+    
+    # Hedged / multi-candidate generation: "off", "hedge" (second call after a percentile delay)
+    # or "candidates" (N parallel calls, first that passes EXPLAIN wins). Requests may override.
+    LLM_HEDGE_MODE: str = os.getenv("LLM_HEDGE_MODE", "off")
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_MIN_DELAY_MS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "250"))
+    LLM_HEDGE_DEFAULT_DELAY_MS: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "3000"))  # until enough samples
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_HEDGE_WINDOW: int = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+    LLM_HEDGE_PROVIDER: str = os.getenv("LLM_HEDGE_PROVIDER", "")  # empty = same provider/model as the first call
+    LLM_HEDGE_MODEL: str = os.getenv("LLM_HEDGE_MODEL", "")
+    LLM_HEDGE_URL: str = os.getenv("LLM_HEDGE_URL", "")
+    LLM_CANDIDATES: int = int(os.getenv("LLM_CANDIDATES", "3"))
+    
+    # Provider router: circuit breakers, latency-aware timeouts and a fallback chain of
+    # "provider:model[@url]" entries, e.g. "bedrock:anthropic.claude-3-haiku-20240307-v1:0,ollama:llama3.2"
+    LLM_ROUTER_ENABLED: bool = os.getenv("LLM_ROUTER_ENABLED", "true").lower() == "true"
+    LLM_FALLBACK_CHAIN: str = os.getenv("LLM_FALLBACK_CHAIN", "")
+    LLM_BREAKER_FAILURES: int = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_COOLDOWN_S: float = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+    LLM_ROUTER_EWMA_ALPHA: float = float(os.getenv("LLM_ROUTER_EWMA_ALPHA", "0.2"))
+    LLM_ROUTER_DEMOTE_ERROR_RATE: float = float(os.getenv("LLM_ROUTER_DEMOTE_ERROR_RATE", "0.5"))
+    LLM_ROUTER_TIMEOUT_FACTOR: float = float(os.getenv("LLM_ROUTER_TIMEOUT_FACTOR", "4"))
+    LLM_ROUTER_MIN_TIMEOUT_S: float = float(os.getenv("LLM_ROUTER_MIN_TIMEOUT_S", "10"))
+    LLM_ROUTER_MAX_TIMEOUT_S: float = float(os.getenv("LLM_ROUTER_MAX_TIMEOUT_S", "60"))
+    LLM_ROUTER_PROBE_INTERVAL_S: float = float(os.getenv("LLM_ROUTER_PROBE_INTERVAL_S", "5"))
+    
+    # Model tiering: simple questions go to a fast model ("provider=model,..."), escalating on failure.
+    # Opt-in: enabling it changes which model answers for existing deployments.
+    MODEL_TIER_ENABLED: bool = os.getenv("MODEL_TIER_ENABLED", "false").lower() == "true"
+    MODEL_TIER_FAST_MODELS: str = os.getenv("MODEL_TIER_FAST_MODELS", "bedrock=anthropic.claude-3-haiku-20240307-v1:0")
+    MODEL_TIER_MAX_WORDS: int = int(os.getenv("MODEL_TIER_MAX_WORDS", "16"))
+    MODEL_TIER_MAX_HISTORY: int = int(os.getenv("MODEL_TIER_MAX_HISTORY", "4"))
+    
+    # Few-shot examples: (question, SQL) pairs recorded after successful /execute_sql runs
+    EXAMPLE_STORE_URL: str = os.getenv("EXAMPLE_STORE_URL", "")  # empty = SQLite in DATA_DIR
+    EXAMPLES_ENABLED: bool = os.getenv("EXAMPLES_ENABLED", "true").lower() == "true"
+    EXAMPLE_TOP_K: int = int(os.getenv("EXAMPLE_TOP_K", "3"))
+    EXAMPLE_TOKEN_BUDGET: int = int(os.getenv("EXAMPLE_TOKEN_BUDGET", "600"))
+    EXAMPLE_MIN_SCORE: float = float(os.getenv("EXAMPLE_MIN_SCORE", "0.2"))
+    EXAMPLE_MAX_FAILURES: int = int(os.getenv("EXAMPLE_MAX_FAILURES", "3"))
+    EXAMPLE_MAX_AGE_DAYS: float = float(os.getenv("EXAMPLE_MAX_AGE_DAYS", "90"))
+    EXAMPLE_MAX_PER_CONNECTION: int = int(os.getenv("EXAMPLE_MAX_PER_CONNECTION", "500"))
+    EXAMPLE_PRUNE_EVERY: int = int(os.getenv("EXAMPLE_PRUNE_EVERY", "50"))
+    
+    # /generate_sql_batch limits
+    SQL_BATCH_CONCURRENCY: int = int(os.getenv("SQL_BATCH_CONCURRENCY", "8"))
+    SQL_BATCH_MAX_ITEMS: int = int(os.getenv("SQL_BATCH_MAX_ITEMS", "1000"))
+    
+    # /execute_sql results: serialized straight to JSON bytes (orjson when installed) instead of
+    # per-row pydantic validation; bodies over RESPONSE_COMPRESS_MIN_BYTES are zstd/gzip-compressed
+    FAST_RESULTS_ENABLED: bool = os.getenv("FAST_RESULTS_ENABLED", "true").lower() == "true"
+    RESPONSE_COMPRESS_MIN_BYTES: int = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "65536"))
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "1"))
+    RESPONSE_ZSTD_LEVEL: int = int(os.getenv("RESPONSE_ZSTD_LEVEL", "3"))
+    # Results over RESULT_SPILL_THRESHOLD_BYTES (estimated as JSON) go to a columnar file in
+    # RESULT_DIR and are read back via mmap for the response, /results pages, exports and aggregates
+    RESULT_SPILL_THRESHOLD_BYTES: int = int(os.getenv("RESULT_SPILL_THRESHOLD_BYTES", str(32 * 1024 * 1024)))
+    RESULT_DIR: str = os.getenv("RESULT_DIR", "")  # empty = DATA_DIR/results
+    RESULT_BATCH_ROWS: int = int(os.getenv("RESULT_BATCH_ROWS", "5000"))
+    RESULT_TTL_S: float = float(os.getenv("RESULT_TTL_S", "900"))
+    RESULT_SWEEP_INTERVAL_S: float = float(os.getenv("RESULT_SWEEP_INTERVAL_S", "60"))
+    
+    # Query jobs (/jobs): long-running statements run on a worker pool and spill their rows to
+    # JOB_RESULT_DIR, kept JOB_RESULT_TTL_S after finishing. Per-user limits apply per worker process.
+    JOBS_ENABLED: bool = os.getenv("JOBS_ENABLED", "true").lower() == "true"
+    JOB_STORE_URL: str = os.getenv("JOB_STORE_URL", "")  # empty = SQLite in DATA_DIR
+    JOB_RESULT_DIR: str = os.getenv("JOB_RESULT_DIR", "")  # empty = DATA_DIR/jobs
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_MAX_RUNNING_PER_USER: int = int(os.getenv("JOB_MAX_RUNNING_PER_USER", "2"))
+    JOB_MAX_QUEUED_PER_USER: int = int(os.getenv("JOB_MAX_QUEUED_PER_USER", "20"))
+    JOB_MAX_ROWS: int = int(os.getenv("JOB_MAX_ROWS", "5000000"))
+    JOB_BATCH_ROWS: int = int(os.getenv("JOB_BATCH_ROWS", "5000"))
+    JOB_RESULT_TTL_S: float = float(os.getenv("JOB_RESULT_TTL_S", "3600"))
+    JOB_PROGRESS_PERSIST_S: float = float(os.getenv("JOB_PROGRESS_PERSIST_S", "2"))
+    JOB_EVENT_INTERVAL_S: float = float(os.getenv("JOB_EVENT_INTERVAL_S", "0.5"))
+    JOB_SWEEP_INTERVAL_S: float = float(os.getenv("JOB_SWEEP_INTERVAL_S", "5"))
+    
+    # WebSocket chat (/ws/chat): concurrent turns per socket, and the outgoing frame queue that
+    # holds LLM and DB streaming back when a client reads slowly (closed after WS_SEND_TIMEOUT_S)
+    WS_MAX_INFLIGHT: int = int(os.getenv("WS_MAX_INFLIGHT", "4"))
+    WS_SEND_QUEUE_FRAMES: int = int(os.getenv("WS_SEND_QUEUE_FRAMES", "64"))
+    WS_SEND_TIMEOUT_S: float = float(os.getenv("WS_SEND_TIMEOUT_S", "30"))
+    WS_RESULT_CHUNK_ROWS: int = int(os.getenv("WS_RESULT_CHUNK_ROWS", "500"))
+    WS_RESULT_MAX_ROWS: int = int(os.getenv("WS_RESULT_MAX_ROWS", "10000"))  # the rest via /results/{result_id}
+    
+    # /explain_sql: ANALYZE really runs the statement, so it is limited to read-only statements,
+    # rolled back and stopped after EXPLAIN_ANALYZE_TIMEOUT_S; the EXPLAIN_HOTSPOTS costliest plan
+    # nodes are highlighted
+    EXPLAIN_ANALYZE_ENABLED: bool = os.getenv("EXPLAIN_ANALYZE_ENABLED", "true").lower() == "true"
+    EXPLAIN_ANALYZE_TIMEOUT_S: float = float(os.getenv("EXPLAIN_ANALYZE_TIMEOUT_S", "30"))
+    EXPLAIN_HOTSPOTS: int = int(os.getenv("EXPLAIN_HOTSPOTS", "3"))
+    
+    # Pooled SQLAlchemy engines kept per connection string (least recently used are disposed)
+    DB_ENGINE_CACHE_SIZE: int = int(os.getenv("DB_ENGINE_CACHE_SIZE", "16"))
+    DB_POOL_MIN_WARM: int = int(os.getenv("DB_POOL_MIN_WARM", "2"))
+    
+    # Background refresher: revalidates recently used schemas before SCHEMA_CACHE_TTL_S runs out
+    # and keeps DB_POOL_MIN_WARM connections open; skips rounds while the event loop lags or
+    # too many requests are in flight
+    REFRESHER_ENABLED: bool = os.getenv("REFRESHER_ENABLED", "true").lower() == "true"
+    REFRESHER_INTERVAL_S: float = float(os.getenv("REFRESHER_INTERVAL_S", "15"))
+    REFRESHER_RECENT_S: float = float(os.getenv("REFRESHER_RECENT_S", "1800"))
+    REFRESHER_JITTER: float = float(os.getenv("REFRESHER_JITTER", "0.1"))
+    REFRESHER_MAX_LOOP_LAG_MS: float = float(os.getenv("REFRESHER_MAX_LOOP_LAG_MS", "100"))
+    REFRESHER_MAX_IN_FLIGHT: int = int(os.getenv("REFRESHER_MAX_IN_FLIGHT", "32"))
+    
+    # Read replicas (db_connection.replicas): read-only statements go to the least busy replica
+    # within REPLICA_MAX_LAG_S of its primary; a failing replica sits out REPLICA_DOWN_S
+    REPLICA_ROUTING_ENABLED: bool = os.getenv("REPLICA_ROUTING_ENABLED", "true").lower() == "true"
+    REPLICA_MAX_LAG_S: float = float(os.getenv("REPLICA_MAX_LAG_S", "30"))
+    REPLICA_LAG_CHECK_S: float = float(os.getenv("REPLICA_LAG_CHECK_S", "10"))
+    REPLICA_DOWN_S: float = float(os.getenv("REPLICA_DOWN_S", "30"))
+    REPLICA_EWMA_ALPHA: float = float(os.getenv("REPLICA_EWMA_ALPHA", "0.3"))
+    
+    # Startup: heavy modules load on first use; warm-up preloads them (and shared clients and
+    # pools) in the background once the server is already answering /health
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    
+    # Local storage (conversation store and other on-disk state)
+    DATA_DIR: str = os.getenv("DATA_DIR", "data")
+    CHAT_STORE_URL: str = os.getenv("CHAT_STORE_URL", "")  # empty = SQLite in DATA_DIR; or postgresql://...
+    CHAT_STORE_FLUSH_MS: int = int(os.getenv("CHAT_STORE_FLUSH_MS", "25"))
+    CHAT_STORE_BATCH_SIZE: int = int(os.getenv("CHAT_STORE_BATCH_SIZE", "200"))
+    CHAT_STORE_RETRY_MAX_S: float = float(os.getenv("CHAT_STORE_RETRY_MAX_S", "30"))  # backoff cap while the DB is unreachable
+    CHAT_HISTORY_LIMIT: int = int(os.getenv("CHAT_HISTORY_LIMIT", "20"))
+
+    # Registered connections (/connections): configs are Fernet-encrypted at rest. Comma-separated
+    # keys; the first encrypts, all decrypt (prepend a new key to rotate). Empty = key file in DATA_DIR
+    CONNECTION_STORE_URL: str = os.getenv("CONNECTION_STORE_URL", "")  # empty = SQLite in DATA_DIR
+    CONNECTION_ENCRYPTION_KEYS: str = os.getenv("CONNECTION_ENCRYPTION_KEYS", "")
+
+    # Rolling conversation summaries: older turns collapse into a summary, the newest stay verbatim
+    CHAT_SUMMARY_RECENT: int = int(os.getenv("CHAT_SUMMARY_RECENT", "6"))
+    CHAT_SUMMARY_MAX_CHARS: int = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "2000"))
+    CHAT_SUMMARY_MAX_SQL: int = int(os.getenv("CHAT_SUMMARY_MAX_SQL", "10"))
+
+    # Schema snapshots: reflected schemas persisted per connection so new workers skip reflection
+    SCHEMA_CACHE_ENABLED: bool = os.getenv("SCHEMA_CACHE_ENABLED", "true").lower() == "true"
+    SCHEMA_CACHE_DIR: str = os.getenv("SCHEMA_CACHE_DIR", "")  # empty = DATA_DIR/schema
+    SCHEMA_CACHE_TTL_S: float = float(os.getenv("SCHEMA_CACHE_TTL_S", "300"))
+    
+    # Column profiles: sampled enum-like values and numeric/date ranges, added to the prompt
+    # for the tables a question mentions (stored next to the schema snapshot)
+    COLUMN_PROFILE_ENABLED: bool = os.getenv("COLUMN_PROFILE_ENABLED", "true").lower() == "true"
+    COLUMN_PROFILE_SAMPLE_ROWS: int = int(os.getenv("COLUMN_PROFILE_SAMPLE_ROWS", "10000"))
+    COLUMN_PROFILE_MAX_DISTINCT: int = int(os.getenv("COLUMN_PROFILE_MAX_DISTINCT", "20"))
+    COLUMN_PROFILE_MAX_VALUE_CHARS: int = int(os.getenv("COLUMN_PROFILE_MAX_VALUE_CHARS", "60"))
+    COLUMN_PROFILE_PROMPT_TABLES: int = int(os.getenv("COLUMN_PROFILE_PROMPT_TABLES", "3"))
+    COLUMN_PROFILE_MAX_TABLES: int = int(os.getenv("COLUMN_PROFILE_MAX_TABLES", "200"))
+    COLUMN_PROFILE_TTL_S: float = float(os.getenv("COLUMN_PROFILE_TTL_S", "86400"))
     
     # Logging
-    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+    LOG_COLOR: bool = os.getenv("LOG_COLOR", "true").lower() == "true"
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")  # e.g. "sql=0.1,parser=0"
+    LOG_MAX_FIELD_CHARS: int = int(os.getenv("LOG_MAX_FIELD_CHARS", "500"))
+    
+    # Metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    
+    # LLM usage accounting (/usage): one row per LLM call with tokens and timings, attributed
+    # to the endpoint, conversation and connection it served; kept USAGE_RETENTION_S
+    USAGE_STORE_ENABLED: bool = os.getenv("USAGE_STORE_ENABLED", "true").lower() == "true"
+    USAGE_STORE_URL: str = os.getenv("USAGE_STORE_URL", "")  # empty = SQLite in DATA_DIR
+    USAGE_FLUSH_MS: int = int(os.getenv("USAGE_FLUSH_MS", "500"))
+    USAGE_RETENTION_S: float = float(os.getenv("USAGE_RETENTION_S", str(90 * 24 * 3600)))
+    
+    # Request tracing: ?debug=trace or X-Debug-Trace: 1 adds the span tree to JSON responses.
+    # Debug-only opt-in: any client could then see internal timings, SQL and LLM call details.
+    TRACE_DEBUG_ENABLED: bool = os.getenv("TRACE_DEBUG_ENABLED", "false").lower() == "true"
     
     class Config:
         env_file = ".env"
 
+class LazySettings:
+    """Builds Settings (reading the environment and .env) on first attribute access"""
+
+    def __init__(self):
+        self._settings = None
+
+    def __getattr__(self, name: str):
+        if self._settings is None:
+            self._settings = Settings()
+        return getattr(self._settings, name)
+
 # Create settings instance
-settings = Settings()
\ No newline at end of file
+settings = LazySettings()
\ No newline at end of file
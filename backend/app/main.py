@@ -1,16 +1,76 @@
 # app/main.py
+import asyncio
+import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import time
-import uuid
 from app.config import settings
-from app.api import sql, llm, chat
-from app.utils.colors import Colors as C
+from app.api import sql, llm, chat, connections, jobs, results, ws, usage, metrics as metrics_api
+from app.utils import metrics, tracing
+from app.utils.logger import get_logger, new_request_id, request_id_var, start_logging, stop_logging
+from app.services import background_refresher, job_queue, llm_router, llm_service, usage_service
+from app.utils import db_utils
+
+request_log = get_logger("request")
+response_log = get_logger("response")
+api_log = get_logger("api")
+
+def warm_up_blocking():
+    """Import the lazily loaded modules and create the stores' pools and the Bedrock client"""
+    from app.services import chat_store, connection_store, example_store, summary_service, usage_store
+    from app.utils import bedrock_client
+    chat_store.get_chat_store()
+    connection_store.get_connection_store()
+    if settings.USAGE_STORE_ENABLED:
+        usage_store.get_usage_store()
+    if settings.EXAMPLES_ENABLED:
+        example_store.get_example_store()
+    if settings.DEFAULT_LLM_PROVIDER == "bedrock" or "bedrock" in settings.LLM_FALLBACK_CHAIN:
+        bedrock_client.get_bedrock_client()
+
+async def warm_up():
+    """Runs after startup, so /health already answers while this loads"""
+    start_time = time.time()
+    try:
+        await asyncio.to_thread(warm_up_blocking)
+        llm_service.get_http_client()
+        api_log.info(f"Warm-up finished in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        # Everything warmed here is also created on first use
+        api_log.warning(f"Warm-up failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_logging()
+    # Background probes that close half-open LLM circuits once the provider answers again
+    probes = asyncio.create_task(llm_router.run_probes(llm_service.probe_circuit))
+    warmup = asyncio.create_task(warm_up()) if settings.WARMUP_ENABLED else None
+    refresher = asyncio.create_task(background_refresher.run_refresher()) if settings.REFRESHER_ENABLED else None
+    job_maintenance = asyncio.create_task(job_queue.run_maintenance()) if settings.JOBS_ENABLED else None
+    yield
+    probes.cancel()
+    if job_maintenance is not None:
+        job_maintenance.cancel()
+        job_queue.shutdown()
+    if refresher is not None:
+        refresher.cancel()
+    if warmup is not None:
+        warmup.cancel()
+    await llm_service.close_http_client()
+    # Only close what was actually loaded; don't import the store just to shut it down
+    if "app.services.chat_store" in sys.modules:
+        sys.modules["app.services.chat_store"].close_chat_store()
+    if "app.services.usage_store" in sys.modules:
+        sys.modules["app.services.usage_store"].close_usage_store()
+    db_utils.dispose_engines()
+    stop_logging()
 
 app = FastAPI(
     title="SQL Assistant API",
     description="API for generating SQL queries from natural language using LLMs and SQLAlchemy",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware for handling cross-origin requests
@@ -26,39 +86,69 @@ app.add_middleware(
 app.include_router(sql.router)
 app.include_router(llm.router)
 app.include_router(chat.router)
+app.include_router(connections.router)
+app.include_router(jobs.router)
+app.include_router(results.router)
+app.include_router(ws.router)
+app.include_router(usage.router)
+app.include_router(metrics_api.router)
 
 # Add basic request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    # Generate a short request ID
-    request_id = str(uuid.uuid4())[:8]
+    # Generate a short request ID and propagate it to everything this request awaits
+    request_id = new_request_id()
+    token = request_id_var.set(request_id)
+    scope_token = metrics.request_scope_var.set(request.scope)
+    root_span, trace_token = tracing.start_trace(f"{request.method} {request.url.path}")
+    usage, usage_token = usage_service.start_tracking()
     
     # Add request ID to request state for use in endpoint handlers
     request.state.request_id = request_id
     
     # Log the request
-    print(f"{C.REQUEST}[REQUEST:{request_id}]{C.RESET} {request.method} {request.url.path}")
+    request_log.info(f"{request.method} {request.url.path}", method=request.method, path=request.url.path)
     
     # Record start time
     start_time = time.time()
+    metrics.request_started()
     
-    # Process the request
-    response = await call_next(request)
-    
-    # Calculate request duration
-    process_time = time.time() - start_time
+    try:
+        # Process the request
+        response = await call_next(request)
+        
+        # Calculate request duration
+        process_time = time.time() - start_time
+        
+        response_log.info(
+            f"Completed with status {response.status_code} in {process_time:.2f}s",
+            status=response.status_code, duration_ms=round(process_time * 1000, 1),
+        )
+        metrics.observe_request(metrics.current_endpoint(), request.method, response.status_code, process_time)
+    finally:
+        usage.user_id = chat.get_user_id(request)
+        usage_service.end_tracking(usage, usage_token)
+        metrics.request_finished()
+        request_id_var.reset(token)
+        metrics.request_scope_var.reset(scope_token)
+        tracing.end_trace(root_span, trace_token)
     
-    # Choose color based on status code
-    status_color = C.GREEN if response.status_code < 400 else C.RED
+    # Expose the request ID so clients can correlate with the logs
+    response.headers["X-Request-ID"] = request_id
     
-    print(f"{C.RESPONSE}[RESPONSE:{request_id}]{C.RESET} Completed with status {status_color}{response.status_code}{C.RESET} in {process_time:.2f}s")
+    # Per-stage timings for browser devtools, plus the full span tree on request
+    response.headers["Server-Timing"] = tracing.server_timing(root_span)
+    if settings.TRACE_DEBUG_ENABLED and (
+        request.query_params.get("debug") == "trace" or request.headers.get("X-Debug-Trace") == "1"
+    ):
+        response = await tracing.attach_trace(response, root_span)
     
     return response
 
 @app.get("/")
 async def root():
     """Root endpoint"""
-    print(f"{C.API}[API]{C.RESET} Root endpoint accessed")
+    api_log.debug("Root endpoint accessed")
     return {
         "message": "Welcome to the SQL Assistant API",
         "documentation": "/docs",
@@ -68,5 +158,5 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    print(f"{C.API}[API]{C.RESET} Health check endpoint accessed")
+    api_log.debug("Health check endpoint accessed")
     return {"status": "healthy", "database_backends": ["SQLAlchemy"]}
\ No newline at end of file
@@ -61,8 +61,14 @@ class ChatRequest(BaseModel):
     conversation_id: Optional[str] = None
     message: str
     db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # Defaults to the conversation's db_connection_id
     llm_config: Optional[LLMConfig] = None
     
+class ChatSocketRequest(ChatRequest):
+    """A "chat" frame on /ws/chat"""
+    id: str  # Chosen by the client; every frame about this turn carries it
+    execute: bool = True  # Run generated read-only SQL and stream its rows
+    
 class ChatResponse(BaseModel):
     """Response model for chat API"""
     conversation_id: str
@@ -73,7 +79,9 @@ class ChatResponse(BaseModel):
 class ConversationListResponse(BaseModel):
     """Response model for listing conversations"""
     conversations: List[ConversationResponse]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
     
 class MessageListResponse(BaseModel):
     """Response model for listing messages"""
-    messages: List[MessageResponse]
\ No newline at end of file
+    messages: List[MessageResponse]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
\ No newline at end of file
@@ -1,6 +1,14 @@
 # app/models/db.py
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+class ReplicaEndpoint(BaseModel):
+    """A read replica; fields left empty are taken from the primary connection"""
+    db_host: Optional[str] = Field(None, description="Replica host (or file path for SQLite, via db_name)")
+    db_port: Optional[str] = Field(None, description="Replica port")
+    db_name: Optional[str] = Field(None, description="Database name, if different from the primary")
+    db_user: Optional[str] = Field(None, description="Username, if different from the primary")
+    db_password: Optional[str] = Field(None, description="Password, if different from the primary")
 
 class DbConnectionRequest(BaseModel):
     """Database connection request model"""
@@ -10,7 +18,26 @@ class DbConnectionRequest(BaseModel):
     db_name: str = Field(..., description="Database name or file path for SQLite")
     db_user: Optional[str] = Field(None, description="Database username (not needed for SQLite)")
     db_password: Optional[str] = Field(None, description="Database password (not needed for SQLite)")
+    replicas: Optional[List[ReplicaEndpoint]] = Field(None, description="Read replicas for read-only statements")
     
     class Config:
         # This ensures extra attributes are ignored
-        extra = "ignore"
\ No newline at end of file
+        extra = "ignore"
+
+class ConnectionCreate(DbConnectionRequest):
+    """Register a connection; later requests refer to it by connection_id instead of sending credentials"""
+    name: Optional[str] = Field(None, description="Display name")
+    validate_connection: bool = Field(True, description="Test the connection before saving it")
+
+class ConnectionResponse(BaseModel):
+    """A registered connection (passwords are never returned)"""
+    id: str
+    name: Optional[str] = None
+    db_type: str
+    db_host: Optional[str] = None
+    db_port: Optional[str] = None
+    db_name: str
+    db_user: Optional[str] = None
+    replicas: Optional[List[Dict[str, Any]]] = None
+    created_at: float
+    updated_at: float
@@ -0,0 +1,35 @@
+# app/models/jobs.py
+from pydantic import BaseModel
+from typing import List, Optional, Any
+from app.models.db import DbConnectionRequest
+
+class JobCreate(BaseModel):
+    """Request to run a query as a background job"""
+    sql: str
+    db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # A registered connection; only these jobs are resumed after a restart
+
+class JobResponse(BaseModel):
+    """State of a query job"""
+    id: str
+    status: str  # queued, running, succeeded, failed or cancelled
+    sql: str
+    connection_id: Optional[str] = None
+    rows_fetched: int = 0
+    columns: Optional[List[str]] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: Optional[float] = None  # When the result is deleted
+
+class JobListResponse(BaseModel):
+    jobs: List[JobResponse]
+
+class JobResultPage(BaseModel):
+    """A page of a finished job's rows"""
+    columns: List[str]
+    rows: List[Any]
+    offset: int
+    total: int
+    next_offset: Optional[int] = None
@@ -1,6 +1,6 @@
 # app/models/llm.py
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 class LLMConfigField(BaseModel):
     """Configuration field for an LLM provider"""
@@ -27,6 +27,7 @@ class LLMConfig(BaseModel):
     model: Optional[str] = Field(default=None, description="Model name")
     url: Optional[str] = Field(default=None, description="API URL for custom providers")
     apiKey: Optional[str] = Field(default=None, description="API key for providers like OpenAI")
+    hedge: Optional[Literal["off", "hedge", "candidates"]] = Field(default=None, description="Hedging mode (default: LLM_HEDGE_MODE)")
     
     class Config:
         # This ensures extra attributes are ignored
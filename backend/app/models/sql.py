@@ -2,17 +2,7 @@
 from pydantic import BaseModel, Field
 from typing import List, Any, Dict, Optional
 from app.models.db import DbConnectionRequest
-
-class LLMConfig(BaseModel):
-    """LLM configuration parameters"""
-    provider: str = Field(..., description="LLM provider (ollama, openai, custom)")
-    model: Optional[str] = Field(default=None, description="Model name")
-    url: Optional[str] = Field(default=None, description="API URL for custom providers")
-    apiKey: Optional[str] = Field(default=None, description="API key for providers like OpenAI")
-    
-    class Config:
-        # This ensures extra attributes are ignored
-        extra = "ignore"
+from app.models.llm import LLMConfig
 
 class ChatMessage(BaseModel):
     """Chat message model"""
@@ -23,23 +13,66 @@ class GenerateSQLRequest(BaseModel):
     """Request to generate SQL from natural language"""
     user_prompt: str
     message_history: Optional[List[ChatMessage]] = None
-    db_connection: DbConnectionRequest
+    conversation_id: Optional[str] = None  # Load history server-side instead of sending message_history
+    db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # A registered connection (/connections) instead of db_connection
     llm_config: LLMConfig = Field(...)
     
 class GenerateSQLResponse(BaseModel):
     """Response containing generated SQL"""
     sql: str
-
-class ExecuteSQLRequest(BaseModel):
-    """Request to execute SQL"""
-    sql: str
-    db_connection: DbConnectionRequest
+    model_tier: Optional[str] = None  # "fast" or "full": which model tier produced the SQL
 
 class ExecuteSQLResponse(BaseModel):
     """Response from SQL execution"""
     columns: List[str]
     rows: List[Any]
+    result_id: Optional[str] = None  # Set when the result spilled to disk; page/export/aggregate it via /results
+    total_rows: Optional[int] = None
+
+class BatchGenerateSQLRequest(BaseModel):
+    """Request to generate SQL for many questions against one connection"""
+    prompts: List[str]
+    db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # A registered connection (/connections) instead of db_connection
+    llm_config: LLMConfig = Field(...)
+    execute: bool = False  # Also run each generated query and include its rows
+    concurrency: Optional[int] = None  # Capped at SQL_BATCH_CONCURRENCY
+
+class BatchSQLItem(BaseModel):
+    """One streamed line of a /generate_sql_batch response"""
+    index: int
+    prompt: str
+    success: bool
+    sql: Optional[str] = None
+    result: Optional[ExecuteSQLResponse] = None
+    error: Optional[str] = None
+    model_tier: Optional[str] = None
+    duration_ms: float
+
+class ExecuteSQLRequest(BaseModel):
+    """Request to execute SQL"""
+    sql: str
+    db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # A registered connection (/connections) instead of db_connection
+    question: Optional[str] = None  # The question the SQL answers; successful pairs become few-shot examples
+
+class ExplainSQLRequest(BaseModel):
+    """Request to show how the database would run a statement"""
+    sql: str
+    db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # A registered connection (/connections) instead of db_connection
+    analyze: bool = False  # Also run it for actual rows and times (read-only statements only)
 
+class ExplainSQLResponse(BaseModel):
+    """A normalized query plan with its costliest nodes and candidate indexes"""
+    dialect: str
+    analyzed: bool
+    total_cost: Optional[float] = None  # The planner's estimate, where the dialect gives one
+    total_time_ms: Optional[float] = None  # When analyzed
+    plan: Dict[str, Any]  # Nested nodes: operation, table, index, conditions, estimated/actual rows, cost, time, children
+    hotspots: List[Dict[str, Any]]
+    index_recommendations: List[Dict[str, Any]]
 
 class VisualizationRecommendation(BaseModel):
     """Model for visualization recommendations"""
@@ -54,7 +87,9 @@ class RegenerateSQLRequest(BaseModel):
     """Request to regenerate SQL from failed attempt"""
     user_prompt: str
     message_history: Optional[List[ChatMessage]] = None
-    db_connection: DbConnectionRequest
+    conversation_id: Optional[str] = None  # Load history server-side instead of sending message_history
+    db_connection: Optional[DbConnectionRequest] = None
+    connection_id: Optional[str] = None  # A registered connection (/connections) instead of db_connection
     llm_config: LLMConfig = Field(...)
     failed_sql: str
     error_message: str
\ No newline at end of file
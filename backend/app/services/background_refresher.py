@@ -0,0 +1,84 @@
+# app/services/background_refresher.py
+import asyncio
+import random
+from app.config import settings
+from app.services import replica_router, schema_cache, sql_service
+from app.utils import db_utils
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+log = get_logger("sql")
+
+LAG_SAMPLE_S = 0.5
+
+event_loop_lag = metrics.register(metrics.Gauge(
+    "sql_assistant_event_loop_lag_seconds", "Worst event loop scheduling delay seen in the last refresher interval",
+))
+refresher_rounds_total = metrics.register(metrics.Counter(
+    "sql_assistant_refresher_rounds_total", "Background refresh rounds by outcome (ran, paused)",
+    ("outcome",),
+))
+refresher_actions_total = metrics.register(metrics.Counter(
+    "sql_assistant_refresher_actions_total", "Work done by the background refresher",
+    ("action",),
+))
+
+def under_load(loop_lag: float) -> bool:
+    return (
+        loop_lag * 1000 > settings.REFRESHER_MAX_LOOP_LAG_MS
+        or metrics.requests_in_flight() > settings.REFRESHER_MAX_IN_FLIGHT
+    )
+
+def refresh_threshold() -> float:
+    """Schema age at which to revalidate: shortly before SCHEMA_CACHE_TTL_S, jittered so workers spread out"""
+    jitter = settings.REFRESHER_JITTER
+    return settings.SCHEMA_CACHE_TTL_S * random.uniform(1 - 2 * jitter, 1 - jitter)
+
+async def refresh_connection(fingerprint: str, db_config: dict):
+    """Revalidate a connection's schema before it goes stale and top up its pools"""
+    age = schema_cache.schema_age(fingerprint)
+    if age is None:
+        await asyncio.to_thread(schema_cache.get_schema, db_config, sql_service.reflect_schema)
+        refresher_actions_total.inc(action="schema_load")
+    elif age >= refresh_threshold():
+        schema_cache.schedule_revalidation(db_config, fingerprint, sql_service.reflect_schema)
+        refresher_actions_total.inc(action="schema_revalidate")
+
+    for config in [db_config] + replica_router.replica_configs(db_config):
+        opened = await asyncio.to_thread(db_utils.warm_pool, config, settings.DB_POOL_MIN_WARM)
+        if opened:
+            refresher_actions_total.inc(opened, action="pool_connect")
+
+async def measure_loop_lag(duration: float) -> float:
+    """Sleep for `duration` in short steps and return the worst oversleep, i.e. event loop lag"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    worst = 0.0
+    while loop.time() < deadline:
+        start = loop.time()
+        await asyncio.sleep(LAG_SAMPLE_S)
+        worst = max(worst, loop.time() - start - LAG_SAMPLE_S)
+    return worst
+
+async def run_refresher():
+    """Lifespan task: keep recently used connections' schemas fresh and pools warm, backing off under load"""
+    while True:
+        try:
+            loop_lag = await measure_loop_lag(settings.REFRESHER_INTERVAL_S)
+            event_loop_lag.set(loop_lag)
+            if under_load(loop_lag):
+                refresher_rounds_total.inc(outcome="paused")
+                continue
+
+            refresher_rounds_total.inc(outcome="ran")
+            for fingerprint, db_config in schema_cache.recent_connections(settings.REFRESHER_RECENT_S):
+                if under_load(0.0):
+                    break
+                try:
+                    await refresh_connection(fingerprint, db_config)
+                except Exception as e:
+                    log.warning(f"Background refresh failed for connection {fingerprint}: {str(e)}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning(f"Background refresher error: {str(e)}")
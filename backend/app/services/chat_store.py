@@ -0,0 +1,412 @@
+# app/services/chat_store.py
+import base64
+import os
+import queue
+import threading
+import time
+import uuid
+from sqlalchemy import (
+    JSON, Column, Float, Index, Integer, MetaData, String, Table, Text,
+    and_, create_engine, delete, event, insert, or_, select, update,
+)
+from app.config import settings
+from app.utils.db_utils import is_connection_error
+from app.utils.logger import get_logger
+
+log = get_logger("sql")
+
+_RETRY = object()  # writer wake-up: time to retry a batch that failed
+
+metadata = MetaData()
+
+conversations = Table(
+    "conversations", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(128), nullable=False),
+    Column("title", Text),
+    Column("model_type", String(64)),
+    Column("model_settings", JSON),
+    Column("db_connection_id", String(64)),
+    Column("meta", JSON),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Index("ix_conversations_user_updated", "user_id", "updated_at"),
+)
+
+messages = Table(
+    "messages", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("conversation_id", String(36), nullable=False),
+    Column("role", String(16), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("sql", Text),
+    Column("tokens_used", Integer),
+    Column("meta", JSON),
+    Column("created_at", Float, nullable=False),
+    Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+)
+
+# One row per conversation: the rolled-up summary of every message up to `cursor`
+summaries = Table(
+    "conversation_summaries", metadata,
+    Column("conversation_id", String(36), primary_key=True),
+    Column("summary", Text, nullable=False),
+    Column("sql", JSON),
+    Column("cursor", String(128)),
+    Column("message_count", Integer, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+def encode_cursor(timestamp: float, row_id: str) -> str:
+    """Opaque keyset cursor for (timestamp, id)"""
+    return base64.urlsafe_b64encode(f"{timestamp!r}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return float(timestamp), row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _conversation_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "title": row.title,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "model_type": row.model_type,
+        "model_settings": row.model_settings or {},
+        "db_connection_id": row.db_connection_id,
+        "metadata": row.meta or {},
+    }
+
+def _message_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "conversation_id": row.conversation_id,
+        "role": row.role,
+        "content": row.content,
+        "sql": row.sql,
+        "tokens_used": row.tokens_used,
+        "metadata": row.meta or {},
+        "created_at": row.created_at,
+    }
+
+class ConversationStore:
+    """Conversations and messages on SQLite (WAL) or any SQLAlchemy URL, e.g. Postgres"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(url, pool_pre_ping=not url.startswith("sqlite"))
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", self._configure_sqlite)
+        metadata.create_all(self.engine)
+
+        # Message writes are queued and flushed in batches by a background thread
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    @staticmethod
+    def _configure_sqlite(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+    # Conversations
+
+    def create_conversation(self, user_id: str, title: str = None, model_type: str = None,
+                            model_settings: dict = None, db_connection_id: str = None,
+                            metadata: dict = None, conversation_id: str = None) -> dict:
+        now = time.time()
+        row = {
+            "id": conversation_id or str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": title,
+            "model_type": model_type,
+            "model_settings": model_settings or {},
+            "db_connection_id": db_connection_id,
+            "meta": metadata or {},
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self.engine.begin() as conn:
+            conn.execute(insert(conversations).values(**row))
+        return self.get_conversation(row["id"], user_id)
+
+    def get_conversation(self, conversation_id: str, user_id: str = None):
+        self.flush()
+        query = select(conversations).where(conversations.c.id == conversation_id)
+        if user_id is not None:
+            query = query.where(conversations.c.user_id == user_id)
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        return _conversation_dict(row) if row else None
+
+    def list_conversations(self, user_id: str, limit: int = 50, cursor: str = None) -> tuple:
+        """Most recently updated first; returns (conversations, next_cursor)"""
+        self.flush()
+        c = conversations.c
+        query = select(conversations).where(c.user_id == user_id)
+        if cursor:
+            updated_at, row_id = decode_cursor(cursor)
+            query = query.where(or_(c.updated_at < updated_at, and_(c.updated_at == updated_at, c.id < row_id)))
+        query = query.order_by(c.updated_at.desc(), c.id.desc()).limit(limit + 1)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        next_cursor = encode_cursor(rows[limit - 1].updated_at, rows[limit - 1].id) if len(rows) > limit else None
+        return [_conversation_dict(r) for r in rows[:limit]], next_cursor
+
+    def update_conversation(self, conversation_id: str, user_id: str, **changes):
+        values = {k: v for k, v in changes.items() if v is not None}
+        if "metadata" in values:
+            values["meta"] = values.pop("metadata")
+        values["updated_at"] = time.time()
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(conversations)
+                .where(conversations.c.id == conversation_id, conversations.c.user_id == user_id)
+                .values(**values)
+            )
+        if result.rowcount == 0:
+            return None
+        return self.get_conversation(conversation_id, user_id)
+
+    def delete_conversation(self, conversation_id: str, user_id: str) -> bool:
+        self.flush()
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(conversations).where(conversations.c.id == conversation_id, conversations.c.user_id == user_id)
+            )
+            if result.rowcount:
+                conn.execute(delete(messages).where(messages.c.conversation_id == conversation_id))
+                conn.execute(delete(summaries).where(summaries.c.conversation_id == conversation_id))
+        return bool(result.rowcount)
+
+    # Messages
+
+    def append_message(self, conversation_id: str, role: str, content: str, sql: str = None,
+                       tokens_used: int = None, metadata: dict = None) -> dict:
+        """Queue a message for the batched writer and return it immediately"""
+        row = {
+            "id": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "sql": sql,
+            "tokens_used": tokens_used,
+            "meta": metadata or {},
+            "created_at": time.time(),
+        }
+        self._ensure_writer()
+        with self._writer_lock:
+            self._pending += 1
+        self._queue.put(row)
+
+        message = dict(row)
+        message["metadata"] = message.pop("meta")
+        return message
+
+    def list_messages(self, conversation_id: str, limit: int = 100, cursor: str = None) -> tuple:
+        """Oldest first; returns (messages, next_cursor)"""
+        self.flush()
+        c = messages.c
+        query = select(messages).where(c.conversation_id == conversation_id)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            query = query.where(or_(c.created_at > created_at, and_(c.created_at == created_at, c.id > row_id)))
+        query = query.order_by(c.created_at, c.id).limit(limit + 1)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+        return [_message_dict(r) for r in rows[:limit]], next_cursor
+
+    def recent_messages(self, conversation_id: str, limit: int, after: str = None) -> list:
+        """The last `limit` messages of a conversation (newer than cursor `after`), oldest first"""
+        self.flush()
+        c = messages.c
+        query = select(messages).where(c.conversation_id == conversation_id)
+        if after:
+            created_at, row_id = decode_cursor(after)
+            query = query.where(or_(c.created_at > created_at, and_(c.created_at == created_at, c.id > row_id)))
+        query = query.order_by(c.created_at.desc(), c.id.desc()).limit(limit)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [_message_dict(r) for r in reversed(rows)]
+
+    # Summaries
+
+    def get_summary(self, conversation_id: str):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(summaries).where(summaries.c.conversation_id == conversation_id)).first()
+        if row is None:
+            return None
+        return {
+            "summary": row.summary,
+            "sql": row.sql or [],
+            "cursor": row.cursor,
+            "message_count": row.message_count,
+            "updated_at": row.updated_at,
+        }
+
+    def save_summary(self, conversation_id: str, summary: str, sql: list, cursor: str, message_count: int):
+        values = {
+            "summary": summary,
+            "sql": sql,
+            "cursor": cursor,
+            "message_count": message_count,
+            "updated_at": time.time(),
+        }
+        with self.engine.begin() as conn:
+            result = conn.execute(update(summaries).where(summaries.c.conversation_id == conversation_id).values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(summaries).values(conversation_id=conversation_id, **values))
+
+    # Batched writer
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="chat-store-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        batch, waiters = [], []
+        # After a failed write the rows stay in `batch` and are retried at `retry_at`, backing off
+        retry_at, delay = None, 0.0
+        while True:
+            timeout = None if retry_at is None else max(retry_at - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _RETRY
+            stop = item is None
+            if not stop and item is not _RETRY:
+                self._collect(item, batch, waiters)
+
+                # Gather whatever else arrives within the flush window, up to the batch size
+                deadline = time.monotonic() + settings.CHAT_STORE_FLUSH_MS / 1000
+                while len(batch) < settings.CHAT_STORE_BATCH_SIZE:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    self._collect(item, batch, waiters)
+                    if waiters:
+                        # Someone is blocked on a read; write now instead of waiting out the window
+                        break
+
+            if stop or retry_at is None or time.monotonic() >= retry_at:
+                failed = self._write_batch(batch)
+                with self._writer_lock:
+                    self._pending -= len(batch) - len(failed)
+                batch = failed
+                if failed:
+                    delay = min(max(delay * 2, 0.1), settings.CHAT_STORE_RETRY_MAX_S)
+                    retry_at = time.monotonic() + delay
+                else:
+                    retry_at, delay = None, 0.0
+            # While backing off, flush() returns at once and reports that rows are still unwritten
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+            if stop:
+                if batch:
+                    log.error(f"Closing with {len(batch)} messages the database could not take")
+                return
+
+    @staticmethod
+    def _collect(item, batch: list, waiters: list):
+        if isinstance(item, threading.Event):
+            waiters.append(item)
+        else:
+            batch.append(item)
+
+    def _write_batch(self, batch: list) -> list:
+        """Insert messages; returns the ones to retry (all of them while the database is unreachable)"""
+        if not batch:
+            return []
+        try:
+            self._insert(batch)
+            log.debug(f"Wrote {len(batch)} messages")
+            return []
+        except Exception as e:
+            if is_connection_error(e):
+                log.warning(f"Could not write {len(batch)} messages, retrying: {str(e)}")
+                return batch
+            log.warning(f"Batch of {len(batch)} messages rejected, writing them one by one: {str(e)}")
+
+        # Only the rows the database itself rejects are given up on
+        failed = []
+        for row in batch:
+            try:
+                self._insert([row])
+            except Exception as e:
+                if is_connection_error(e):
+                    failed.append(row)
+                else:
+                    log.error(f"Dropped message {row['id']} of conversation {row['conversation_id']}: {str(e)}")
+        return failed
+
+    def _insert(self, rows: list):
+        latest = {}
+        for row in rows:
+            latest[row["conversation_id"]] = max(latest.get(row["conversation_id"], 0), row["created_at"])
+        with self.engine.begin() as conn:
+            conn.execute(insert(messages), rows)
+            for conversation_id, updated_at in latest.items():
+                conn.execute(
+                    update(conversations).where(conversations.c.id == conversation_id).values(updated_at=updated_at)
+                )
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued message is written (read-your-writes for the caller); False if some are not yet"""
+        if self._pending == 0 or self._writer is None or not self._writer.is_alive():
+            return self._pending == 0
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+        return self._pending == 0
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        self.engine.dispose()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_chat_store() -> ConversationStore:
+    """Shared conversation store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = settings.CHAT_STORE_URL
+                if not url:
+                    os.makedirs(settings.DATA_DIR, exist_ok=True)
+                    url = f"sqlite:///{os.path.join(settings.DATA_DIR, 'chat.db')}"
+                _store = ConversationStore(url)
+                log.info(f"Conversation store ready ({_store.engine.dialect.name})")
+    return _store
+
+def close_chat_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -0,0 +1,163 @@
+# app/services/column_profiler.py
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.services import replica_router, schema_cache
+from app.utils.db_utils import connection_fingerprint, profile_table
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+log = get_logger("sql")
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+column_hint_lookups_total = metrics.register(metrics.Counter(
+    "sql_assistant_column_hint_lookups_total", "Prompts by whether sampled column values were included",
+    ("result",),
+))
+
+class ConnectionProfile:
+    """Sampled column values per table for one connection, valid for one catalog version"""
+
+    def __init__(self, catalog_version: str, tables: dict = None):
+        self.catalog_version = catalog_version
+        self.tables = tables or {}  # table -> {"profiled_at": epoch seconds, "columns": {column: hint}}
+
+_profiles = {}
+_lock = threading.Lock()
+_scheduled = set()
+# Profiling queries run off the request path, one table at a time
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="column-profiler")
+
+def profile_path(fingerprint: str) -> str:
+    """Stored next to the connection's schema snapshot"""
+    return os.path.join(schema_cache.cache_dir(), f"{fingerprint}.profile.json")
+
+def load_profile(fingerprint: str, catalog_version: str) -> ConnectionProfile:
+    """The profile for a connection from memory or disk; empty if missing or taken on another schema
+
+    `fingerprint` must be connection_fingerprint(), which covers the password: profiles hold real
+    column values, so a caller only ever sees those sampled with the credentials it presented.
+    """
+    profile = _profiles.get(fingerprint)
+    if profile is None:
+        try:
+            with open(profile_path(fingerprint)) as f:
+                data = json.load(f)
+            profile = ConnectionProfile(data["catalog_version"], data["tables"])
+        except FileNotFoundError:
+            profile = ConnectionProfile(catalog_version)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Ignoring unreadable column profile for {fingerprint}: {str(e)}")
+            profile = ConnectionProfile(catalog_version)
+        _profiles[fingerprint] = profile
+    if catalog_version and profile.catalog_version != catalog_version:
+        # Columns may have been added, dropped or retyped since; start over
+        profile = _profiles[fingerprint] = ConnectionProfile(catalog_version)
+    return profile
+
+def save_profile(fingerprint: str, profile: ConnectionProfile):
+    directory = schema_cache.cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{fingerprint}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"catalog_version": profile.catalog_version, "tables": profile.tables}, f, separators=(",", ":"))
+        os.replace(tmp_path, profile_path(fingerprint))
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def usable_hints(hints: dict) -> dict:
+    """Drop value lists that look like free text rather than codes or categories"""
+    limit = settings.COLUMN_PROFILE_MAX_VALUE_CHARS
+    return {
+        column: hint for column, hint in hints.items()
+        if "values" not in hint or all(len(value) <= limit for value in hint["values"])
+    }
+
+def profile_tables(db_config: dict, fingerprint: str, profile: ConnectionProfile, tables: dict):
+    """Sample each table and persist the profile; a failing table is skipped until the next schedule"""
+    start_time = time.time()
+    try:
+        for table_name, columns in tables.items():
+            try:
+                # Sampling only reads, so it goes to a replica when the connection has one
+                hints = replica_router.execute_read(
+                    f"profile {table_name}", db_config,
+                    lambda _, config: profile_table(
+                        config, table_name, columns,
+                        settings.COLUMN_PROFILE_SAMPLE_ROWS, settings.COLUMN_PROFILE_MAX_DISTINCT,
+                    ),
+                )
+            except Exception as e:
+                log.warning(f"Could not profile table {table_name}: {str(e)}")
+                continue
+            profile.tables[table_name] = {"profiled_at": time.time(), "columns": usable_hints(hints)}
+        save_profile(fingerprint, profile)
+        log.info(f"Profiled {len(tables)} tables for connection {fingerprint} in {time.time() - start_time:.2f}s")
+    except Exception as e:
+        log.warning(f"Column profiling failed for {fingerprint}: {str(e)}")
+    finally:
+        with _lock:
+            _scheduled.difference_update((fingerprint, table_name) for table_name in tables)
+
+def schedule_profiling(db_config: dict, fingerprint: str, profile: ConnectionProfile, tables: dict):
+    with _lock:
+        tables = {name: columns for name, columns in tables.items() if (fingerprint, name) not in _scheduled}
+        _scheduled.update((fingerprint, name) for name in tables)
+    if tables:
+        _executor.submit(profile_tables, dict(db_config), fingerprint, profile, tables)
+
+def select_tables(question: str, schema_dict: dict, limit: int) -> list:
+    """Tables the question most likely refers to, by table and column names it mentions"""
+    words = set(_WORD.findall(question.lower()))
+    scored = []
+    for table_name, columns in schema_dict.items():
+        name = table_name.lower()
+        score = 2 if name in words or name.rstrip("s") in words or f"{name}s" in words else 0
+        score += sum(1 for entry in columns if entry.split(" (")[0].lower() in words)
+        if score:
+            scored.append((score, table_name))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [table_name for _, table_name in scored[:limit]]
+
+def column_hints(db_config: dict, question: str, schema_dict: dict) -> dict:
+    """{table: {column: hint}} of sampled values for the tables the question is about
+
+    Never waits for the database: tables not yet profiled (or profiled more than
+    COLUMN_PROFILE_TTL_S ago) are queued for the background profiler and left out this time.
+    """
+    if not settings.COLUMN_PROFILE_ENABLED or not schema_dict:
+        return {}
+
+    fingerprint = connection_fingerprint(db_config)  # credential-bound; see load_profile
+    profile = load_profile(fingerprint, schema_cache.catalog_version(db_config))
+    selected = select_tables(question, schema_dict, settings.COLUMN_PROFILE_PROMPT_TABLES)
+
+    now = time.time()
+    due = [
+        name for name in selected
+        if name not in profile.tables or now - profile.tables[name]["profiled_at"] > settings.COLUMN_PROFILE_TTL_S
+    ]
+    if not profile.tables:
+        # First use of this connection: profile the rest of the schema too, question's tables first
+        due += [name for name in sorted(schema_dict) if name not in due]
+    if due:
+        due = due[:settings.COLUMN_PROFILE_MAX_TABLES]
+        schedule_profiling(db_config, fingerprint, profile, {name: schema_dict[name] for name in due})
+
+    hints = {
+        name: profile.tables[name]["columns"] for name in selected
+        if name in profile.tables and profile.tables[name]["columns"]
+    }
+    column_hint_lookups_total.inc(result="hit" if hints else "miss")
+    return hints
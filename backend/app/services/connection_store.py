@@ -0,0 +1,196 @@
+# app/services/connection_store.py
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from sqlalchemy import (
+    Column, Float, Index, MetaData, String, Table, Text,
+    create_engine, delete, event, insert, select, update,
+)
+from app.config import settings
+from app.services.chat_store import ConversationStore
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger
+
+fernet = lazy_import("cryptography.fernet")
+
+log = get_logger("sql")
+
+metadata = MetaData()
+
+# The whole connection config (host, user, password, replicas) is stored as one Fernet token
+connections = Table(
+    "connections", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(128), nullable=False),
+    Column("name", Text),
+    Column("config", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Index("ix_connections_user_created", "user_id", "created_at"),
+)
+
+SECRET_FIELDS = ("db_password",)
+
+def public_config(config: dict) -> dict:
+    """A connection config without passwords (also for replicas), safe to return to clients"""
+    public = {key: value for key, value in config.items() if key not in SECRET_FIELDS}
+    if config.get("replicas"):
+        public["replicas"] = [
+            {key: value for key, value in replica.items() if key not in SECRET_FIELDS}
+            for replica in config["replicas"]
+        ]
+    return public
+
+def load_keys() -> list:
+    """Fernet keys from CONNECTION_ENCRYPTION_KEYS (first encrypts, all decrypt), else a generated key file"""
+    if settings.CONNECTION_ENCRYPTION_KEYS:
+        return [key.strip() for key in settings.CONNECTION_ENCRYPTION_KEYS.split(",") if key.strip()]
+
+    path = os.path.join(settings.DATA_DIR, "connection.key")
+    if not os.path.exists(path):
+        os.makedirs(settings.DATA_DIR, exist_ok=True)
+        # Written in full under a temp name, then linked into place: a worker that loses the race
+        # reads the winner's complete key, never a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=settings.DATA_DIR, prefix=".connection.", suffix=".key")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(fernet.Fernet.generate_key())
+                f.flush()
+                os.fsync(f.fileno())
+            os.link(tmp_path, path)
+            log.warning(f"Generated a connection encryption key at {path}; set CONNECTION_ENCRYPTION_KEYS in production")
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    with open(path, "rb") as f:
+        return [f.read().strip().decode("ascii")]
+
+class ConnectionStore:
+    """Registered database connections, encrypted at rest
+
+    Every lookup reads the row, so an update or delete by another worker shows at once; only
+    the decrypted config is cached, for as long as the row's ciphertext is unchanged.
+    """
+
+    def __init__(self, url: str, keys: list):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", ConversationStore._configure_sqlite)
+        metadata.create_all(self.engine)
+        self._cipher = fernet.MultiFernet([fernet.Fernet(key) for key in keys])
+        self._configs = {}  # id -> (ciphertext, decrypted config)
+        self._lock = threading.Lock()
+
+    def _encrypt(self, config: dict) -> str:
+        return self._cipher.encrypt(json.dumps(config).encode("utf-8")).decode("ascii")
+
+    def _decrypt(self, token: str) -> dict:
+        return json.loads(self._cipher.decrypt(token.encode("ascii")))
+
+    def _entry(self, row) -> tuple:
+        """(user_id, name, config, created_at, updated_at) of a row, decrypting only if its ciphertext changed"""
+        cached = self._configs.get(row.id)
+        if cached is not None and cached[0] == row.config:
+            config = cached[1]
+        else:
+            config = self._decrypt(row.config)
+            with self._lock:
+                self._configs[row.id] = (row.config, config)
+        return (row.user_id, row.name, config, row.created_at, row.updated_at)
+
+    def _load(self, connection_id: str):
+        """(user_id, name, config, created_at, updated_at), or None if there is no such connection"""
+        with self.engine.connect() as conn:
+            row = conn.execute(select(connections).where(connections.c.id == connection_id)).first()
+        if row is None:
+            with self._lock:
+                self._configs.pop(connection_id, None)
+            return None
+        return self._entry(row)
+
+    @staticmethod
+    def _record(connection_id: str, entry: tuple) -> dict:
+        user_id, name, config, created_at, updated_at = entry
+        return {
+            "id": connection_id, "name": name, **public_config(config),
+            "created_at": created_at, "updated_at": updated_at,
+        }
+
+    def create(self, user_id: str, name: str, config: dict) -> dict:
+        now = time.time()
+        connection_id = str(uuid.uuid4())
+        token = self._encrypt(config)
+        with self.engine.begin() as conn:
+            conn.execute(insert(connections).values(
+                id=connection_id, user_id=user_id, name=name, config=token,
+                created_at=now, updated_at=now,
+            ))
+        with self._lock:
+            self._configs[connection_id] = (token, config)
+        return self._record(connection_id, (user_id, name, config, now, now))
+
+    def get(self, connection_id: str, user_id: str):
+        """Public record (no passwords), or None if missing or owned by someone else"""
+        entry = self._load(connection_id)
+        if entry is None or entry[0] != user_id:
+            return None
+        return self._record(connection_id, entry)
+
+    def get_config(self, connection_id: str, user_id: str):
+        """Full decrypted config for connecting, or None if missing or owned by someone else"""
+        entry = self._load(connection_id)
+        if entry is None or entry[0] != user_id:
+            return None
+        return dict(entry[2])
+
+    def list(self, user_id: str) -> list:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(connections).where(connections.c.user_id == user_id).order_by(connections.c.created_at)
+            ).all()
+        return [self._record(row.id, self._entry(row)) for row in rows]
+
+    def update(self, connection_id: str, user_id: str, name: str, config: dict):
+        entry = self._load(connection_id)
+        if entry is None or entry[0] != user_id:
+            return None
+        now = time.time()
+        token = self._encrypt(config)
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(connections).where(connections.c.id == connection_id)
+                .values(name=name, config=token, updated_at=now)
+            )
+        with self._lock:
+            self._configs[connection_id] = (token, config)
+        return self._record(connection_id, (user_id, name, config, entry[3], now))
+
+    def delete(self, connection_id: str, user_id: str) -> bool:
+        entry = self._load(connection_id)
+        if entry is None or entry[0] != user_id:
+            return False
+        with self.engine.begin() as conn:
+            conn.execute(delete(connections).where(connections.c.id == connection_id))
+        with self._lock:
+            self._configs.pop(connection_id, None)
+        return True
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_connection_store() -> ConnectionStore:
+    """Shared connection registry, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = settings.CONNECTION_STORE_URL
+                if not url:
+                    os.makedirs(settings.DATA_DIR, exist_ok=True)
+                    url = f"sqlite:///{os.path.join(settings.DATA_DIR, 'connections.db')}"
+                _store = ConnectionStore(url, load_keys())
+    return _store
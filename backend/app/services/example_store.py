@@ -0,0 +1,262 @@
+# app/services/example_store.py
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from sqlalchemy import (
+    Column, Float, Index, Integer, MetaData, String, Table, Text,
+    create_engine, delete, event, insert, select, update,
+)
+from app.config import settings
+from app.services.chat_store import ConversationStore
+from app.utils.db_utils import is_read_only
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+log = get_logger("sql")
+
+metadata = MetaData()
+
+examples = Table(
+    "examples", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("connection", String(64), nullable=False),
+    Column("question", Text, nullable=False),
+    Column("normalized", Text, nullable=False),
+    Column("sql", Text, nullable=False),
+    Column("uses", Integer, nullable=False, default=0),
+    Column("failures", Integer, nullable=False, default=0),
+    Column("created_at", Float, nullable=False),
+    Column("last_used_at", Float, nullable=False),
+    Index("ix_examples_connection_normalized", "connection", "normalized", unique=True),
+)
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = frozenset(
+    "a an the of for to in on at by with from and or is are was were be been me my our all any "
+    "show list give get find what which who how many much please i we you it this that those these".split()
+)
+
+example_lookups_total = metrics.register(metrics.Counter(
+    "sql_assistant_example_lookups_total", "Few-shot example lookups by whether any example was injected",
+    ("result",),
+))
+
+def normalize_question(question: str) -> str:
+    return " ".join(_TOKEN.findall(question.lower()))
+
+def question_terms(question: str) -> Counter:
+    """Content words plus adjacent-word bigrams, used as the similarity vector"""
+    words = [w for w in _TOKEN.findall(question.lower()) if w not in _STOPWORDS]
+    terms = Counter(words)
+    terms.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return terms
+
+class ConnectionIndex:
+    """In-memory TF-IDF index over one connection's examples"""
+
+    def __init__(self):
+        self.entries = {}  # id -> (terms, example dict)
+        self.doc_freq = Counter()
+
+    def add(self, example: dict):
+        self.remove(example["id"])
+        terms = question_terms(example["question"])
+        self.entries[example["id"]] = (terms, example)
+        self.doc_freq.update(terms.keys())
+
+    def remove(self, example_id: str):
+        entry = self.entries.pop(example_id, None)
+        if entry is not None:
+            self.doc_freq.subtract(entry[0].keys())
+
+    def _weights(self, terms: Counter) -> dict:
+        total = len(self.entries) + 1
+        return {t: c * math.log(total / (1 + self.doc_freq.get(t, 0)) + 1) for t, c in terms.items()}
+
+    def search(self, question: str, k: int, min_score: float) -> list:
+        """Top-k (score, example) by cosine similarity of question terms"""
+        query = self._weights(question_terms(question))
+        query_norm = math.sqrt(sum(w * w for w in query.values()))
+        if not query_norm:
+            return []
+
+        scored = []
+        for terms, example in self.entries.values():
+            if not terms.keys() & query.keys():
+                continue
+            weights = self._weights(terms)
+            dot = sum(query[t] * weights[t] for t in query.keys() & weights.keys())
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            score = dot / (query_norm * norm) if norm else 0.0
+            # Examples that later failed are ranked down
+            score /= 1 + example["failures"]
+            if score >= min_score:
+                scored.append((score, example))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:k]
+
+def _example_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "question": row.question,
+        "sql": row.sql,
+        "uses": row.uses,
+        "failures": row.failures,
+        "created_at": row.created_at,
+        "last_used_at": row.last_used_at,
+    }
+
+class ExampleStore:
+    """Per-connection (question, SQL) pairs that executed successfully, with local similarity search"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", ConversationStore._configure_sqlite)
+        metadata.create_all(self.engine)
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self._records_since_prune = 0
+
+    def _index(self, connection: str) -> ConnectionIndex:
+        index = self._indexes.get(connection)
+        if index is not None:
+            return index
+        with self._lock:
+            index = self._indexes.get(connection)
+            if index is None:
+                index = ConnectionIndex()
+                with self.engine.connect() as conn:
+                    for row in conn.execute(select(examples).where(examples.c.connection == connection)):
+                        if is_read_only(row.sql):  # Writes recorded before record() refused them
+                            index.add(_example_dict(row))
+                self._indexes[connection] = index
+        return index
+
+    def record(self, connection: str, question: str, sql: str):
+        """Store a question and the SQL that answered it; re-recording a question replaces its SQL
+
+        Only read-only statements are kept: an INSERT, UPDATE or DROP retrieved into a later
+        prompt would nudge the model toward writing.
+        """
+        normalized = normalize_question(question)
+        if not normalized or not sql.strip() or not is_read_only(sql):
+            return
+        now = time.time()
+        index = self._index(connection)
+        with self._lock:
+            with self.engine.begin() as conn:
+                row = conn.execute(
+                    select(examples).where(examples.c.connection == connection, examples.c.normalized == normalized)
+                ).first()
+                if row is None:
+                    example = {
+                        "id": str(uuid.uuid4()), "question": question, "sql": sql,
+                        "uses": 0, "failures": 0, "created_at": now, "last_used_at": now,
+                    }
+                    conn.execute(insert(examples).values(connection=connection, normalized=normalized, **example))
+                else:
+                    example = dict(_example_dict(row), question=question, sql=sql, failures=0, last_used_at=now)
+                    conn.execute(
+                        update(examples).where(examples.c.id == row.id)
+                        .values(question=question, sql=sql, failures=0, last_used_at=now)
+                    )
+            index.add(example)
+            self._records_since_prune += 1
+            prune_due = self._records_since_prune >= settings.EXAMPLE_PRUNE_EVERY
+            if prune_due:
+                self._records_since_prune = 0
+        if prune_due:
+            self.prune(connection)
+
+    def record_failure(self, connection: str, sql: str):
+        """Count a failed execution against every example whose SQL matches"""
+        index = self._index(connection)
+        with self._lock:
+            matches = [example for _, example in index.entries.values() if example["sql"].strip() == sql.strip()]
+            if not matches:
+                return
+            with self.engine.begin() as conn:
+                for example in matches:
+                    example["failures"] += 1
+                    conn.execute(update(examples).where(examples.c.id == example["id"]).values(failures=example["failures"]))
+        log.debug(f"Recorded failure against {len(matches)} stored examples")
+
+    def similar(self, connection: str, question: str, k: int = None, token_budget: int = None) -> list:
+        """Top-k similar examples whose combined size fits the token budget; marks them as used"""
+        k = k or settings.EXAMPLE_TOP_K
+        budget = settings.EXAMPLE_TOKEN_BUDGET if token_budget is None else token_budget
+        index = self._index(connection)
+        with self._lock:
+            ranked = index.search(question, k, settings.EXAMPLE_MIN_SCORE)
+
+        chosen, used = [], 0
+        for _, example in ranked:
+            if normalize_question(example["question"]) == normalize_question(question) and example["failures"]:
+                # The same question already failed with this SQL; don't steer the model back to it
+                continue
+            cost = metrics.estimate_tokens(example["question"]) + metrics.estimate_tokens(example["sql"])
+            if used + cost > budget:
+                continue
+            chosen.append(example)
+            used += cost
+
+        example_lookups_total.inc(result="hit" if chosen else "miss")
+        if chosen:
+            now = time.time()
+            for example in chosen:
+                example["uses"] += 1
+                example["last_used_at"] = now
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(examples).where(examples.c.id.in_([e["id"] for e in chosen]))
+                    .values(uses=examples.c.uses + 1, last_used_at=now)
+                )
+        return [{"question": e["question"], "sql": e["sql"]} for e in chosen]
+
+    def prune(self, connection: str):
+        """Drop examples that keep failing, have gone unused for too long, or exceed the per-connection cap"""
+        now = time.time()
+        max_age = settings.EXAMPLE_MAX_AGE_DAYS * 86400
+        index = self._index(connection)
+        with self._lock:
+            entries = [example for _, example in index.entries.values()]
+            doomed = {
+                e["id"] for e in entries
+                if e["failures"] >= settings.EXAMPLE_MAX_FAILURES and e["failures"] > e["uses"]
+                or now - e["last_used_at"] > max_age
+            }
+            # Over the cap: keep the most useful, most recently used
+            survivors = sorted(
+                (e for e in entries if e["id"] not in doomed),
+                key=lambda e: (e["uses"] - 2 * e["failures"], e["last_used_at"]),
+                reverse=True,
+            )
+            doomed.update(e["id"] for e in survivors[settings.EXAMPLE_MAX_PER_CONNECTION:])
+            if not doomed:
+                return
+            with self.engine.begin() as conn:
+                conn.execute(delete(examples).where(examples.c.id.in_(doomed)))
+            for example_id in doomed:
+                index.remove(example_id)
+        log.info(f"Pruned {len(doomed)} stored examples for connection {connection}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_example_store() -> ExampleStore:
+    """Shared example store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = settings.EXAMPLE_STORE_URL
+                if not url:
+                    os.makedirs(settings.DATA_DIR, exist_ok=True)
+                    url = f"sqlite:///{os.path.join(settings.DATA_DIR, 'examples.db')}"
+                _store = ExampleStore(url)
+    return _store
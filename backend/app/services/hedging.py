@@ -0,0 +1,101 @@
+# app/services/hedging.py
+import asyncio
+import re
+import threading
+from collections import deque
+from app.config import settings
+
+_SQL_START = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE|MERGE|CREATE|ALTER|DROP|SHOW|DESCRIBE|PRAGMA|EXPLAIN)\b", re.IGNORECASE)
+
+class LatencyWindow:
+    """Most recent successful call latencies (seconds) for one provider/model"""
+
+    def __init__(self, size: int):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float):
+        """Nearest-rank percentile, or None until there are enough samples to trust it"""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if len(ordered) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+_windows = {}
+_windows_lock = threading.Lock()
+
+def latency_window(provider: str, model: str) -> LatencyWindow:
+    key = (provider, model or "")
+    window = _windows.get(key)
+    if window is None:
+        with _windows_lock:
+            window = _windows.setdefault(key, LatencyWindow(settings.LLM_HEDGE_WINDOW))
+    return window
+
+def hedge_delay(provider: str, model: str) -> float:
+    """How long to wait on the first call before firing the hedge"""
+    observed = latency_window(provider, model).percentile(settings.LLM_HEDGE_PERCENTILE)
+    if observed is None:
+        return settings.LLM_HEDGE_DEFAULT_DELAY_MS / 1000
+    return max(observed, settings.LLM_HEDGE_MIN_DELAY_MS / 1000)
+
+def looks_like_sql(sql: str) -> bool:
+    """Cheap check that a completion parsed into a statement rather than prose"""
+    return bool(sql) and bool(_SQL_START.match(sql))
+
+async def race(attempts: list, validate, delay: float = None) -> tuple:
+    """Run (label, factory) attempts and return (label, result, launched) for the first valid result
+
+    Without a delay every attempt starts at once. With one, only the first starts; the rest
+    are launched once it has been outstanding for `delay` seconds or has failed. Losers are
+    cancelled. If nothing validates, the first successful result is returned with a None
+    label, and if every attempt raised, the first error is re-raised.
+    """
+    loop = asyncio.get_running_loop()
+    waiting = list(attempts)
+    running = {}
+    errors = []
+    fallback = None
+
+    def launch(count: int):
+        for label, factory in waiting[:count]:
+            running[asyncio.create_task(factory())] = label
+        del waiting[:count]
+
+    launch(1 if delay is not None else len(waiting))
+    deadline = loop.time() + delay if delay is not None else None
+    try:
+        while running or waiting:
+            timeout = max(deadline - loop.time(), 0) if waiting and running else None
+            if running:
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                done = set()
+
+            for task in done:
+                label = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if await validate(result):
+                    return label, result, len(attempts) - len(waiting)
+                if fallback is None:
+                    fallback = result
+
+            if waiting and (not running or loop.time() >= deadline):
+                launch(len(waiting))
+
+        if fallback is not None:
+            return None, fallback, len(attempts)
+        raise errors[0]
+    finally:
+        for task in running:
+            task.cancel()
@@ -0,0 +1,424 @@
+# app/services/job_queue.py
+#
+# Long-running queries as jobs: submit returns at once, a bounded worker pool runs
+# the statement (at most JOB_MAX_RUNNING_PER_USER per user), rows are written to a
+# spill file kept for JOB_RESULT_TTL_S, and state is persisted in the job store so
+# clients can poll any worker and jobs survive a restart.
+import asyncio
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.services import replica_router, result_store
+from app.utils import db_utils, metrics
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger, truncate
+
+# Both stores pull in SQLAlchemy; load them on first use, not at startup
+job_store = lazy_import("app.services.job_store")
+connection_store = lazy_import("app.services.connection_store")
+
+log = get_logger("sql")
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Identifies this worker process in the store, so restart recovery leaves other live workers' jobs alone.
+# The per-boot nonce tells a restarted container (same hostname, often the same pid) from its previous run.
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+jobs_total = metrics.register(metrics.Counter(
+    "sql_assistant_jobs_total", "Finished query jobs by final status",
+    ("status",),
+))
+
+class JobLimitError(Exception):
+    """The user already has JOB_MAX_QUEUED_PER_USER unfinished jobs"""
+
+class Job:
+    """A query job as this worker tracks it; db_config (with credentials) lives in memory only"""
+
+    def __init__(self, record: dict, db_config: dict = None):
+        self.id = record["id"]
+        self.user_id = record["user_id"]
+        self.sql = record["sql"]
+        self.connection_id = record.get("connection_id")
+        self.status = record["status"]
+        self.rows_fetched = record.get("rows_fetched") or 0
+        self.columns = json.loads(record["columns"]) if record.get("columns") else None
+        self.error = record.get("error")
+        self.created_at = record["created_at"]
+        self.started_at = record.get("started_at")
+        self.finished_at = record.get("finished_at")
+        self.expires_at = record.get("expires_at")
+        self.db_config = db_config
+        self.cancel_requested = threading.Event()
+        self.dbapi_connection = None
+        self.persisted_at = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "sql": self.sql,
+            "connection_id": self.connection_id,
+            "rows_fetched": self.rows_fetched,
+            "columns": self.columns,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+        }
+
+    def persist(self, **extra):
+        values = self.to_dict()
+        del values["id"], values["sql"], values["connection_id"], values["created_at"]
+        values["columns"] = json.dumps(self.columns) if self.columns is not None else None
+        values.update(extra)
+        job_store.get_job_store().update(self.id, **values)
+        self.persisted_at = time.monotonic()
+
+    def persist_progress(self):
+        """Rows fetched so far; leaves status alone so a cancel recorded by another worker isn't overwritten"""
+        columns = json.dumps(self.columns) if self.columns is not None else None
+        job_store.get_job_store().update(self.id, rows_fetched=self.rows_fetched, columns=columns)
+        self.persisted_at = time.monotonic()
+
+_jobs = {}  # id -> Job, for jobs this worker queued or ran
+_pending = deque()
+_running = Counter()  # user_id -> jobs running in this worker
+_lock = threading.Lock()
+_executor = None
+_stopping = False
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.JOB_WORKERS, thread_name_prefix="job")
+    return _executor
+
+def result_dir() -> str:
+    return settings.JOB_RESULT_DIR or os.path.join(settings.DATA_DIR, "jobs")
+
+def result_path(job_id: str) -> str:
+    return os.path.join(result_dir(), f"{job_id}.res")
+
+def dispatch():
+    """Start queued jobs in order while workers are free, skipping users at their concurrency limit"""
+    executor = get_executor()
+    with _lock:
+        if _stopping:
+            return
+        for job in list(_pending):
+            if sum(_running.values()) >= settings.JOB_WORKERS:
+                break
+            if _running[job.user_id] >= settings.JOB_MAX_RUNNING_PER_USER:
+                continue
+            _pending.remove(job)
+            _running[job.user_id] += 1
+            executor.submit(run_job, job)
+
+def submit(user_id: str, sql: str, db_config: dict, connection_id: str = None) -> dict:
+    """Queue a query; returns the job at once"""
+    unfinished = sum(1 for job in list(_jobs.values()) if job.user_id == user_id and job.status not in FINISHED)
+    if unfinished >= settings.JOB_MAX_QUEUED_PER_USER:
+        raise JobLimitError(f"At most {settings.JOB_MAX_QUEUED_PER_USER} unfinished jobs per user")
+
+    record = {
+        "id": str(uuid.uuid4()), "user_id": user_id, "status": QUEUED, "sql": sql,
+        "connection_id": connection_id, "owner": OWNER, "rows_fetched": 0, "created_at": time.time(),
+    }
+    job_store.get_job_store().insert(record)
+    job = Job(record, db_config)
+    with _lock:
+        _jobs[job.id] = job
+        _pending.append(job)
+    dispatch()
+    log.info(f"Job {job.id} queued: {truncate(sql, 100)}")
+    return job.to_dict()
+
+def fetch_rows(job: Job, sql: str, db_config: dict) -> int:
+    """Stream the result into the job's spill file, checking for cancellation between batches"""
+    def remember_connection(dbapi_connection):
+        job.dbapi_connection = dbapi_connection
+
+    def check_batch(buffer, rows):
+        if job.cancel_requested.is_set():
+            raise replica_router.StatementAborted("Job cancelled")
+        job.columns = buffer.columns
+        job.rows_fetched = buffer.row_count
+        if job.rows_fetched > settings.JOB_MAX_ROWS:
+            raise replica_router.StatementAborted(f"Result exceeds JOB_MAX_ROWS ({settings.JOB_MAX_ROWS})")
+        if time.monotonic() - job.persisted_at > settings.JOB_PROGRESS_PERSIST_S:
+            job.persist_progress()
+
+    job.rows_fetched = 0
+    try:
+        buffer = result_store.fetch(
+            sql, db_config, job.user_id, path=result_path(job.id), batch_rows=settings.JOB_BATCH_ROWS,
+            on_connect=remember_connection, on_batch=check_batch,
+        )
+        job.columns = buffer.columns
+        job.rows_fetched = buffer.row_count
+        return job.rows_fetched
+    except replica_router.StatementAborted:
+        raise
+    except Exception as e:
+        if job.cancel_requested.is_set():
+            # The driver raised because cancel() interrupted the statement
+            raise replica_router.StatementAborted("Job cancelled") from e
+        raise
+    finally:
+        job.dbapi_connection = None
+
+def finish(job: Job, status: str, error: str = None):
+    job.status = status
+    job.error = error
+    job.finished_at = time.time()
+    job.expires_at = job.finished_at + settings.JOB_RESULT_TTL_S
+    job.persist()
+    jobs_total.inc(status=status)
+
+def run_job(job: Job):
+    """Worker thread: run one job to completion, then start the next queued one"""
+    try:
+        if _stopping:
+            return
+        if job.cancel_requested.is_set():
+            finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.persist(owner=OWNER)
+
+        db_config = job.db_config
+        if db_config is None and job.connection_id:
+            db_config = connection_store.get_connection_store().get_config(job.connection_id, job.user_id)
+        if db_config is None:
+            finish(job, FAILED, "Connection not found")
+            return
+
+        start_time = time.time()
+        replica_router.execute(job.sql, db_config, lambda sql, config: fetch_rows(job, sql, config))
+        finish(job, SUCCEEDED)
+        log.info(f"Job {job.id} finished: {job.rows_fetched} rows in {time.time() - start_time:.2f}s")
+    except replica_router.StatementAborted as e:
+        if _stopping:
+            log.info(f"Job {job.id} interrupted by shutdown; it resumes after restart if it can")
+        elif job.cancel_requested.is_set():
+            finish(job, CANCELLED)
+        else:
+            finish(job, FAILED, str(e))
+    except Exception as e:
+        log.warning(f"Job {job.id} failed: {str(e)}")
+        try:
+            finish(job, FAILED, str(e))
+        except Exception as persist_error:
+            log.error(f"Could not record failure of job {job.id}: {str(persist_error)}")
+    finally:
+        with _lock:
+            _running[job.user_id] -= 1
+        dispatch()
+
+def get(job_id: str, user_id: str):
+    """The job as a dict, or None if missing or owned by someone else; falls back to the store for other workers' jobs"""
+    job = _jobs.get(job_id)
+    if job is None:
+        record = job_store.get_job_store().get(job_id)
+        job = Job(record) if record else None
+    if job is None or job.user_id != user_id:
+        return None
+    return job.to_dict()
+
+def list_jobs(user_id: str, limit: int) -> list:
+    """The user's jobs, newest first; this worker's in-flight jobs have up-to-the-moment progress"""
+    jobs = []
+    for record in job_store.get_job_store().list(user_id, limit):
+        job = _jobs.get(record["id"]) or Job(record)
+        jobs.append(job.to_dict())
+    return jobs
+
+def cancel(job_id: str, user_id: str):
+    """Cancel a queued or running job; returns the job, or None if missing or owned by someone else"""
+    job = _jobs.get(job_id)
+    if job is None:
+        record = job_store.get_job_store().get(job_id)
+        if record is None or record["user_id"] != user_id:
+            return None
+        if record["status"] not in FINISHED:
+            # Queued or running in another worker: that worker sees the status and stops between batches
+            job_store.get_job_store().update(job_id, status=CANCELLED, finished_at=time.time(),
+                                             expires_at=time.time() + settings.JOB_RESULT_TTL_S)
+        return get(job_id, user_id)
+    if job.user_id != user_id:
+        return None
+
+    job.cancel_requested.set()
+    with _lock:
+        queued = job in _pending
+        if queued:
+            _pending.remove(job)
+    if queued:
+        finish(job, CANCELLED)
+    elif job.status == RUNNING and job.dbapi_connection is not None:
+        try:
+            db_utils.interrupt_connection(job.dbapi_connection)
+        except Exception as e:
+            log.warning(f"Could not interrupt job {job.id}: {str(e)}")
+    return job.to_dict()
+
+def delete(job_id: str, user_id: str) -> bool:
+    """Cancel if unfinished, then drop the job and its result"""
+    if cancel(job_id, user_id) is None:
+        return False
+    remove(job_id)
+    return True
+
+def remove(job_id: str):
+    with _lock:
+        _jobs.pop(job_id, None)
+    try:
+        os.unlink(result_path(job_id))
+    except FileNotFoundError:
+        pass
+    job_store.get_job_store().delete(job_id)
+
+def open_result(job_id: str, user_id: str):
+    """The mmap'd result of a succeeded job (close it after use); None if the job is missing"""
+    job = get(job_id, user_id)
+    if job is None:
+        return None
+    if job["status"] != SUCCEEDED:
+        raise ValueError(f"Job is {job['status']}, no result to read")
+    spill = result_store.open_result(job_id, user_id, result_path(job_id))
+    if spill is None:
+        raise ValueError("Job result has expired")
+    return spill
+
+def read_page(job_id: str, user_id: str, offset: int, limit: int):
+    """{"columns", "rows", "offset", "total", "next_offset"} of a succeeded job; None if missing"""
+    spill = open_result(job_id, user_id)
+    if spill is None:
+        return None
+    with spill:
+        return result_store.page(spill, offset, limit)
+
+async def watch(job_id: str, user_id: str):
+    """Yield the job whenever its status or progress changes, until it finishes"""
+    last = None
+    while True:
+        # Jobs running elsewhere are read from the store
+        job = get(job_id, user_id) if job_id in _jobs else await asyncio.to_thread(get, job_id, user_id)
+        if job is None:
+            return
+        state = (job["status"], job["rows_fetched"])
+        if state != last:
+            last = state
+            yield job
+        if job["status"] in FINISHED:
+            return
+        await asyncio.sleep(settings.JOB_EVENT_INTERVAL_S)
+
+def owner_alive(owner: str) -> bool:
+    """Whether the worker process that owns a job (host:pid:nonce, or host:pid from older versions) may still be running it"""
+    if owner == OWNER:
+        return True
+    host, pid = ((owner or "").split(":") + ["", ""])[:2]
+    if host != socket.gethostname():
+        return True  # Can't tell for other hosts; leave their jobs alone
+    try:
+        if int(pid) == os.getpid():
+            return False  # Our pid, but an earlier boot
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def recover():
+    """After a restart: requeue orphaned jobs on registered connections, fail those on inline credentials"""
+    store = job_store.get_job_store()
+    requeued = failed = 0
+    for record in store.unfinished():
+        if owner_alive(record["owner"]):
+            continue
+        # Workers starting together all see the same dead owner; only the one whose claim lands takes the job
+        if record["connection_id"]:
+            if not store.claim(record["id"], record["owner"], status=QUEUED, owner=OWNER, rows_fetched=0, started_at=None):
+                continue
+            record.update(status=QUEUED, owner=OWNER, rows_fetched=0, started_at=None)
+            job = Job(record)
+            with _lock:
+                _jobs[job.id] = job
+                _pending.append(job)
+            requeued += 1
+        else:
+            now = time.time()
+            if store.claim(record["id"], record["owner"], status=FAILED, owner=OWNER, finished_at=now,
+                           expires_at=now + settings.JOB_RESULT_TTL_S,
+                           error="Interrupted by a server restart; jobs on inline db_connection credentials are not resumed"):
+                failed += 1
+    if requeued or failed:
+        log.info(f"Recovered jobs after restart: {requeued} requeued, {failed} failed")
+    dispatch()
+
+def purge_expired():
+    for job_id in job_store.get_job_store().expired(time.time()):
+        remove(job_id)
+
+def cancelled_elsewhere(job: Job) -> bool:
+    record = job_store.get_job_store().get(job.id)
+    return record is not None and record["status"] == CANCELLED
+
+def check_remote_cancels():
+    """Pick up cancellations recorded by other workers for jobs queued or running here"""
+    for job in list(_jobs.values()):
+        if job.status not in FINISHED and not job.cancel_requested.is_set() and cancelled_elsewhere(job):
+            cancel(job.id, job.user_id)
+
+async def run_maintenance():
+    """Lifespan task: recover jobs left by a previous process, then expire old results periodically"""
+    try:
+        await asyncio.to_thread(recover)
+    except Exception as e:
+        log.warning(f"Job recovery failed: {str(e)}")
+    while True:
+        await asyncio.sleep(settings.JOB_SWEEP_INTERVAL_S)
+        try:
+            await asyncio.to_thread(check_remote_cancels)
+            await asyncio.to_thread(purge_expired)
+        except Exception as e:
+            log.warning(f"Job maintenance failed: {str(e)}")
+
+def shutdown():
+    """Interrupt running statements without finishing their jobs, so the next process recovers them"""
+    global _stopping
+    with _lock:
+        _stopping = True
+        _pending.clear()
+    for job in list(_jobs.values()):
+        if job.status == RUNNING:
+            job.cancel_requested.set()
+            if job.dbapi_connection is not None:
+                try:
+                    db_utils.interrupt_connection(job.dbapi_connection)
+                except Exception as e:
+                    log.warning(f"Could not interrupt job {job.id}: {str(e)}")
+
+def job_counts() -> dict:
+    counts = Counter(job.status for job in list(_jobs.values()) if job.status not in FINISHED)
+    return {(QUEUED,): counts[QUEUED], (RUNNING,): counts[RUNNING]}
+
+metrics.register(metrics.Gauge(
+    "sql_assistant_jobs", "Unfinished query jobs in this worker by status",
+    ("status",), callback=job_counts,
+))
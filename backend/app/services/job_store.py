@@ -0,0 +1,103 @@
+# app/services/job_store.py
+import os
+import threading
+from sqlalchemy import (
+    Column, Float, Index, Integer, MetaData, String, Table, Text,
+    create_engine, delete, event, insert, select, update,
+)
+from app.config import settings
+from app.services.chat_store import ConversationStore
+from app.utils.logger import get_logger
+
+log = get_logger("sql")
+
+metadata = MetaData()
+
+# Job state only; credentials are never stored (jobs on inline connections can't survive a restart)
+jobs = Table(
+    "jobs", metadata,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", String(128), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("sql", Text, nullable=False),
+    Column("connection_id", String(36)),
+    Column("owner", String(128)),  # host:pid:boot nonce of the worker process that queued/ran it
+    Column("rows_fetched", Integer, nullable=False, default=0),
+    Column("columns", Text),
+    Column("error", Text),
+    Column("created_at", Float, nullable=False),
+    Column("started_at", Float),
+    Column("finished_at", Float),
+    Column("expires_at", Float),
+    Index("ix_jobs_user_created", "user_id", "created_at"),
+    Index("ix_jobs_status", "status"),
+)
+
+FIELDS = [column.name for column in jobs.columns]
+
+class JobStore:
+    """Job records on SQLite (WAL) or any SQLAlchemy URL"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", ConversationStore._configure_sqlite)
+        metadata.create_all(self.engine)
+
+    def insert(self, job: dict):
+        with self.engine.begin() as conn:
+            conn.execute(insert(jobs).values(**{key: job.get(key) for key in FIELDS}))
+
+    def update(self, job_id: str, **values):
+        with self.engine.begin() as conn:
+            conn.execute(update(jobs).where(jobs.c.id == job_id).values(**values))
+
+    def claim(self, job_id: str, previous_owner: str, **values) -> bool:
+        """Update an unfinished job only if `previous_owner` still holds it; False if another worker got there first"""
+        query = update(jobs).where(
+            jobs.c.id == job_id, jobs.c.owner == previous_owner, jobs.c.status.in_(("queued", "running"))
+        ).values(**values)
+        with self.engine.begin() as conn:
+            return conn.execute(query).rowcount == 1
+
+    def get(self, job_id: str):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(jobs).where(jobs.c.id == job_id)).first()
+        return dict(row._mapping) if row else None
+
+    def list(self, user_id: str, limit: int) -> list:
+        """Newest first"""
+        query = select(jobs).where(jobs.c.user_id == user_id).order_by(jobs.c.created_at.desc()).limit(limit)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def unfinished(self) -> list:
+        """Queued and running jobs, oldest first"""
+        query = select(jobs).where(jobs.c.status.in_(("queued", "running"))).order_by(jobs.c.created_at)
+        with self.engine.connect() as conn:
+            return [dict(row._mapping) for row in conn.execute(query)]
+
+    def expired(self, now: float) -> list:
+        query = select(jobs.c.id).where(jobs.c.expires_at.is_not(None), jobs.c.expires_at < now)
+        with self.engine.connect() as conn:
+            return [row.id for row in conn.execute(query)]
+
+    def delete(self, job_id: str):
+        with self.engine.begin() as conn:
+            conn.execute(delete(jobs).where(jobs.c.id == job_id))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    """Shared job store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = settings.JOB_STORE_URL
+                if not url:
+                    os.makedirs(settings.DATA_DIR, exist_ok=True)
+                    url = f"sqlite:///{os.path.join(settings.DATA_DIR, 'jobs.db')}"
+                _store = JobStore(url)
+    return _store
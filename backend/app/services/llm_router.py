@@ -0,0 +1,211 @@
+# app/services/llm_router.py
+import asyncio
+import threading
+import time
+from fastapi import HTTPException
+from app.config import settings
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+log = get_logger("llm")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+# Client errors that still mean "this provider is struggling"
+RETRYABLE_STATUS = (408, 429)
+
+def parse_chain(spec: str) -> list:
+    """Parse 'provider:model@url,...' into [(provider, model, url)]; model and url are optional"""
+    chain = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        provider, _, rest = part.partition(":")
+        # Model IDs may contain ':' (e.g. llama3.2:latest), so only the first one separates the provider
+        model, _, url = rest.rpartition("@") if "@" in rest else (rest, "", "")
+        chain.append((provider.strip(), model.strip(), url.strip()))
+    return chain
+
+class ProviderHealth:
+    """EWMA latency/error rate and circuit breaker state for one provider/model"""
+
+    def __init__(self, provider: str, model: str, url: str = ""):
+        self.provider = provider
+        self.model = model
+        self.url = url
+        self.ewma_latency = None
+        self.ewma_error_rate = 0.0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _ewma(self, previous, sample: float) -> float:
+        alpha = settings.LLM_ROUTER_EWMA_ALPHA
+        return sample if previous is None else alpha * sample + (1 - alpha) * previous
+
+    def record_success(self, duration: float):
+        with self._lock:
+            self.ewma_latency = self._ewma(self.ewma_latency, duration)
+            self.ewma_error_rate = self._ewma(self.ewma_error_rate, 0.0)
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            if self.state != CLOSED:
+                log.info(f"Circuit closed for {self.provider}/{self.model}")
+            self.state = CLOSED
+
+    def close(self):
+        """Close the circuit after a successful probe"""
+        with self._lock:
+            self.consecutive_failures = 0
+            self.trial_in_flight = False
+            self.state = CLOSED
+        log.info(f"Circuit closed for {self.provider}/{self.model} after probe")
+
+    def record_failure(self):
+        with self._lock:
+            self.ewma_error_rate = self._ewma(self.ewma_error_rate, 1.0)
+            self.consecutive_failures += 1
+            self.trial_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= settings.LLM_BREAKER_FAILURES:
+                if self.state != OPEN:
+                    log.warning(f"Circuit opened for {self.provider}/{self.model} after {self.consecutive_failures} failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def cooled_down(self) -> bool:
+        return self.state == OPEN and time.monotonic() - self.opened_at >= settings.LLM_BREAKER_COOLDOWN_S
+
+    def acquire(self) -> bool:
+        """Whether a request may use this target now; half-open circuits admit a single trial"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.cooled_down():
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a half-open trial that ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def timeout(self) -> float:
+        """Per-attempt deadline: a multiple of typical latency, so a stalled provider fails over quickly"""
+        if self.ewma_latency is None:
+            return settings.LLM_ROUTER_MAX_TIMEOUT_S
+        return min(
+            max(self.ewma_latency * settings.LLM_ROUTER_TIMEOUT_FACTOR, settings.LLM_ROUTER_MIN_TIMEOUT_S),
+            settings.LLM_ROUTER_MAX_TIMEOUT_S,
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "state": self.state,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "ewma_error_rate": round(self.ewma_error_rate, 4),
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+_health = {}
+_health_lock = threading.Lock()
+
+def get_health(provider: str, model: str, url: str = "") -> ProviderHealth:
+    key = (provider, model or "")
+    health = _health.get(key)
+    if health is None:
+        with _health_lock:
+            health = _health.setdefault(key, ProviderHealth(provider, model or "", url or ""))
+    if url and not health.url:
+        health.url = url
+    return health
+
+def route_targets(provider: str, model: str, url: str) -> list:
+    """The requested target followed by the configured fallback chain, without duplicates"""
+    targets = [(provider, model or "", url or "")]
+    for target in parse_chain(settings.LLM_FALLBACK_CHAIN):
+        if (target[0], target[1]) not in [(t[0], t[1]) for t in targets]:
+            targets.append(target)
+
+    # Healthy targets first (in configured order); ones that keep erroring go last
+    return sorted(targets, key=lambda t: get_health(t[0], t[1]).ewma_error_rate >= settings.LLM_ROUTER_DEMOTE_ERROR_RATE)
+
+async def route(provider: str, model: str, url: str, prompt: str, call) -> str:
+    """Run `call(provider, model, url, prompt)` against the first target whose circuit allows it"""
+    errors = []
+    for index, (target_provider, target_model, target_url) in enumerate(route_targets(provider, model, url)):
+        health = get_health(target_provider, target_model, target_url)
+        if not health.acquire():
+            errors.append(f"{target_provider}/{target_model}: circuit open")
+            continue
+        if index > 0 or (target_provider, target_model) != (provider, model or ""):
+            metrics.llm_fallbacks_total.inc(from_provider=provider, to_provider=target_provider)
+            log.info(f"Falling back to {target_provider}/{target_model}")
+
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(call(target_provider, target_model, target_url, prompt), timeout=health.timeout())
+        except asyncio.CancelledError:
+            health.release()
+            raise
+        except (ValueError, HTTPException) as e:
+            # Bad requests (unknown provider, missing model or recording) say nothing about provider health
+            status = getattr(e, "status_code", 400)
+            if isinstance(e, ValueError) or (400 <= status < 500 and status not in RETRYABLE_STATUS):
+                health.release()
+                raise
+            health.record_failure()
+            errors.append(f"{target_provider}/{target_model}: {e.detail}")
+            continue
+        except Exception as e:
+            health.record_failure()
+            errors.append(f"{target_provider}/{target_model}: {str(e) or type(e).__name__}")
+            continue
+        health.record_success(time.perf_counter() - start)
+        return result
+
+    raise HTTPException(status_code=503, detail="All LLM providers failed: " + "; ".join(errors))
+
+def snapshot() -> list:
+    """Health of every provider/model the router has seen"""
+    return [health.snapshot() for health in list(_health.values())]
+
+def circuit_states() -> dict:
+    values = {OPEN: 2, HALF_OPEN: 1, CLOSED: 0}
+    return {(h.provider, h.model): values[h.state] for h in list(_health.values())}
+
+metrics.register(metrics.Gauge(
+    "sql_assistant_llm_circuit_state", "Circuit breaker state per provider/model (0 closed, 1 half-open, 2 open)",
+    ("provider", "model"), callback=circuit_states,
+))
+
+async def probe_open_circuits(probe):
+    """Move cooled-down circuits to half-open and close them if `probe(provider, model, url)` gets an answer from the model"""
+    for health in list(_health.values()):
+        if not health.acquire() or health.state != HALF_OPEN:
+            continue
+        try:
+            result = await asyncio.wait_for(probe(health.provider, health.model, health.url), timeout=settings.LLM_ROUTER_MAX_TIMEOUT_S)
+        except Exception as e:
+            result = {"available": False, "error": str(e)}
+        if result.get("available"):
+            health.close()
+        else:
+            log.debug(f"Probe of {health.provider}/{health.model} failed: {result.get('error', 'unavailable')}")
+            health.record_failure()
+
+async def run_probes(probe):
+    """Background loop that probes half-open circuits until cancelled"""
+    while True:
+        await asyncio.sleep(settings.LLM_ROUTER_PROBE_INTERVAL_S)
+        try:
+            await probe_open_circuits(probe)
+        except Exception as e:
+            log.error(f"Circuit probe loop error: {str(e)}")
@@ -1,65 +1,187 @@
 # app/services/llm_service.py
-import boto3
-import httpx
+import asyncio
+import contextvars
+import functools
 import json
+import threading
 import time
 import re
 from fastapi import HTTPException
-from app.utils.colors import Colors as C
+from app.utils.logger import get_logger, truncate
+from app.utils import metrics
+from app.utils.tracing import span
 from app.utils.response_parser import parse_ollama_response
-from app.utils.bedrock_client import create_bedrock_client, invoke_anthropic_bedrock
+from app.utils.bedrock_client import (
+    boto3, create_bedrock_client, get_bedrock_client, invoke_anthropic_bedrock, ping_anthropic_bedrock,
+    stream_anthropic_bedrock
+)
+from app.utils.lazy import lazy_import
+from app.utils.llm_cassette import get_cassette, prompt_key
+from app.utils.llm_usage import Completion, Usage
+from app.services import sql_service, llm_router, usage_service
+from app.services.hedging import hedge_delay, latency_window, looks_like_sql, race
 from app.config import settings
 
-async def generate_sql(provider: str, model: str, url: str, prompt: str) -> str:
-    """Generate SQL from natural language using an LLM"""
-    print(f"{C.LLM}[LLM]{C.RESET} Using provider: {provider}, model: {model}")
+httpx = lazy_import("httpx")
+
+log = get_logger("llm")
+
+_http_client = None
+
+def get_http_client():
+    """Shared httpx client (keeps connections to Ollama alive) for the running event loop"""
+    global _http_client
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client[0] is not loop:
+        # Pooled connections belong to the loop that opened them; a new loop gets a new client
+        _http_client = (loop, httpx.AsyncClient())
+    return _http_client[1]
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client[1], None
+        await client.aclose()
+
+async def generate_sql(provider: str, model: str, url: str, prompt: str, hedge: str = None, db_config: dict = None) -> str:
+    """Generate SQL from natural language using an LLM, optionally hedged (see LLM_HEDGE_MODE)"""
+    mode = hedge or settings.LLM_HEDGE_MODE
+    if mode == "hedge":
+        return await generate_sql_hedged(provider, model, url, prompt)
+    elif mode == "candidates":
+        return await generate_sql_candidates(provider, model, url, prompt, db_config)
+    elif mode != "off":
+        raise ValueError(f"Unsupported hedge mode: {mode}")
+    return await generate_sql_once(provider, model, url, prompt)
+
+async def generate_sql_hedged(provider: str, model: str, url: str, prompt: str) -> str:
+    """Fire a second request if the first is slower than its recent tail latency; first valid SQL wins"""
+    hedge_provider = settings.LLM_HEDGE_PROVIDER or provider
+    hedge_model = settings.LLM_HEDGE_MODEL or (model if hedge_provider == provider else "")
+    hedge_url = settings.LLM_HEDGE_URL or url
+    delay = hedge_delay(provider, model)
     
-    if provider == "bedrock":
-        return await handle_bedrock_request(model, prompt)
-    elif provider == "ollama":
-        return await handle_ollama_request(url, model, prompt)
-    elif provider == "openai":
-        print(f"{C.ERROR}[ERROR]{C.RESET} OpenAI implementation not complete")
-        raise ValueError(f"OpenAI implementation not complete")
-    else:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Unsupported LLM provider: {provider}")
-        raise ValueError(f"Unsupported LLM provider: {provider}")
+    async def validate(sql: str) -> bool:
+        return looks_like_sql(sql)
+    
+    winner, sql, launched = await race([
+        ("primary", lambda: generate_sql_once(provider, model, url, prompt)),
+        ("hedge", lambda: generate_sql_once(hedge_provider, hedge_model, hedge_url, prompt)),
+    ], validate, delay=delay)
+    
+    metrics.observe_hedge("hedge", winner or "none", launched, prompt)
+    if launched > 1:
+        log.info(f"Hedged after {delay * 1000:.0f}ms, {winner or 'no valid'} response won", provider=provider, model=model)
+    return sql
 
-async def handle_bedrock_request(model: str, prompt: str) -> str:
-    """Handle requests to AWS Bedrock with Anthropic Claude"""
-    print(f"{C.LLM}[LLM]{C.RESET} Sending request to Bedrock with model {model}")
+async def generate_sql_candidates(provider: str, model: str, url: str, prompt: str, db_config: dict = None) -> str:
+    """Generate LLM_CANDIDATES completions in parallel and keep the first one the database can plan"""
+    async def validate(sql: str) -> bool:
+        if not looks_like_sql(sql):
+            return False
+        if db_config is None:
+            return True
+        planned = await asyncio.to_thread(sql_service.sql_plans_cleanly, sql, db_config)
+        return planned is not False
+    
+    attempts = [
+        ("candidate", lambda: generate_sql_once(provider, model, url, prompt))
+        for _ in range(max(settings.LLM_CANDIDATES, 1))
+    ]
+    winner, sql, launched = await race(attempts, validate)
+    
+    metrics.observe_hedge("candidates", "validated" if winner else "none", launched, prompt)
+    return sql
+
+async def generate_sql_once(provider: str, model: str, url: str, prompt: str) -> str:
+    """Generate SQL with one logical call, routed through circuit breakers and the fallback chain"""
+    if settings.LLM_ROUTER_ENABLED:
+        return await llm_router.route(provider, model, url, prompt, call_provider)
+    return await call_provider(provider, model, url, prompt)
+
+async def call_provider(provider: str, model: str, url: str, prompt: str, parse: bool = True) -> str:
+    """Generate SQL with a single call to one provider (or, with parse=False, return the raw completion)"""
+    log.debug(f"Using provider: {provider}, model: {model}")
+    
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with metrics.track_stage("llm", provider=provider):
+            if provider == "bedrock":
+                return await handle_bedrock_request(model, prompt, parse)
+            elif provider == "ollama":
+                return await handle_ollama_request(url, model, prompt, parse)
+            elif provider == "replay":
+                return await handle_replay_request(url, model, prompt, parse)
+            elif provider == "openai":
+                log.error("OpenAI implementation not complete")
+                raise ValueError(f"OpenAI implementation not complete")
+            else:
+                log.error(f"Unsupported LLM provider: {provider}")
+                raise ValueError(f"Unsupported LLM provider: {provider}")
+    except asyncio.CancelledError:
+        # Losing side of a hedge
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe_llm_call(provider, model or "", status, duration)
+        if status == "ok":
+            latency_window(provider, model).record(duration)
+
+async def request_bedrock_completion(model: str, prompt: str) -> Completion:
+    """Send a prompt to AWS Bedrock and return the raw completion text"""
+    log.debug(f"Sending request to Bedrock with model {model}")
     request_start = time.time()
     
+    # Shared Bedrock client
+    client = get_bedrock_client()
+    
+    # Use Claude 3.7 Sonnet if no model specified
+    if not model:
+        model = settings.BEDROCK_MODEL_ID
+    
+    log.debug(f"Requesting completion from model {model}...")
+    
+    # Invoke Anthropic model on Bedrock; boto3 is blocking, so keep it off the event loop
+    with span("bedrock.invoke", model=model):
+        response_text = await asyncio.to_thread(invoke_anthropic_bedrock, client, model, prompt)
+    usage_service.record(response_text.usage)
+    
+    total_time = time.time() - request_start
+    log.info(f"Received response in {total_time:.2f}s", provider="bedrock", model=model, duration_ms=round(total_time * 1000, 1))
+    
+    return response_text
+
+async def handle_bedrock_request(model: str, prompt: str, parse: bool = True) -> str:
+    """Handle requests to AWS Bedrock with Anthropic Claude"""
     try:
-        # Create Bedrock client
-        client = create_bedrock_client()
-        
-        # Use Claude 3.7 Sonnet if no model specified
-        if not model:
-            model = settings.BEDROCK_MODEL_ID
-        
-        print(f"{C.LLM}[LLM]{C.RESET} Requesting completion from model {model}...")
-        
-        # Invoke Anthropic model on Bedrock
-        response_text = invoke_anthropic_bedrock(client, model, prompt)
-        
-        total_time = time.time() - request_start
-        print(f"{C.LLM}[LLM]{C.RESET} Received response in {total_time:.2f}s")
+        response_text = await request_bedrock_completion(model, prompt)
         
         # Parse the response for SQL
-        sql = extract_sql_from_response(response_text)
-        
-        print(f"{C.LLM}[LLM]{C.RESET} Extracted SQL query: {sql}")
-        
-        return sql
+        return parse_completion("bedrock", response_text) if parse else response_text
         
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Bedrock request failed: {str(e)}")
+        log.error(f"Bedrock request failed: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Bedrock error: {str(e)}"
         )
 
+def parse_completion(provider: str, response_text: str) -> str:
+    """Extract SQL from a raw completion using the parser that matches its provider"""
+    with metrics.track_stage("parse", provider=provider):
+        if provider == "bedrock":
+            sql = extract_sql_from_response(response_text)
+        else:
+            sql = parse_ollama_response(response_text)
+    
+    log.debug(f"Extracted SQL query: {truncate(sql)}")
+    return sql
+
 def extract_sql_from_response(response_text: str) -> str:
     """Extract SQL from response, handling various formats"""
     try:
@@ -88,9 +210,9 @@ def extract_sql_from_response(response_text: str) -> str:
     # If no SQL found, use existing parser as fallback
     return parse_ollama_response(response_text)
 
-async def handle_ollama_request(url: str, model: str, prompt: str) -> str:
-    """Handle requests to Ollama API"""
-    print(f"{C.LLM}[LLM]{C.RESET} Sending request to Ollama at {url}")
+async def request_ollama_completion(url: str, model: str, prompt: str, json_format: bool = True) -> Completion:
+    """Send a prompt to the Ollama API and return the raw completion text"""
+    log.debug(f"Sending request to Ollama at {url}")
     request_start = time.time()
     
     # Use default URL if not provided
@@ -101,144 +223,447 @@ async def handle_ollama_request(url: str, model: str, prompt: str) -> str:
     if not model:
         model = "llama3.2"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            print(f"{C.LLM}[LLM]{C.RESET} Requesting completion from model {model}...")
-            
-            # Request with JSON format option
-            response = await client.post(url, json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "format": "json"
-            }, timeout=60.0)
-
-            print(f"{C.LLM}[LLM]{C.RESET} Ollama responded with status {response.status_code}")
-            response.raise_for_status()
+    client = get_http_client()
+    log.debug(f"Requesting completion from model {model}...")
+    
+    # Request with JSON format option
+    with span("ollama.generate", model=model):
+        body = {"model": model, "prompt": prompt, "stream": False}
+        if json_format:
+            body["format"] = "json"
+        response = await client.post(url, json=body, timeout=60.0)
 
-            # Parse the JSON response
-            response_data = response.json()
-            total_time = time.time() - request_start
-            print(f"{C.LLM}[LLM]{C.RESET} Received response in {total_time:.2f}s")
-            
-            # Extract the response text
-            if "response" in response_data:
-                response_text = response_data["response"]
-                
-                # Use the existing response parser to extract SQL
-                sql = parse_ollama_response(response_text)
-                print(f"{C.LLM}[LLM]{C.RESET} Extracted SQL query: {sql}")
-                
-                return sql
+    log.debug(f"Ollama responded with status {response.status_code}")
+    response.raise_for_status()
+
+    # Parse the JSON response
+    response_data = response.json()
+    total_time = time.time() - request_start
+    usage = ollama_usage(model, response_data, total_time)
+    usage_service.record(usage)
+    log.info(f"Received response in {total_time:.2f}s", provider="ollama", model=model, duration_ms=round(total_time * 1000, 1))
+    
+    # Extract the response text
+    if "response" not in response_data:
+        log.error("Unexpected response format")
+        raise ValueError("Unexpected response format from LLM")
+    
+    return Completion(response_data["response"], usage)
+
+def ollama_usage(model: str, response_data: dict, total_s: float, ttft_s: float = None) -> Usage:
+    """Usage from Ollama's final response fields (durations are in nanoseconds)"""
+    if ttft_s is None and "prompt_eval_duration" in response_data:
+        # Server-side time before the first output token: model load plus prompt evaluation
+        ttft_s = (response_data.get("load_duration", 0) + response_data["prompt_eval_duration"]) / 1e9
+    eval_duration = response_data.get("eval_duration")
+    return Usage(
+        "ollama", model,
+        input_tokens=response_data.get("prompt_eval_count", 0),
+        output_tokens=response_data.get("eval_count", 0),
+        ttft_s=ttft_s,
+        total_s=total_s,
+        generation_s=eval_duration / 1e9 if eval_duration else None,
+    )
+
+def replay_usage(model: str, prompt: str, completion: str, total_s: float, ttft_s: float = None) -> Usage:
+    """Usage of a replayed completion; cassettes hold no token counts, so they are estimated"""
+    return Usage(
+        "replay", model,
+        input_tokens=metrics.estimate_tokens(prompt),
+        output_tokens=metrics.estimate_tokens(completion),
+        ttft_s=ttft_s,
+        total_s=total_s,
+        generation_s=total_s - ttft_s if ttft_s is not None else None,
+    )
+
+async def handle_ollama_request(url: str, model: str, prompt: str, parse: bool = True) -> str:
+    """Handle requests to Ollama API"""
+    try:
+        response_text = await request_ollama_completion(url, model, prompt, json_format=parse)
+        
+        # Use the existing response parser to extract SQL
+        return parse_completion("ollama", response_text) if parse else response_text
+        
+    except httpx.HTTPStatusError as e:
+        log.error(f"Ollama API error: {e.response.status_code} - {truncate(e.response.text)}")
+        raise HTTPException(
+            status_code=e.response.status_code,
+            detail=f"Ollama API error: {e.response.text}"
+        )
+    except Exception as e:
+        log.error(f"LLM request failed: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"LLM error: {str(e)}"
+        )
+
+async def handle_replay_request(url: str, model: str, prompt: str, parse: bool = True) -> str:
+    """Serve a recorded completion, or record one from the upstream provider in record mode"""
+    cassette = get_cassette(settings.LLM_CASSETTE_PATH)
+    
+    if settings.LLM_REPLAY_MODE == "record":
+        upstream = settings.LLM_REPLAY_UPSTREAM
+        request_start = time.time()
+        try:
+            if upstream == "bedrock":
+                response_text = await request_bedrock_completion(model, prompt)
+            elif upstream == "ollama":
+                response_text = await request_ollama_completion(url, model, prompt, json_format=parse)
             else:
-                print(f"{C.ERROR}[ERROR]{C.RESET} Unexpected response format")
-                raise ValueError("Unexpected response format from LLM")
-            
-        except httpx.HTTPStatusError as e:
-            print(f"{C.ERROR}[ERROR]{C.RESET} Ollama API error: {e.response.status_code} - {e.response.text}")
-            raise HTTPException(
-                status_code=e.response.status_code,
-                detail=f"Ollama API error: {e.response.text}"
-            )
+                raise ValueError(f"Unsupported replay upstream provider: {upstream}")
         except Exception as e:
-            print(f"{C.ERROR}[ERROR]{C.RESET} LLM request failed: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"LLM error: {str(e)}"
-            )
+            log.error(f"Replay recording failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Replay record error: {str(e)}")
+        
+        cassette.record(prompt, response_text, upstream, model, time.time() - request_start)
+        log.debug(f"Recorded completion for prompt {prompt_key(prompt)[:12]}")
+        return parse_completion(upstream, response_text) if parse else response_text
+    
+    entry = cassette.lookup(prompt)
+    if entry is None:
+        log.error(f"No recorded completion for prompt {prompt_key(prompt)[:12]}")
+        raise HTTPException(
+            status_code=404,
+            detail=f"No recorded completion for this prompt in {settings.LLM_CASSETTE_PATH}"
+        )
+    
+    # Simulate the provider: the recorded latency, or a fixed one when configured
+    delay = entry["duration"] if settings.LLM_REPLAY_LATENCY_MS < 0 else settings.LLM_REPLAY_LATENCY_MS / 1000
+    with span("replay.serve", model=entry["model"]):
+        if delay > 0:
+            await asyncio.sleep(delay)
+    usage = replay_usage(entry["model"], prompt, entry["completion"], delay)
+    usage_service.record(usage)
+    
+    if not parse:
+        return Completion(entry["completion"], usage)
+    return parse_completion(entry["provider"], entry["completion"])
+
+async def generate_chat_response(provider: str, model: str, url: str, prompt: str) -> dict:
+    """Answer a chat message: {"content", "usage", "tokens_used"} plus "sql" if the reply contains a query"""
+    call = functools.partial(call_provider, parse=False)
+    if settings.LLM_ROUTER_ENABLED:
+        content = await llm_router.route(provider, model, url, prompt, call)
+    else:
+        content = await call(provider, model, url, prompt)
+
+    usage = getattr(content, "usage", None) or Usage(provider, model, calls=0)
+    response = {"content": str(content), "usage": usage.to_dict(), "tokens_used": usage.tokens_used}
+    sql = extract_chat_sql(content)
+    if sql is not None:
+        response["sql"] = sql
+    return response
+
+async def stream_completion(provider: str, model: str, url: str, prompt: str):
+    """Yield a free-text completion (e.g. a chat reply) piece by piece as the provider produces it
+
+    Closing the generator early (the caller was cancelled) aborts the upstream request.
+    """
+    log.debug(f"Streaming from provider: {provider}, model: {model}")
+    if provider == "bedrock":
+        stream = stream_bedrock_completion(model, prompt)
+    elif provider == "ollama":
+        stream = stream_ollama_completion(url, model, prompt)
+    elif provider == "replay":
+        stream = stream_replay_completion(url, model, prompt)
+    else:
+        log.error(f"Unsupported LLM provider for streaming: {provider}")
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with metrics.track_stage("llm", provider=provider):
+            async for text in stream:
+                yield text
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        await stream.aclose()
+        duration = time.perf_counter() - start
+        metrics.observe_llm_call(provider, model or "", status, duration)
+        if status == "ok":
+            latency_window(provider, model).record(duration)
+
+async def iterate_in_thread(iterator):
+    """Consume a blocking iterator on a worker thread, yielding its items on the event loop"""
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, (item, error))
+        except RuntimeError:
+            pass  # The loop is gone
+
+    def pump():
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                put(item)
+        except BaseException as e:
+            put(done, e)
+            return
+        finally:
+            iterator.close()
+        put(done)
+
+    # Copy the context so the worker's usage reaches this request's tracker
+    loop.run_in_executor(None, contextvars.copy_context().run, pump)
+    try:
+        while True:
+            item, error = await items.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # The worker stops (and closes the iterator) at the next item
+        stop.set()
+
+async def stream_bedrock_completion(model: str, prompt: str):
+    """Stream a completion from AWS Bedrock; boto3 is blocking, so the stream is read on a worker thread"""
+    if not model:
+        model = settings.BEDROCK_MODEL_ID
+    request_start = time.time()
+    with span("bedrock.invoke_stream", model=model):
+        stream = iterate_in_thread(
+            stream_anthropic_bedrock(get_bedrock_client(), model, prompt, on_usage=usage_service.record)
+        )
+        try:
+            async for text in stream:
+                yield text
+        finally:
+            await stream.aclose()
+    total_time = time.time() - request_start
+    log.info(f"Streamed response in {total_time:.2f}s", provider="bedrock", model=model, duration_ms=round(total_time * 1000, 1))
+
+async def stream_ollama_completion(url: str, model: str, prompt: str):
+    """Stream a completion from the Ollama API (newline-delimited JSON chunks)"""
+    if not url:
+        url = "http://localhost:11434/api/generate"
+    if not model:
+        model = "llama3.2"
+    request_start = time.time()
+
+    client = get_http_client()
+    start = time.perf_counter()
+    ttft_s = None
+    final = {}
+    try:
+        with span("ollama.generate_stream", model=model):
+            async with client.stream("POST", url, json={"model": model, "prompt": prompt, "stream": True}, timeout=60.0) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise ValueError(f"Ollama error: {data['error']}")
+                    if data.get("response"):
+                        if ttft_s is None:
+                            ttft_s = time.perf_counter() - start
+                        yield data["response"]
+                    if data.get("done"):
+                        final = data
+                        break
+    finally:
+        # Token counts only come with the final chunk; a cancelled stream is recorded without them
+        usage_service.record(ollama_usage(model, final, time.perf_counter() - start, ttft_s))
+
+    total_time = time.time() - request_start
+    log.info(f"Streamed response in {total_time:.2f}s", provider="ollama", model=model, duration_ms=round(total_time * 1000, 1))
+
+async def stream_replay_completion(url: str, model: str, prompt: str):
+    """Replay a recorded completion word by word over its recorded latency (or record one in record mode)"""
+    cassette = get_cassette(settings.LLM_CASSETTE_PATH)
+
+    if settings.LLM_REPLAY_MODE == "record":
+        upstream = settings.LLM_REPLAY_UPSTREAM
+        request_start = time.time()
+        if upstream == "bedrock":
+            response_text = await request_bedrock_completion(model, prompt)
+        elif upstream == "ollama":
+            response_text = await request_ollama_completion(url, model, prompt)
+        else:
+            raise ValueError(f"Unsupported replay upstream provider: {upstream}")
+        cassette.record(prompt, response_text, upstream, model, time.time() - request_start)
+        yield str(response_text)
+        return
+
+    entry = cassette.lookup(prompt)
+    if entry is None:
+        log.error(f"No recorded completion for prompt {prompt_key(prompt)[:12]}")
+        raise HTTPException(
+            status_code=404,
+            detail=f"No recorded completion for this prompt in {settings.LLM_CASSETTE_PATH}"
+        )
+
+    pieces = re.findall(r"\S+\s*|\s+", entry["completion"]) or [""]
+    delay = entry["duration"] if settings.LLM_REPLAY_LATENCY_MS < 0 else settings.LLM_REPLAY_LATENCY_MS / 1000
+    start = time.perf_counter()
+    ttft_s = None
+    with span("replay.serve", model=entry["model"]):
+        for piece in pieces:
+            if delay > 0:
+                await asyncio.sleep(delay / len(pieces))
+            ttft_s = time.perf_counter() - start if ttft_s is None else ttft_s
+            yield piece
+    usage_service.record(replay_usage(entry["model"], prompt, entry["completion"], time.perf_counter() - start, ttft_s))
+
+def extract_chat_sql(response_text: str):
+    """SQL in a chat reply ({"query": ...} or a ```sql block), or None if the reply is prose only"""
+    sql = None
+    try:
+        response_data = json.loads(response_text)
+        if isinstance(response_data, dict) and isinstance(response_data.get("query"), str):
+            sql = response_data["query"]
+    except json.JSONDecodeError:
+        pass
+
+    if sql is None:
+        match = (
+            re.search(r'```sql\s*\n(.*?)```', response_text, re.DOTALL | re.IGNORECASE)
+            or re.search(r'\{\s*"query"\s*:\s*"([^"]+)"\s*\}', response_text)
+        )
+        sql = match.group(1) if match else None
+
+    sql = sql.strip() if sql else None
+    return sql if looks_like_sql(sql) else None
+
+def probe_bedrock() -> dict:
+    """List Bedrock's Anthropic models and try a test invocation (blocking; run it in a thread)"""
+    try:
+        # Create Bedrock client for listing models
+        bedrock_client = boto3.client(
+            service_name='bedrock',
+            region_name=settings.AWS_REGION,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+        )
+        
+        # Actually test the connection by listing models
+        log.debug("Testing Bedrock connection...")
+        response = bedrock_client.list_foundation_models()
+        
+        # Filter to only Anthropic models
+        anthropic_models = []
+        for model in response.get('modelSummaries', []):
+            if 'anthropic' in model.get('providerName', '').lower():
+                anthropic_models.append({
+                    "id": model.get('modelId', ''),
+                    "name": model.get('modelName', ''),
+                    "provider": model.get('providerName', '')
+                })
+        
+        log.debug(f"Found {len(anthropic_models)} Anthropic models")
+        
+        # Test if we can actually invoke a model
+        test_model = "anthropic.claude-3-haiku-20240307-v1:0"  # Use Haiku for quick test
+        try:
+            ping_anthropic_bedrock(create_bedrock_client(), test_model)
+            invoke_test_passed = True
+        except Exception as invoke_error:
+            log.warning(f"Model invocation test failed: {invoke_error}")
+            invoke_test_passed = False
+        
+        return {
+            "provider": "bedrock",
+            "available": True,
+            "models": anthropic_models,
+            "invoke_test_passed": invoke_test_passed,
+            "test_model_used": test_model
+        }
+        
+    except Exception as e:
+        log.error(f"Bedrock probe failed: {str(e)}")
+        return {
+            "provider": "bedrock",
+            "available": False,
+            "error": str(e),
+            "error_type": type(e).__name__
+        }
 
 async def probe_llm_provider(provider: str, url: str) -> dict:
     """Probe an LLM provider to discover capabilities"""
-    print(f"{C.LLM}[LLM]{C.RESET} Probing provider: {provider} at {url}")
+    log.debug(f"Probing provider: {provider} at {url}")
     
     if provider == "bedrock":
-        try:
-            # Create Bedrock client for listing models
-            bedrock_client = boto3.client(
-                service_name='bedrock',
-                region_name=settings.AWS_REGION,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-            )
-            
-            # Actually test the connection by listing models
-            print(f"{C.LLM}[LLM]{C.RESET} Testing Bedrock connection...")
-            response = bedrock_client.list_foundation_models()
-            
-            # Filter to only Anthropic models
-            anthropic_models = []
-            for model in response.get('modelSummaries', []):
-                if 'anthropic' in model.get('providerName', '').lower():
-                    anthropic_models.append({
-                        "id": model.get('modelId', ''),
-                        "name": model.get('modelName', ''),
-                        "provider": model.get('providerName', '')
-                    })
-            
-            print(f"{C.LLM}[LLM]{C.RESET} Found {len(anthropic_models)} Anthropic models")
-            
-            # Test if we can actually invoke a model
-            test_model = "anthropic.claude-3-haiku-20240307-v1:0"  # Use Haiku for quick test
-            try:
-                runtime_client = create_bedrock_client()
-                test_response = runtime_client.invoke_model(
-                    modelId=test_model,
-                    contentType="application/json",
-                    accept="application/json",
-                    body=json.dumps({
-                        "anthropic_version": "bedrock-2023-05-31",
-                        "max_tokens": 10,
-                        "messages": [{"role": "user", "content": "Hi"}]
-                    })
-                )
-                invoke_test_passed = True
-            except Exception as invoke_error:
-                print(f"{C.WARNING}[WARNING]{C.RESET} Model invocation test failed: {invoke_error}")
-                invoke_test_passed = False
-            
-            return {
-                "provider": "bedrock",
-                "available": True,
-                "models": anthropic_models,
-                "invoke_test_passed": invoke_test_passed,
-                "test_model_used": test_model
-            }
-            
-        except Exception as e:
-            print(f"{C.ERROR}[ERROR]{C.RESET} Bedrock probe failed: {str(e)}")
-            return {
-                "provider": "bedrock",
-                "available": False,
-                "error": str(e),
-                "error_type": type(e).__name__
-            }
+        # boto3 blocks; in a thread a slow Bedrock can't stall the event loop
+        return await asyncio.to_thread(probe_bedrock)
     elif provider == "ollama":
         try:
             models = await get_ollama_models(url)
-            print(f"{C.LLM}[LLM]{C.RESET} Found {len(models)} Ollama models")
+            log.debug(f"Found {len(models)} Ollama models")
             return {
                 "provider": "ollama",
                 "available": True,
                 "models": models
             }
         except Exception as e:
-            print(f"{C.ERROR}[ERROR]{C.RESET} Ollama probe failed: {str(e)}")
+            log.error(f"Ollama probe failed: {str(e)}")
             return {
                 "provider": "ollama",
                 "available": False,
                 "error": str(e)
             }
+    elif provider == "replay":
+        cassette = get_cassette(settings.LLM_CASSETTE_PATH)
+        try:
+            recorded = len(cassette)
+        except Exception as e:
+            log.error(f"Replay cassette could not be read: {str(e)}")
+            return {"provider": "replay", "available": False, "error": str(e)}
+        return {
+            "provider": "replay",
+            "available": settings.LLM_REPLAY_MODE == "record" or recorded > 0,
+            "mode": settings.LLM_REPLAY_MODE,
+            "cassette": settings.LLM_CASSETTE_PATH,
+            "recorded_completions": recorded
+        }
     else:
-        print(f"{C.WARNING}[WARNING]{C.RESET} Unsupported provider: {provider}")
+        log.warning(f"Unsupported provider: {provider}")
         return {
             "provider": provider,
             "available": False,
             "error": "Unsupported provider"
         }
 
+async def probe_circuit(provider: str, model: str, url: str) -> dict:
+    """Check a half-open circuit with a one-token completion from the routed model itself
+
+    Listing models only shows that the account or server answers; the circuit should close only
+    once the model the router sends traffic to does.
+    """
+    try:
+        if provider == "bedrock":
+            await asyncio.to_thread(ping_anthropic_bedrock, get_bedrock_client(), model or settings.BEDROCK_MODEL_ID)
+        elif provider == "ollama":
+            response = await get_http_client().post(
+                url or "http://localhost:11434/api/generate",
+                json={"model": model or "llama3.2", "prompt": "Hi", "stream": False, "options": {"num_predict": 1}},
+                timeout=settings.LLM_ROUTER_MAX_TIMEOUT_S,
+            )
+            response.raise_for_status()
+        else:
+            return await probe_llm_provider(provider, url)
+    except Exception as e:
+        return {"provider": provider, "model": model, "available": False, "error": str(e)}
+    return {"provider": provider, "model": model, "available": True}
+
 async def get_ollama_models(url: str) -> list:
     """Get available models from an Ollama server"""
-    print(f"{C.LLM}[LLM]{C.RESET} Getting available Ollama models...")
+    log.debug("Getting available Ollama models...")
     
     # Default URL if not provided
     if not url:
@@ -255,33 +680,33 @@ async def get_ollama_models(url: str) -> list:
     
     # Append the API endpoint for listing models
     models_url = f"{base_url}api/tags"
-    print(f"{C.LLM}[LLM]{C.RESET} Using models endpoint: {models_url}")
+    log.debug(f"Using models endpoint: {models_url}")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(models_url, timeout=5.0)
-            print(f"{C.LLM}[LLM]{C.RESET} Models API response: {response.status_code}")
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract model names from Ollama's response format
-            if "models" in data:
-                models = [model.get("name") for model in data["models"]]
-                print(f"{C.LLM}[LLM]{C.RESET} Available models: {', '.join(models[:5])}" + 
+        client = get_http_client()
+        response = await client.get(models_url, timeout=5.0)
+        log.debug(f"Models API response: {response.status_code}")
+        
+        response.raise_for_status()
+        data = response.json()
+        
+        # Extract model names from Ollama's response format
+        if "models" in data:
+            models = [model.get("name") for model in data["models"]]
+            log.debug(f"Available models: {', '.join(models[:5])}" + 
                       ("..." if len(models) > 5 else ""))
-                return models
-            else:
-                print(f"{C.WARNING}[WARNING]{C.RESET} No models found in Ollama response")
-                return []
-                
+            return models
+        else:
+            log.warning("No models found in Ollama response")
+            return []
+            
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Failed to get Ollama models: {str(e)}")
+        log.error(f"Failed to get Ollama models: {str(e)}")
         raise ValueError(f"Failed to get Ollama models: {str(e)}")
 
 def get_supported_providers() -> dict:
     """Get a list of supported LLM providers"""
-    print(f"{C.LLM}[LLM]{C.RESET} Getting supported providers")
+    log.debug("Getting supported providers")
     return {
         "providers": [
             {
@@ -299,6 +724,14 @@ def get_supported_providers() -> dict:
                     {"name": "model", "type": "string", "default": "llama3.2", "description": "Model name"},
                     {"name": "url", "type": "string", "default": "http://localhost:11434/api/generate", "description": "Ollama API URL"}
                 ]
+            },
+            {
+                "id": "replay",
+                "name": "Record/Replay (deterministic benchmarking)",
+                "config_fields": [
+                    {"name": "model", "type": "string", "default": "", "description": "Upstream model used in record mode"},
+                    {"name": "url", "type": "string", "default": "", "description": "Upstream URL used in record mode (Ollama)"}
+                ]
             }
         ]
     }
\ No newline at end of file
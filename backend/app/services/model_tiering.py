@@ -0,0 +1,99 @@
+# app/services/model_tiering.py
+import asyncio
+import re
+from fastapi import HTTPException
+from app.config import settings
+from app.services import llm_service, sql_service
+from app.services.hedging import looks_like_sql
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+log = get_logger("llm")
+
+FAST, FULL = "fast", "full"
+
+# Phrases that usually mean more than one table, grouping or ranking
+_COMPLEX_HINTS = re.compile(
+    r"\b(join|joined|each|per|group(ed)? by|between|compare[sd]?|versus|vs|across|along with|together with|"
+    r"ratio|percent(age)?|rank(ed|ing)?|top \d+|for every|without|never|who have|that have|trend|over time|"
+    r"running|cumulative|average of|median)\b",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[a-z0-9_]+")
+
+model_tier_total = metrics.register(metrics.Counter(
+    "sql_assistant_model_tier_total", "Generations by model tier and outcome (served, escalated, regenerate)",
+    ("tier", "outcome"),
+))
+
+def parse_fast_models(spec: str) -> dict:
+    """Parse 'provider=model,...' into {provider: fast model}"""
+    models = {}
+    for part in spec.split(","):
+        provider, _, model = part.partition("=")
+        if provider.strip() and model.strip():
+            models[provider.strip()] = model.strip()
+    return models
+
+def fast_model_for(provider: str):
+    return parse_fast_models(settings.MODEL_TIER_FAST_MODELS).get(provider)
+
+def request_features(question: str, schema_dict: dict = None, message_history=None) -> dict:
+    """Cheap, local signals of how hard a question is"""
+    words = set(_WORD.findall(question.lower()))
+    candidate_tables = 0
+    for table in (schema_dict or {}):
+        name = table.lower()
+        if name in words or name.rstrip("s") in words or f"{name}s" in words:
+            candidate_tables += 1
+    return {
+        "words": len(question.split()),
+        "candidate_tables": candidate_tables,
+        "complex_hints": len(_COMPLEX_HINTS.findall(question)),
+        "history_depth": len(message_history or []),
+    }
+
+def choose_tier(features: dict) -> str:
+    """FAST for short single-table questions without join/grouping hints or a long conversation"""
+    if (
+        features["words"] <= settings.MODEL_TIER_MAX_WORDS
+        and features["candidate_tables"] <= 1
+        and features["complex_hints"] == 0
+        and features["history_depth"] <= settings.MODEL_TIER_MAX_HISTORY
+    ):
+        return FAST
+    return FULL
+
+async def passes_checks(sql: str, db_config: dict = None) -> bool:
+    """The cheap model's answer is kept only if it looks like SQL and the database can plan it"""
+    if not looks_like_sql(sql):
+        return False
+    if db_config is None:
+        return True
+    return await asyncio.to_thread(sql_service.sql_plans_cleanly, sql, db_config) is not False
+
+async def generate_sql_tiered(provider: str, model: str, url: str, prompt: str, features: dict,
+                              hedge: str = None, db_config: dict = None) -> tuple:
+    """Generate with the fast model when the question looks simple, escalating to `model` on failure
+
+    Returns (sql, tier) where tier is the one whose answer was used.
+    """
+    fast_model = fast_model_for(provider) if settings.MODEL_TIER_ENABLED else None
+    if not fast_model or fast_model == model or choose_tier(features) == FULL:
+        sql = await llm_service.generate_sql(provider=provider, model=model, url=url, prompt=prompt, hedge=hedge, db_config=db_config)
+        model_tier_total.inc(tier=FULL, outcome="served")
+        return sql, FULL
+
+    try:
+        sql = await llm_service.generate_sql(provider=provider, model=fast_model, url=url, prompt=prompt, hedge=hedge, db_config=db_config)
+        if await passes_checks(sql, db_config):
+            model_tier_total.inc(tier=FAST, outcome="served")
+            return sql, FAST
+        reason = "failed validation"
+    except (HTTPException, ValueError, RuntimeError) as e:
+        reason = str(getattr(e, "detail", e))
+
+    log.info(f"Escalating from {fast_model} to {model}: {reason}", provider=provider)
+    model_tier_total.inc(tier=FAST, outcome="escalated")
+    sql = await llm_service.generate_sql(provider=provider, model=model, url=url, prompt=prompt, hedge=hedge, db_config=db_config)
+    return sql, FULL
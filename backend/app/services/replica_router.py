@@ -0,0 +1,193 @@
+# app/services/replica_router.py
+import itertools
+import threading
+import time
+from app.config import settings
+from app.utils.db_utils import connection_label, get_replica_lag, is_connection_error, is_read_only, pool_status
+from app.utils.logger import get_logger, truncate
+from app.utils import metrics
+
+log = get_logger("sql")
+
+PRIMARY, REPLICA = "primary", "replica"
+
+db_queries_total = metrics.register(metrics.Counter(
+    "sql_assistant_db_queries_total", "Statements executed per database target and role",
+    ("target", "role"),
+))
+db_replica_failbacks_total = metrics.register(metrics.Counter(
+    "sql_assistant_db_replica_failbacks_total", "Read-only statements sent back to the primary, by reason",
+    ("reason",),
+))
+
+class StatementAborted(Exception):
+    """Raised by a `run` callable when its caller stopped the statement (cancelled, over a limit); never retried"""
+
+def replica_configs(db_config: dict) -> list:
+    """A full connection config per replica: the primary's settings overridden by the replica's"""
+    configs = []
+    for replica in db_config.get("replicas") or []:
+        overrides = {key: value for key, value in replica.items() if value not in (None, "")}
+        configs.append(dict(db_config, replicas=None, **overrides))
+    return configs
+
+class DbTarget:
+    """Outstanding statements, EWMA latency, replication lag and health for one database endpoint"""
+
+    def __init__(self, label: str, role: str):
+        self.label = label
+        self.role = role
+        self.outstanding = 0
+        self.ewma_latency = None
+        self.lag = 0.0
+        self.lag_checked_at = 0.0
+        self.down_until = 0.0
+        self._checking_lag = False
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.outstanding += 1
+
+    def end(self, duration: float = None):
+        with self._lock:
+            self.outstanding -= 1
+            if duration is not None:
+                alpha = settings.REPLICA_EWMA_ALPHA
+                self.ewma_latency = duration if self.ewma_latency is None else alpha * duration + (1 - alpha) * self.ewma_latency
+
+    def mark_down(self, reason: str):
+        self.down_until = time.monotonic() + settings.REPLICA_DOWN_S
+        log.warning(f"Replica {self.label} taken out of rotation for {settings.REPLICA_DOWN_S}s: {reason}")
+
+    def refresh_lag(self, db_config: dict):
+        """Re-check replication lag when due; one thread checks while the others use the last value"""
+        with self._lock:
+            if self._checking_lag or time.monotonic() - self.lag_checked_at < settings.REPLICA_LAG_CHECK_S:
+                return
+            self._checking_lag = True
+        try:
+            self.lag = get_replica_lag(db_config)
+        except Exception as e:
+            self.lag = None
+            log.warning(f"Lag check failed for replica {self.label}: {str(e)}")
+        finally:
+            self.lag_checked_at = time.monotonic()
+            self._checking_lag = False
+
+    def available(self, db_config: dict) -> bool:
+        if time.monotonic() < self.down_until:
+            return False
+        self.refresh_lag(db_config)
+        return self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_S
+
+    def snapshot(self) -> dict:
+        return {
+            "target": self.label,
+            "role": self.role,
+            "outstanding": self.outstanding,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "lag_s": self.lag,
+            "down": time.monotonic() < self.down_until,
+        }
+
+_targets = {}
+_targets_lock = threading.Lock()
+
+def get_target(db_config: dict, role: str) -> DbTarget:
+    label = connection_label(db_config)
+    target = _targets.get((label, role))
+    if target is None:
+        with _targets_lock:
+            target = _targets.setdefault((label, role), DbTarget(label, role))
+    return target
+
+_next_replica = itertools.count()
+
+def choose_replica(db_config: dict):
+    """(replica config, target) with the fewest outstanding statements, ties taken in turn; None if none is usable"""
+    candidates = []
+    for config in replica_configs(db_config):
+        target = get_target(config, REPLICA)
+        if target.available(config):
+            candidates.append((config, target))
+    if not candidates:
+        return None
+    # Rotate the starting point so idle replicas share the load instead of the first one taking it all
+    start = next(_next_replica) % len(candidates)
+    rotated = candidates[start:] + candidates[:start]
+    return min(rotated, key=lambda candidate: candidate[1].outstanding)
+
+def run_on(target: DbTarget, run, sql: str, db_config: dict):
+    target.begin()
+    start = time.perf_counter()
+    try:
+        result = run(sql, db_config)
+    except Exception:
+        target.end()
+        raise
+    target.end(time.perf_counter() - start)
+    db_queries_total.inc(target=target.label, role=target.role)
+    return result
+
+def execute(sql: str, db_config: dict, run):
+    """Run `run(sql, config)` on a replica when the statement is read-only, else (or on failure) on the primary"""
+    if not is_read_only(sql):
+        return run_on(get_target(db_config, PRIMARY), run, sql, db_config)
+    return execute_read(sql, db_config, run)
+
+def execute_read(sql: str, db_config: dict, run):
+    """Like execute, for work the caller knows only reads (e.g. queries it builds itself rather than `sql`)"""
+    primary = get_target(db_config, PRIMARY)
+    if not settings.REPLICA_ROUTING_ENABLED or not db_config.get("replicas"):
+        return run_on(primary, run, sql, db_config)
+
+    choice = choose_replica(db_config)
+    if choice is None:
+        db_replica_failbacks_total.inc(reason="no_replica_available")
+        return run_on(primary, run, sql, db_config)
+
+    replica_config, replica = choice
+    try:
+        return run_on(replica, run, sql, replica_config)
+    except StatementAborted:
+        raise
+    except Exception as replica_error:
+        # Syntax and permission errors or timeouts would fail (or be just as slow) on the primary too;
+        # only an unreachable replica is worth retrying there
+        if not is_connection_error(replica_error):
+            raise
+        log.warning(f"Replica {replica.label} unreachable, retrying on the primary: {truncate(str(replica_error))}")
+        db_replica_failbacks_total.inc(reason="replica_error")
+        replica.mark_down(str(replica_error))
+        return run_on(primary, run, sql, db_config)
+
+def snapshot() -> list:
+    """State of every database target seen so far"""
+    return [target.snapshot() for target in list(_targets.values())]
+
+def outstanding_statements() -> dict:
+    return {(t.label, t.role): t.outstanding for t in list(_targets.values())}
+
+def pool_connections() -> dict:
+    values = {}
+    for label, (checked_out, idle) in pool_status().items():
+        values[(label, "checked_out")] = checked_out
+        values[(label, "idle")] = idle
+    return values
+
+def replica_lag() -> dict:
+    return {(t.label,): t.lag for t in list(_targets.values()) if t.role == REPLICA and t.lag is not None}
+
+metrics.register(metrics.Gauge(
+    "sql_assistant_db_outstanding_statements", "Statements in flight per database target",
+    ("target", "role"), callback=outstanding_statements,
+))
+metrics.register(metrics.Gauge(
+    "sql_assistant_db_replica_lag_seconds", "Last measured replication lag per replica",
+    ("target",), callback=replica_lag,
+))
+metrics.register(metrics.Gauge(
+    "sql_assistant_db_pool_connections", "Pooled connections per database target (checked_out, idle)",
+    ("target", "state"), callback=pool_connections,
+))
@@ -0,0 +1,208 @@
+# app/services/result_store.py
+#
+# Query results held in worker memory up to RESULT_SPILL_THRESHOLD_BYTES; beyond that the
+# rows go to a columnar spill file (app.utils.result_spill) that pages, exports and chart
+# aggregations read through mmap, so worker RSS doesn't grow with result size.
+import itertools
+import os
+import threading
+import time
+import uuid
+from app.config import settings
+from app.utils import db_utils, serialization
+from app.utils.logger import get_logger
+from app.utils import metrics
+from app.utils.result_spill import SpillError, SpillFile, SpillWriter
+
+log = get_logger("sql")
+
+SAMPLE_ROWS = 100
+
+results_spilled_total = metrics.register(metrics.Counter(
+    "sql_assistant_results_spilled_total", "Query results that crossed RESULT_SPILL_THRESHOLD_BYTES and went to disk",
+))
+
+def result_dir() -> str:
+    return settings.RESULT_DIR or os.path.join(settings.DATA_DIR, "results")
+
+def result_path(result_id: str) -> str:
+    return os.path.join(result_dir(), f"{result_id}.res")
+
+def estimate_bytes(rows: list) -> int:
+    """Approximate encoded size of a batch, from a sample of its rows"""
+    if not rows:
+        return 0
+    sample = rows[:SAMPLE_ROWS]
+    return len(serialization.dumps(sample)) * len(rows) // len(sample)
+
+class ResultBuffer:
+    """Rows of one result: in memory while small, in a spill file once over the threshold"""
+
+    def __init__(self, user_id: str, threshold_bytes: int, path: str = None):
+        self.user_id = user_id
+        self.threshold_bytes = threshold_bytes
+        self.columns = []
+        self.rows = []
+        self.row_count = 0
+        self.estimated_bytes = 0
+        self.result_id = None
+        self.path = path  # Spill here (jobs), else a new file under result_dir() once over the threshold
+        self._writer = None
+
+    @property
+    def spilled(self) -> bool:
+        return self.result_id is not None
+
+    def append(self, columns: list, rows: list):
+        self.columns = columns
+        self.row_count += len(rows)
+        if self._writer is not None:
+            self._writer.write_rows(rows)
+            return
+        self.rows.extend(rows)
+        self.estimated_bytes += estimate_bytes(rows)
+        if self.estimated_bytes > self.threshold_bytes:
+            self.spill()
+
+    def spill(self):
+        if self.path is None:
+            purge_expired()
+            self.result_id = str(uuid.uuid4())
+            self.path = result_path(self.result_id)
+        else:
+            self.result_id = os.path.basename(self.path).rsplit(".", 1)[0]
+        meta = {"user_id": self.user_id, "created_at": time.time()}
+        self._writer = SpillWriter(self.path, self.columns, meta)
+        for start in range(0, len(self.rows), settings.RESULT_BATCH_ROWS):
+            self._writer.write_rows(self.rows[start:start + settings.RESULT_BATCH_ROWS])
+        self.rows = []
+        results_spilled_total.inc()
+
+    def finish(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            log.info(f"Result {self.result_id} spilled to disk: {self.row_count} rows")
+
+    def discard(self):
+        """Drop a partial result (e.g. the statement failed on a replica and is retried elsewhere)"""
+        if self._writer is not None:
+            self._writer.discard()
+            self._writer = None
+        self.rows = []
+
+    def to_dict(self) -> dict:
+        """{"columns", "rows"} of an in-memory result"""
+        return {"columns": self.columns, "rows": self.rows}
+
+def fetch(sql: str, db_config: dict, user_id: str, path: str = None, batch_rows: int = None,
+          on_connect=None, on_batch=None) -> ResultBuffer:
+    """Run a query, buffering its rows in memory until RESULT_SPILL_THRESHOLD_BYTES and on disk beyond
+
+    With `path` the result always goes to that file. `on_batch(buffer, rows)` runs after each
+    fetched batch and may raise to stop the statement.
+    """
+    threshold = 0 if path is not None else settings.RESULT_SPILL_THRESHOLD_BYTES
+    buffer = ResultBuffer(user_id, threshold, path)
+    try:
+        for columns, rows in db_utils.stream_sql(sql, db_config, batch_rows or settings.RESULT_BATCH_ROWS, on_connect):
+            buffer.append(columns, rows)
+            if on_batch is not None:
+                on_batch(buffer, rows)
+        if path is not None and not buffer.spilled:
+            buffer.spill()  # An empty result still gets its file
+        buffer.finish()
+        return buffer
+    except BaseException:
+        buffer.discard()
+        raise
+
+def open_result(result_id: str, user_id: str, path: str = None):
+    """The mmap'd spill file of a result, or None if it is missing, expired or someone else's"""
+    path = path or result_path(result_id)
+    try:
+        spill = SpillFile(path)
+    except FileNotFoundError:
+        return None
+    except SpillError as e:
+        log.warning(f"Ignoring unreadable result {path}: {str(e)}")
+        return None
+    if spill.meta.get("user_id") != user_id:
+        spill.close()
+        return None
+    return spill
+
+def page(spill: SpillFile, offset: int, limit: int) -> dict:
+    """{"columns", "rows", "offset", "total", "next_offset"} for rows [offset, offset + limit)"""
+    rows = spill.rows(offset, limit)
+    next_offset = offset + len(rows) if offset + len(rows) < spill.row_count else None
+    return {"columns": spill.columns, "rows": rows, "offset": offset, "total": spill.row_count, "next_offset": next_offset}
+
+def encoded_response_chunks(spill: SpillFile, extra: dict, rows_per_chunk: int = 1000):
+    """A JSON object {"columns", "rows", **extra} as byte chunks, streamed from the spill file"""
+    yield b'{"columns":' + serialization.dumps(spill.columns) + b',"rows":['
+    separator = b""
+    for offset in range(0, spill.row_count, rows_per_chunk):
+        yield separator + b",".join(spill.encoded_rows(offset, rows_per_chunk))
+        separator = b","
+    yield b"]," + serialization.dumps(extra)[1:]
+
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+def aggregate(spill: SpillFile, group_by: str, value: str, op: str, limit: int) -> dict:
+    """Chart data: `op` of column `value` per distinct `group_by`, largest first, reading only those columns"""
+    if op not in AGGREGATES:
+        raise ValueError(f"op must be one of {', '.join(AGGREGATES)}")
+    for name in (group_by, value):
+        if name is not None and name not in spill.columns:
+            raise ValueError(f"Unknown column: {name}")
+    if op != "count" and value is None:
+        raise ValueError(f"{op} needs a value column")
+
+    groups = {}
+    values = spill.column(value) if value is not None else itertools.repeat(None)
+    for key, item in zip(spill.column(group_by), values):
+        key = key if not isinstance(key, (list, dict)) else str(key)
+        state = groups.setdefault(key, [0, 0.0, None, None])  # count, sum, min, max
+        if op == "count":
+            state[0] += 1
+            continue
+        try:
+            number = float(item)
+        except (TypeError, ValueError):
+            continue
+        state[0] += 1
+        state[1] += number
+        state[2] = number if state[2] is None else min(state[2], number)
+        state[3] = number if state[3] is None else max(state[3], number)
+
+    def result(state):
+        count, total, low, high = state
+        return {"count": count, "sum": total, "avg": total / count if count else None, "min": low, "max": high}[op]
+
+    rows = sorted(([key, result(state)] for key, state in groups.items()),
+                  key=lambda row: (row[1] is None, -(row[1] or 0)))
+    label = "count" if op == "count" else f"{op}({value})"
+    return {"columns": [group_by, label], "rows": rows[:limit], "groups": len(rows)}
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+def purge_expired():
+    """Delete spilled results older than RESULT_TTL_S (by file age)"""
+    global _last_sweep
+    with _sweep_lock:
+        if time.time() - _last_sweep < settings.RESULT_SWEEP_INTERVAL_S:
+            return
+        _last_sweep = time.time()
+    try:
+        entries = list(os.scandir(result_dir()))
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - settings.RESULT_TTL_S
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,142 @@
+# app/services/schema_cache.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.utils.db_utils import connection_fingerprint, get_catalog_version
+from app.utils.logger import get_logger
+from app.utils.schema_snapshot import SnapshotError, read_snapshot, write_snapshot
+from app.utils import metrics
+
+log = get_logger("sql")
+
+schema_cache_total = metrics.register(metrics.Counter(
+    "sql_assistant_schema_cache_total", "Schema lookups by source: memory, disk (snapshot), reflect",
+    ("source",),
+))
+
+class CachedSchema:
+    """A schema held in memory; `schema` is a SchemaSnapshot or anything with schema_str/schema_dict"""
+
+    def __init__(self, schema, catalog_version: str, checked_at: float):
+        self.schema = schema
+        self.catalog_version = catalog_version
+        self.checked_at = checked_at
+
+class ReflectedSchema:
+    def __init__(self, schema_str: str, schema_dict: dict):
+        self.schema_str = schema_str
+        self.schema_dict = schema_dict
+
+_memory = {}
+_recent = {}  # fingerprint -> (db_config, last used), for the background refresher
+_lock = threading.Lock()
+_refreshing = set()
+# Revalidation against the live catalog happens off the request path
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="schema-refresh")
+
+def cache_dir() -> str:
+    return settings.SCHEMA_CACHE_DIR or os.path.join(settings.DATA_DIR, "schema")
+
+def refresh(db_config: dict, fingerprint: str, reflect) -> CachedSchema:
+    """Reflect the database, then update memory and the on-disk snapshot"""
+    try:
+        catalog_version = get_catalog_version(db_config)
+    except Exception as e:
+        log.debug(f"Catalog version unavailable: {str(e)}")
+        catalog_version = ""
+    schema_str, schema_dict = reflect(db_config)
+    entry = CachedSchema(ReflectedSchema(schema_str, schema_dict), catalog_version, time.monotonic())
+    _memory[fingerprint] = entry
+
+    if catalog_version:
+        # Without a catalog version a snapshot could never be revalidated, so don't persist one
+        try:
+            write_snapshot(cache_dir(), fingerprint, catalog_version, schema_str, schema_dict)
+        except OSError as e:
+            log.warning(f"Could not write schema snapshot: {str(e)}")
+    return entry
+
+def revalidate(db_config: dict, fingerprint: str, reflect):
+    """Re-reflect only if the catalog version moved since the cached schema was taken"""
+    try:
+        entry = _memory.get(fingerprint)
+        current = get_catalog_version(db_config)
+        if entry is not None and entry.catalog_version and current == entry.catalog_version:
+            entry.checked_at = time.monotonic()
+            return
+        log.info(f"Schema changed for connection {fingerprint}; refreshing snapshot")
+        refresh(db_config, fingerprint, reflect)
+    except Exception as e:
+        log.warning(f"Schema revalidation failed for {fingerprint}: {str(e)}")
+    finally:
+        with _lock:
+            _refreshing.discard(fingerprint)
+
+def schedule_revalidation(db_config: dict, fingerprint: str, reflect):
+    with _lock:
+        if fingerprint in _refreshing:
+            return
+        _refreshing.add(fingerprint)
+    _executor.submit(revalidate, dict(db_config), fingerprint, reflect)
+
+def get_schema(db_config: dict, reflect) -> tuple:
+    """(schema_str, schema_dict) from memory or a disk snapshot when possible, else via `reflect(db_config)`
+
+    Cached schemas are served immediately; once older than SCHEMA_CACHE_TTL_S (or when loaded
+    from disk by a fresh worker) they are revalidated against the catalog version in the background.
+    """
+    if not settings.SCHEMA_CACHE_ENABLED:
+        return reflect(db_config)
+
+    fingerprint = connection_fingerprint(db_config)
+    _recent[fingerprint] = (db_config, time.monotonic())
+    entry = _memory.get(fingerprint)
+    source = "memory"
+    if entry is None:
+        snapshot = read_snapshot(cache_dir(), fingerprint)
+        if snapshot is not None:
+            entry = _memory[fingerprint] = CachedSchema(snapshot, snapshot.catalog_version, checked_at=0.0)
+            source = "disk"
+
+    if entry is not None:
+        try:
+            result = entry.schema.schema_str, entry.schema.schema_dict
+        except SnapshotError as e:
+            log.warning(f"Discarding corrupt schema snapshot: {str(e)}")
+            _memory.pop(fingerprint, None)
+        else:
+            if time.monotonic() - entry.checked_at > settings.SCHEMA_CACHE_TTL_S:
+                schedule_revalidation(db_config, fingerprint, reflect)
+            schema_cache_total.inc(source=source)
+            return result
+
+    schema_cache_total.inc(source="reflect")
+    entry = refresh(db_config, fingerprint, reflect)
+    return entry.schema.schema_str, entry.schema.schema_dict
+
+def recent_connections(window: float) -> list:
+    """(fingerprint, db_config) for connections whose schema was requested in the last `window` seconds"""
+    now = time.monotonic()
+    recent = []
+    for fingerprint, (db_config, last_used) in list(_recent.items()):
+        if now - last_used > window:
+            _recent.pop(fingerprint, None)
+        else:
+            recent.append((fingerprint, db_config))
+    return recent
+
+def schema_age(fingerprint: str):
+    """Seconds since the cached schema was last taken or revalidated; None if not cached"""
+    entry = _memory.get(fingerprint)
+    return time.monotonic() - entry.checked_at if entry is not None else None
+
+def catalog_version(db_config: dict) -> str:
+    """Catalog version of the schema currently cached for a connection ("" if none)"""
+    entry = _memory.get(connection_fingerprint(db_config))
+    return entry.catalog_version if entry is not None else ""
+
+def invalidate(db_config: dict):
+    """Forget the cached schema for a connection (memory only; the snapshot is revalidated on next load)"""
+    _memory.pop(connection_fingerprint(db_config), None)
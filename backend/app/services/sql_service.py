@@ -1,54 +1,139 @@
 # app/services/sql_service.py
 import time
-from app.utils.colors import Colors as C
-from app.utils.db_utils import test_connection, get_db_schema, execute_sql as execute_sql_query
+from app.config import settings
+from app.services import replica_router, result_store, schema_cache
+from app.utils.logger import get_logger, truncate
+from app.utils import metrics, query_plan
+from app.utils.db_utils import (
+    test_connection, get_db_schema, get_table_keys, execute_sql as execute_sql_query, explain_query, explain_plan,
+    EXPLAIN_PREFIXES,
+)
+
+log = get_logger("sql")
+
+def reflect_schema(db_config: dict) -> tuple:
+    """Reflect the schema from the database itself"""
+    with metrics.track_stage("schema"):
+        return get_db_schema(db_config)
 
 def get_schema(db_config: dict) -> tuple:
-    """Get the schema for a database"""
-    print(f"{C.SQL}[SQL]{C.RESET} Getting database schema...")
+    """Get the schema for a database (cached in memory and on disk, see schema_cache)"""
+    log.debug("Getting database schema...")
     start_time = time.time()
     
     try:
-        schema_str, schema_dict = get_db_schema(db_config)
+        schema_str, schema_dict = schema_cache.get_schema(db_config, reflect_schema)
         
         process_time = time.time() - start_time
-        print(f"{C.SQL}[SQL]{C.RESET} Schema processed in {process_time:.2f}s")
+        log.info(f"Schema processed in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
         
         return schema_str, schema_dict
         
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Database schema error: {str(e)}")
+        log.error(f"Database schema error: {str(e)}")
         raise RuntimeError(f"Database schema error: {str(e)}")
 
 def execute_sql(sql: str, db_config: dict) -> dict:
     """Execute SQL and return results"""
-    print(f"{C.SQL}[SQL]{C.RESET} Executing query: {sql}")
+    log.debug(f"Executing query: {truncate(sql)}")
     start_time = time.time()
 
     try:
-        result = execute_sql_query(sql, db_config)
+        with metrics.track_stage("db"):
+            result = replica_router.execute(sql, db_config, execute_sql_query)
+        metrics.db_rows_returned.observe(len(result["rows"]), endpoint=metrics.current_endpoint())
         
         process_time = time.time() - start_time
-        print(f"{C.SQL}[SQL]{C.RESET} Query executed in {process_time:.2f}s")
+        log.info(f"Query executed in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
         
         return result
                 
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} SQL execution failed: {str(e)}")
+        log.error(f"SQL execution failed: {str(e)}")
+        raise RuntimeError(f"SQL error: {str(e)}")
+
+def execute_sql_buffered(sql: str, db_config: dict, user_id: str) -> result_store.ResultBuffer:
+    """Execute SQL; results over RESULT_SPILL_THRESHOLD_BYTES spill to disk instead of staying in memory"""
+    log.debug(f"Executing query: {truncate(sql)}")
+    start_time = time.time()
+
+    try:
+        with metrics.track_stage("db"):
+            result = replica_router.execute(
+                sql, db_config, lambda sql, config: result_store.fetch(sql, config, user_id)
+            )
+        metrics.db_rows_returned.observe(result.row_count, endpoint=metrics.current_endpoint())
+
+        process_time = time.time() - start_time
+        log.info(f"Query executed in {process_time:.2f}s{' (spilled to disk)' if result.spilled else ''}",
+                 duration_ms=round(process_time * 1000, 1))
+
+        return result
+
+    except Exception as e:
+        log.error(f"SQL execution failed: {str(e)}")
         raise RuntimeError(f"SQL error: {str(e)}")
 
+def sql_plans_cleanly(sql: str, db_config: dict):
+    """True/False if the database can plan the statement via EXPLAIN; None if the dialect has no EXPLAIN"""
+    if db_config.get("db_type") not in EXPLAIN_PREFIXES:
+        return None
+    
+    try:
+        with metrics.track_stage("explain"):
+            explain_query(sql, db_config)
+        return True
+    except Exception as e:
+        log.debug(f"EXPLAIN rejected statement: {str(e)}")
+        return False
+
+def explain_sql(sql: str, db_config: dict, analyze: bool = False) -> dict:
+    """A statement's normalized plan, its costliest nodes and candidate indexes (see query_plan)
+
+    With `analyze` the statement runs; callers must only pass read-only statements.
+    """
+    log.debug(f"Explaining query: {truncate(sql)}")
+    start_time = time.time()
+
+    with metrics.track_stage("explain"):
+        explained = replica_router.execute(
+            sql, db_config,
+            lambda sql, config: explain_plan(sql, config, analyze, settings.EXPLAIN_ANALYZE_TIMEOUT_S)
+        )
+    root = query_plan.normalize(explained)
+    hotspots = query_plan.mark_hotspots(root, settings.EXPLAIN_HOTSPOTS)
+
+    _, schema_dict = get_schema(db_config)
+    columns = query_plan.column_names(schema_dict)
+    with metrics.track_stage("schema"):
+        keys = get_table_keys(db_config, query_plan.scanned_tables(root, sql, columns))
+    recommendations = query_plan.recommend_indexes(root, sql, columns, keys, db_config.get("db_type"))
+
+    process_time = time.time() - start_time
+    log.info(f"Query explained in {process_time:.2f}s", duration_ms=round(process_time * 1000, 1))
+
+    return {
+        "dialect": db_config.get("db_type"),
+        "analyzed": analyze,
+        "total_cost": root.estimated_cost,
+        "total_time_ms": round(root.actual_time_ms, 3) if root.actual_time_ms is not None else None,
+        "plan": root.to_dict(),
+        "hotspots": hotspots,
+        "index_recommendations": recommendations,
+    }
+
 def test_db_connection(db_config: dict) -> dict:
     """Test if a database connection is valid"""
-    print(f"{C.SQL}[SQL]{C.RESET} Testing connection to database...")
+    log.debug("Testing connection to database...")
     start_time = time.time()
     
     try:
         result = test_connection(db_config)
         
         process_time = time.time() - start_time
-        print(f"{C.SQL}[SQL]{C.RESET} Connection test completed in {process_time:.2f}s")
+        log.debug(f"Connection test completed in {process_time:.2f}s")
         
         return result
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Connection test failed: {str(e)}")
+        log.error(f"Connection test failed: {str(e)}")
         return {"success": False, "message": str(e)}
\ No newline at end of file
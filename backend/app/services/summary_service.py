@@ -0,0 +1,86 @@
+# app/services/summary_service.py
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.services.chat_store import encode_cursor, get_chat_store
+from app.utils.logger import get_logger
+
+log = get_logger("chat")
+
+# Summaries are rolled forward on a single background worker, between turns
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _clip(text: str, limit: int) -> str:
+    text = _WHITESPACE.sub(" ", text or "").strip()
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def roll_summary(summary: str, sql: list, new_messages: list) -> tuple:
+    """Fold messages into an existing (summary, sql) pair; deterministic and LLM-free"""
+    lines = summary.splitlines() if summary else []
+    sql = list(sql or [])
+
+    for message in new_messages:
+        if message["role"] == "user":
+            lines.append(f"- User asked: {_clip(message['content'], 200)}")
+        elif message.get("sql"):
+            statement = _clip(message["sql"], 500)
+            if statement in sql:
+                sql.remove(statement)
+            sql.append(statement)
+        else:
+            lines.append(f"- Assistant: {_clip(message['content'], 200)}")
+
+    # Oldest facts go first when over budget
+    while lines and sum(len(line) + 1 for line in lines) > settings.CHAT_SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines), sql[-settings.CHAT_SUMMARY_MAX_SQL:]
+
+def update_summary(conversation_id: str):
+    """Roll every message except the newest CHAT_SUMMARY_RECENT into the stored summary"""
+    store = get_chat_store()
+    current = store.get_summary(conversation_id) or {"summary": "", "sql": [], "cursor": None, "message_count": 0}
+
+    # Only messages since the last roll are read, so the cost is per turn, not per conversation
+    pending, _ = store.list_messages(conversation_id, limit=10_000, cursor=current["cursor"])
+    to_fold = pending[:max(len(pending) - settings.CHAT_SUMMARY_RECENT, 0)]
+    if not to_fold:
+        return
+
+    summary, sql = roll_summary(current["summary"], current["sql"], to_fold)
+    last = to_fold[-1]
+    store.save_summary(
+        conversation_id, summary, sql,
+        encode_cursor(last["created_at"], last["id"]),
+        current["message_count"] + len(to_fold),
+    )
+    log.debug(f"Folded {len(to_fold)} messages into summary for {conversation_id}")
+
+def _run(conversation_id: str):
+    with _scheduled_lock:
+        _scheduled.discard(conversation_id)
+    try:
+        update_summary(conversation_id)
+    except Exception as e:
+        log.error(f"Summary update failed for {conversation_id}: {str(e)}")
+
+def schedule_summary(conversation_id: str):
+    """Queue a background summary update; repeated calls before it runs collapse into one"""
+    with _scheduled_lock:
+        if conversation_id in _scheduled:
+            return
+        _scheduled.add(conversation_id)
+    _executor.submit(_run, conversation_id)
+
+def conversation_context(conversation_id: str) -> tuple:
+    """(summary or None, messages not yet summarized) for building a prompt"""
+    store = get_chat_store()
+    summary = store.get_summary(conversation_id)
+    recent = store.recent_messages(
+        conversation_id, settings.CHAT_HISTORY_LIMIT, after=summary["cursor"] if summary else None
+    )
+    return summary, recent
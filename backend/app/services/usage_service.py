@@ -0,0 +1,130 @@
+# app/services/usage_service.py
+#
+# Accounting for LLM usage. Every HTTP request (see main.py) and every /ws/chat turn runs
+# under a UsageTracker; provider adapters hand each call's Usage to record(), which updates
+# the metrics and the current tracker. When the tracker closes, its calls are stored with
+# the endpoint, user, conversation and connection the request ended up with, so a new
+# conversation created mid-request is still attributed correctly.
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from app.config import settings
+from app.utils import metrics
+from app.utils.lazy import lazy_import
+from app.utils.llm_usage import Usage, total
+from app.utils.logger import get_logger
+
+# The store pulls in SQLAlchemy; load it on first use, not at startup
+usage_store = lazy_import("app.services.usage_store")
+
+log = get_logger("llm")
+
+class UsageTracker:
+    """LLM calls made on behalf of one request or chat turn"""
+
+    def __init__(self, endpoint: str = "", user_id: str = None, conversation_id: str = None, connection: str = None):
+        self.endpoint = endpoint
+        self.user_id = user_id
+        self.conversation_id = conversation_id
+        self.connection = connection
+        self.calls = []
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def add(self, usage: Usage, endpoint: str = ""):
+        with self._lock:
+            if not self.closed:
+                self.calls.append((usage, endpoint))
+                return
+        # A call that outlived the request (e.g. a streamed response still generating)
+        store([(usage, endpoint)], self)
+
+    def totals(self) -> Usage:
+        with self._lock:
+            return total([usage for usage, _ in self.calls])
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            calls, self.calls = self.calls, []
+        store(calls, self)
+
+_tracker_var = ContextVar("usage_tracker", default=None)
+
+def start_tracking(**attributes) -> tuple:
+    """Make a new UsageTracker current; returns (tracker, token) for end_tracking"""
+    tracker = UsageTracker(**attributes)
+    return tracker, _tracker_var.set(tracker)
+
+def end_tracking(tracker: UsageTracker, token):
+    _tracker_var.reset(token)
+    tracker.close()
+
+@contextmanager
+def track(**attributes):
+    """Run a block under a new UsageTracker, storing its calls when the block ends"""
+    tracker, token = start_tracking(**attributes)
+    try:
+        yield tracker
+    finally:
+        end_tracking(tracker, token)
+
+def current_tracker():
+    return _tracker_var.get()
+
+def annotate(**attributes):
+    """Attribute the current request's LLM usage to a conversation and/or connection"""
+    tracker = _tracker_var.get()
+    if tracker is None:
+        return
+    for name, value in attributes.items():
+        if value is not None:
+            setattr(tracker, name, value)
+
+def record(usage: Usage):
+    """Account for one LLM call"""
+    tracker = _tracker_var.get()
+    endpoint = metrics.current_endpoint() or (tracker.endpoint if tracker is not None else "")
+    metrics.observe_llm_usage(
+        usage.provider, usage.model,
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        cache_read_tokens=usage.cache_read_tokens,
+        cache_write_tokens=usage.cache_write_tokens,
+        ttft=usage.ttft_s,
+        endpoint=endpoint,
+    )
+    if tracker is not None:
+        tracker.add(usage, endpoint)
+    else:
+        store([(usage, endpoint)], UsageTracker())
+
+def store(calls: list, tracker: UsageTracker):
+    """Queue (usage, endpoint) pairs for the usage store, attributed to the tracker's request"""
+    if not calls or not settings.USAGE_STORE_ENABLED:
+        return
+    now = time.time()
+    rows = [
+        {
+            "created_at": now,
+            "user_id": tracker.user_id or "anonymous",
+            "endpoint": tracker.endpoint or endpoint or "background",
+            "conversation_id": tracker.conversation_id,
+            "connection": tracker.connection,
+            "provider": usage.provider,
+            "model": usage.model,
+            "input_tokens": usage.input_tokens,
+            "output_tokens": usage.output_tokens,
+            "cache_read_tokens": usage.cache_read_tokens,
+            "cache_write_tokens": usage.cache_write_tokens,
+            "ttft_ms": round(usage.ttft_s * 1000, 1) if usage.ttft_s is not None else None,
+            "total_ms": round(usage.total_s * 1000, 1),
+            "generation_ms": round(usage.generation_s * 1000, 1) if usage.generation_s is not None else None,
+        }
+        for usage, endpoint in calls
+    ]
+    try:
+        usage_store.get_usage_store().add(rows)
+    except Exception as e:
+        log.warning(f"Could not store LLM usage: {str(e)}")
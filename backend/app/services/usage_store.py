@@ -0,0 +1,170 @@
+# app/services/usage_store.py
+import os
+import queue
+import threading
+import time
+from sqlalchemy import (
+    Column, Float, Index, Integer, MetaData, String, Table,
+    create_engine, delete, event, func, insert, select,
+)
+from app.config import settings
+from app.services.chat_store import ConversationStore
+from app.utils.logger import get_logger
+
+log = get_logger("sql")
+
+metadata = MetaData()
+
+# One row per LLM call
+llm_usage = Table(
+    "llm_usage", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("created_at", Float, nullable=False),
+    Column("user_id", String(128)),
+    Column("endpoint", String(128)),
+    Column("conversation_id", String(36)),
+    Column("connection", String(256)),  # Registered connection id, or host:port/name of an inline one
+    Column("provider", String(32)),
+    Column("model", String(256)),
+    Column("input_tokens", Integer, nullable=False),
+    Column("output_tokens", Integer, nullable=False),
+    Column("cache_read_tokens", Integer, nullable=False),
+    Column("cache_write_tokens", Integer, nullable=False),
+    Column("ttft_ms", Float),
+    Column("total_ms", Float, nullable=False),
+    Column("generation_ms", Float),
+    Index("ix_llm_usage_user_created", "user_id", "created_at"),
+    Index("ix_llm_usage_conversation", "conversation_id"),
+)
+
+GROUPS = ("endpoint", "conversation_id", "connection", "provider", "model")
+
+class UsageStore:
+    """LLM usage rows on SQLite (WAL) or any SQLAlchemy URL; written in batches off the request path"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", ConversationStore._configure_sqlite)
+        metadata.create_all(self.engine)
+        self._queue = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def add(self, rows: list):
+        """Queue rows for the writer thread"""
+        if not rows:
+            return
+        if self._writer is None or not self._writer.is_alive():
+            with self._writer_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name="usage-store-writer", daemon=True)
+                    self._writer.start()
+        self._queue.put(rows)
+
+    def _write_loop(self):
+        stop = False
+        while not stop:
+            # Gather what arrives within the flush window; a waiting flush() or close() cuts it short
+            items = [self._queue.get()]
+            deadline = time.monotonic() + settings.USAGE_FLUSH_MS / 1000
+            while isinstance(items[-1], list):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = None in items
+            self._write_batch([row for item in items if isinstance(item, list) for row in item])
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write_batch(self, batch: list):
+        try:
+            with self.engine.begin() as conn:
+                if batch:
+                    conn.execute(insert(llm_usage), batch)
+                if time.time() - self._purged_at > 3600:
+                    self._purged_at = time.time()
+                    conn.execute(delete(llm_usage).where(llm_usage.c.created_at < time.time() - settings.USAGE_RETENTION_S))
+        except Exception as e:
+            log.error(f"Failed to write {len(batch)} usage rows: {str(e)}")
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until every queued row is written"""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def report(self, user_id: str, group_by: str = None, since: float = None, limit: int = 50, **filters) -> list:
+        """Totals per `group_by` value (or overall), heaviest token users first
+
+        `filters` narrows to one endpoint, conversation_id, connection, provider or model.
+        """
+        self.flush()
+        c = llm_usage.c
+        tokens = func.sum(c.input_tokens + c.output_tokens + c.cache_read_tokens + c.cache_write_tokens)
+        columns = [
+            func.count().label("calls"),
+            func.sum(c.input_tokens).label("input_tokens"),
+            func.sum(c.output_tokens).label("output_tokens"),
+            func.sum(c.cache_read_tokens).label("cached_tokens"),
+            func.sum(c.cache_write_tokens).label("cache_write_tokens"),
+            tokens.label("tokens_used"),
+            func.avg(c.ttft_ms).label("avg_ttft_ms"),
+            func.max(c.ttft_ms).label("max_ttft_ms"),
+            func.avg(c.total_ms).label("avg_total_ms"),
+            func.sum(c.total_ms).label("total_ms"),
+        ]
+        if group_by is not None:
+            columns.insert(0, c[group_by].label("key"))
+        query = select(*columns).where(c.user_id == user_id)
+        if since is not None:
+            query = query.where(c.created_at >= since)
+        for name, value in filters.items():
+            if value is not None:
+                query = query.where(c[name] == value)
+        if group_by is not None:
+            query = query.group_by(c[group_by]).order_by(tokens.desc()).limit(limit)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [
+            {key: (round(value, 1) if isinstance(value, float) else value) for key, value in row._mapping.items()}
+            for row in rows if row.calls
+        ]
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+        self.engine.dispose()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_usage_store() -> UsageStore:
+    """Shared usage store, created on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                url = settings.USAGE_STORE_URL
+                if not url:
+                    os.makedirs(settings.DATA_DIR, exist_ok=True)
+                    url = f"sqlite:///{os.path.join(settings.DATA_DIR, 'usage.db')}"
+                _store = UsageStore(url)
+                log.info(f"Usage store ready ({_store.engine.dialect.name})")
+    return _store
+
+def close_usage_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
@@ -1,9 +1,21 @@
 # app/utils/bedrock_client.py
-import boto3
 import json
-from botocore.exceptions import ClientError
+import threading
+import time
 from app.config import settings
-from app.utils.colors import Colors as C
+from app.utils.lazy import lazy_import
+from app.utils.llm_usage import Completion, Usage
+from app.utils.logger import get_logger
+from app.utils import metrics
+
+# boto3/botocore take a noticeable share of startup; load them when Bedrock is first used
+boto3 = lazy_import("boto3")
+botocore_exceptions = lazy_import("botocore.exceptions")
+
+log = get_logger("bedrock")
+
+_client = None
+_client_lock = threading.Lock()
 
 def create_bedrock_client():
     """Create and return a Bedrock client"""
@@ -14,37 +26,79 @@ def create_bedrock_client():
             aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
             aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
         )
-        print(f"{C.LLM}[BEDROCK]{C.RESET} Successfully created Bedrock client")
+        log.debug("Successfully created Bedrock client")
         return client
-    except ClientError as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Failed to create Bedrock client: {e}")
+    except botocore_exceptions.ClientError as e:
+        log.error(f"Failed to create Bedrock client: {e}")
         raise
 
-def invoke_anthropic_bedrock(client, model_id: str, prompt: str) -> str:
+def get_bedrock_client():
+    """Shared Bedrock runtime client (boto3 clients are thread-safe), created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_bedrock_client()
+    return _client
+
+def build_message_content(prompt: str):
+    """User message content; prompts with a long enough stable prefix get a cache breakpoint after it"""
+    prefix = getattr(prompt, "prefix", "")
+    if (
+        not settings.BEDROCK_PROMPT_CACHING
+        or not prefix
+        or metrics.estimate_tokens(prefix) < settings.BEDROCK_CACHE_MIN_TOKENS
+    ):
+        return prompt
+    
+    content = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+    if prompt.suffix:
+        content.append({"type": "text", "text": prompt.suffix})
+    return content
+
+def build_request(model_id: str, prompt: str) -> tuple:
+    """(model ID to invoke, JSON body) of an Anthropic Claude request on Bedrock"""
+    # Check if we're using Claude 3.7 Sonnet - if so, use the profile ARN
+    if "claude-3-7-sonnet" in model_id and settings.CLAUDE_37_PROFILE_ARN:
+        invoke_model_id = settings.CLAUDE_37_PROFILE_ARN
+        log.debug("Using Claude 3.7 Sonnet profile ARN")
+    else:
+        invoke_model_id = model_id
+    
+    # Anthropic Claude specific format
+    body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 4096,
+        "temperature": 0.1,
+        "top_p": 0.9,
+        "messages": [
+            {
+                "role": "user",
+                "content": build_message_content(prompt)
+            }
+        ]
+    }
+    return invoke_model_id, body
+
+def bedrock_usage(model_id: str, usage: dict, total_s: float, ttft_s: float = None) -> Usage:
+    """Usage from the "usage" block of an Anthropic response on Bedrock"""
+    return Usage(
+        "bedrock", model_id,
+        input_tokens=usage.get("input_tokens", 0),
+        output_tokens=usage.get("output_tokens", 0),
+        cache_read_tokens=usage.get("cache_read_input_tokens", 0),
+        cache_write_tokens=usage.get("cache_creation_input_tokens", 0),
+        ttft_s=ttft_s,
+        total_s=total_s,
+        generation_s=total_s - ttft_s if ttft_s is not None else None,
+    )
+
+def invoke_anthropic_bedrock(client, model_id: str, prompt: str) -> Completion:
     """Invoke Anthropic Claude on Bedrock"""
     try:
-        print(f"{C.LLM}[BEDROCK]{C.RESET} Invoking Anthropic model: {model_id}")
-        
-        # Check if we're using Claude 3.7 Sonnet - if so, use the profile ARN
-        if "claude-3-7-sonnet" in model_id and settings.CLAUDE_37_PROFILE_ARN:
-            invoke_model_id = settings.CLAUDE_37_PROFILE_ARN
-            print(f"{C.LLM}[BEDROCK]{C.RESET} Using Claude 3.7 Sonnet profile ARN")
-        else:
-            invoke_model_id = model_id
-        
-        # Anthropic Claude specific format
-        body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 4096,
-            "temperature": 0.1,
-            "top_p": 0.9,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        }
+        log.debug(f"Invoking Anthropic model: {model_id}")
+        invoke_model_id, body = build_request(model_id, prompt)
+        start = time.perf_counter()
         
         response = client.invoke_model(
             modelId=invoke_model_id,
@@ -55,14 +109,67 @@ def invoke_anthropic_bedrock(client, model_id: str, prompt: str) -> str:
         
         response_body = json.loads(response['body'].read())
         
+        usage = response_body.get("usage") or {}
+        if usage.get("cache_read_input_tokens"):
+            log.debug(f"Prompt cache hit: {usage['cache_read_input_tokens']} cached input tokens")
+        usage = bedrock_usage(model_id, usage, time.perf_counter() - start)
+        
         # Extract response from Anthropic format
         if "content" in response_body:
             content = response_body["content"]
             if isinstance(content, list) and len(content) > 0:
-                return content[0].get("text", "")
+                return Completion(content[0].get("text", ""), usage)
         
-        return response_body.get("completion", "")
+        return Completion(response_body.get("completion", ""), usage)
         
-    except ClientError as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Bedrock model invocation failed: {e}")
-        raise
\ No newline at end of file
+    except botocore_exceptions.ClientError as e:
+        log.error(f"Bedrock model invocation failed: {e}")
+        raise
+
+def ping_anthropic_bedrock(client, model_id: str):
+    """Invoke a model for a single token; raises if it does not answer"""
+    invoke_model_id, body = build_request(model_id, "Hi")
+    body["max_tokens"] = 1
+    response = client.invoke_model(
+        modelId=invoke_model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(body)
+    )
+    response['body'].read()
+
+def stream_anthropic_bedrock(client, model_id: str, prompt: str, on_usage=None):
+    """Invoke Anthropic Claude on Bedrock with a response stream, yielding text as it arrives
+
+    `on_usage(Usage)` is called once the stream ends (or is closed early).
+    """
+    log.debug(f"Streaming from Anthropic model: {model_id}")
+    invoke_model_id, body = build_request(model_id, prompt)
+    start = time.perf_counter()
+    response = client.invoke_model_with_response_stream(
+        modelId=invoke_model_id,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(body)
+    )
+    stream = response["body"]
+    usage = {}
+    ttft_s = None
+    try:
+        for event in stream:
+            if "chunk" not in event:
+                continue
+            data = json.loads(event["chunk"]["bytes"])
+            if data.get("type") == "message_start":
+                usage.update(data.get("message", {}).get("usage") or {})
+            elif data.get("type") == "message_delta":
+                usage.update(data.get("usage") or {})
+            elif data.get("type") == "content_block_delta" and data.get("delta", {}).get("type") == "text_delta":
+                if ttft_s is None:
+                    ttft_s = time.perf_counter() - start
+                yield data["delta"]["text"]
+    finally:
+        # Stopping early (the caller cancelled) closes the HTTP stream
+        stream.close()
+        if on_usage is not None:
+            on_usage(bedrock_usage(model_id, usage, time.perf_counter() - start, ttft_s))
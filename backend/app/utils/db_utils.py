@@ -1,10 +1,21 @@
 # app/utils/db_utils.py
-from sqlalchemy import create_engine, inspect, MetaData, text
-from sqlalchemy.exc import SQLAlchemyError
-import logging
-from app.utils.colors import Colors as C
+import functools
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from app.config import settings
+from app.utils.lazy import lazy_import
+from app.utils.logger import get_logger, truncate
 
-logger = logging.getLogger(__name__)
+# SQLAlchemy is imported on first database use rather than at startup
+sqlalchemy = lazy_import("sqlalchemy")
+
+log = get_logger("sql")
+
+_engines = OrderedDict()
+_engines_lock = threading.Lock()
 
 def build_connection_string(db_config: dict) -> str:
     """Build a SQLAlchemy connection string from database configuration"""
@@ -49,47 +60,173 @@ def build_connection_string(db_config: dict) -> str:
     else:
         raise ValueError(f"Unsupported database type: {db_type}")
 
+@functools.lru_cache(maxsize=256)
+def _credential_hash(identity: str, password: str) -> str:
+    # Slow and salted per database, so a fingerprint seen in a log or file name is no shortcut to the password
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), identity.encode("utf-8"), 100_000).hex()
+
+def connection_fingerprint(db_config: dict) -> str:
+    """Stable id for a database (type, host, port, name, user) and the password used on it
+
+    Schema snapshots, column samples and examples are keyed by it, so a cached entry is only
+    ever served to a caller holding the credentials it was built with.
+    """
+    parts = [str(db_config.get(key) or "") for key in ('db_type', 'db_host', 'db_port', 'db_name', 'db_user')]
+    identity = "|".join(parts)
+    parts.append(_credential_hash(identity, str(db_config.get('db_password') or "")))
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def connection_label(db_config: dict) -> str:
+    """host:port/name (or the SQLite path) for logs and metrics, without credentials"""
+    if db_config.get('db_type') == 'sqlite':
+        return db_config.get('db_name') or ''
+    return f"{db_config.get('db_host') or ''}:{db_config.get('db_port') or ''}/{db_config.get('db_name') or ''}"
+
+def get_engine(db_config: dict):
+    """Shared engine (and connection pool) per connection string, least recently used evicted"""
+    conn_string = build_connection_string(db_config)
+    with _engines_lock:
+        cached = _engines.get(conn_string)
+        if cached is not None:
+            _engines.move_to_end(conn_string)
+            return cached[1]
+    
+    engine = sqlalchemy.create_engine(conn_string, pool_pre_ping=True)
+    with _engines_lock:
+        cached = _engines.get(conn_string)
+        if cached is not None:
+            engine.dispose()
+            return cached[1]
+        _engines[conn_string] = (connection_label(db_config), engine)
+        evicted = []
+        while len(_engines) > settings.DB_ENGINE_CACHE_SIZE:
+            evicted.append(_engines.popitem(last=False)[1][1])
+    for old in evicted:
+        old.dispose()
+    return engine
+
+def dispose_engines():
+    """Close every pooled connection (shutdown)"""
+    with _engines_lock:
+        engines = [engine for _, engine in _engines.values()]
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+def warm_pool(db_config: dict, min_size: int) -> int:
+    """Open connections until the pool holds `min_size` (within its size limit); returns how many were opened"""
+    engine = get_engine(db_config)
+    pool = engine.pool
+    if not hasattr(pool, 'checkedin') or not hasattr(pool, 'size'):
+        return 0
+    missing = min(min_size, pool.size()) - pool.checkedin() - pool.checkedout()
+    connections = []
+    try:
+        for _ in range(max(missing, 0)):
+            connections.append(engine.connect())
+    finally:
+        # Closing returns them to the pool, ready for the next request
+        for conn in connections:
+            conn.close()
+    return len(connections)
+
+def pool_status() -> dict:
+    """{label: (checked out, idle)} per pooled engine; pools that don't count connections are skipped"""
+    with _engines_lock:
+        engines = list(_engines.values())
+    status = {}
+    for label, engine in engines:
+        pool = engine.pool
+        if hasattr(pool, 'checkedout') and hasattr(pool, 'checkedin'):
+            status[label] = (pool.checkedout(), pool.checkedin())
+    return status
+
 def test_connection(db_config: dict) -> dict:
     """Test database connection and return result"""
-    print(f"{C.SQL}[SQL]{C.RESET} Testing connection to database...")
+    log.debug("Testing connection to database...")
     
     try:
-        # Build connection string
-        conn_string = build_connection_string(db_config)
-        print(f"{C.SQL}[SQL]{C.RESET} Connection string created (redacted for security)")
-        
-        # Create a SQLAlchemy engine and test connection
-        engine = create_engine(conn_string)
+        # Get the pooled SQLAlchemy engine and test connection
+        engine = get_engine(db_config)
         with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-            print(f"{C.SQL}[SQL]{C.RESET} Connection test successful")
+            conn.execute(sqlalchemy.text("SELECT 1"))
+            log.debug("Connection test successful")
             return {"success": True, "message": "Connection successful"}
     
     except ValueError as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Connection string error: {str(e)}")
+        log.error(f"Connection string error: {str(e)}")
         return {"success": False, "message": str(e)}
     
-    except SQLAlchemyError as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Database connection error: {str(e)}")
+    except sqlalchemy.exc.SQLAlchemyError as e:
+        log.error(f"Database connection error: {str(e)}")
         return {"success": False, "message": f"Database error: {str(e)}"}
     
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Unexpected error: {str(e)}")
+        log.error(f"Unexpected error: {str(e)}")
         return {"success": False, "message": f"Error: {str(e)}"}
 
+# Cheap "has the schema changed?" queries; much lighter than reflecting every table
+CATALOG_VERSION_QUERIES = {
+    'sqlite': "PRAGMA schema_version",
+    'postgres': (
+        "SELECT md5(string_agg(table_name || '.' || column_name || ':' || data_type, ',' "
+        "ORDER BY table_name, ordinal_position)) FROM information_schema.columns "
+        "WHERE table_schema NOT IN ('pg_catalog', 'information_schema')"
+    ),
+    'mysql': (
+        "SELECT COUNT(*), SUM(CRC32(CONCAT(table_name, '.', column_name, ':', column_type))) "
+        "FROM information_schema.columns WHERE table_schema = DATABASE()"
+    ),
+    'mssql': "SELECT COUNT(*), MAX(modify_date) FROM sys.objects WHERE type IN ('U', 'V')",
+}
+
+def get_catalog_version(db_config: dict) -> str:
+    """Opaque token that changes whenever tables or columns change"""
+    query = CATALOG_VERSION_QUERIES.get(db_config.get('db_type', ''))
+    if query is None:
+        raise ValueError(f"Unsupported database type: {db_config.get('db_type', '')}")
+    
+    with get_engine(db_config).connect() as conn:
+        row = conn.execute(sqlalchemy.text(query)).first()
+    return "|".join(str(value) for value in row)
+
+# Replication delay in seconds; no rows / NULL on a primary. SQLite and SQL Server aren't checked.
+REPLICA_LAG_QUERIES = {
+    'postgres': (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+    'mysql': "SHOW REPLICA STATUS",
+}
+
+def get_replica_lag(db_config: dict):
+    """Seconds the replica is behind its primary; None if unknown (replication stopped or query failed)"""
+    db_type = db_config.get('db_type', '')
+    query = REPLICA_LAG_QUERIES.get(db_type)
+    if query is None:
+        return 0.0
+    
+    with get_engine(db_config).connect() as conn:
+        result = conn.execute(sqlalchemy.text(query))
+        row = result.mappings().first() if db_type == 'mysql' else result.first()
+    if row is None:
+        return 0.0
+    if db_type == 'mysql':
+        lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    else:
+        lag = row[0] if row[0] is not None else 0.0
+    return float(lag) if lag is not None else None
+
 def get_db_schema(db_config: dict) -> tuple:
     """Get database schema as a string using SQLAlchemy"""
-    print(f"{C.SQL}[SQL]{C.RESET} Getting database schema...")
+    log.debug("Getting database schema...")
     
     try:
-        # Build connection string and create engine
-        conn_string = build_connection_string(db_config)
-        engine = create_engine(conn_string)
-        inspector = inspect(engine)
+        inspector = sqlalchemy.inspect(get_engine(db_config))
         
-        # Get all table names
-        table_names = inspector.get_table_names()
-        print(f"{C.SQL}[SQL]{C.RESET} Found {len(table_names)} tables")
+        # Get all table names, sorted so the schema text is byte-identical between calls (prompt caching)
+        table_names = sorted(inspector.get_table_names())
+        log.debug(f"Found {len(table_names)} tables")
         
         # Build schema string and dict
         schema_str = ""
@@ -116,6 +253,8 @@ def get_db_schema(db_config: dict) -> tuple:
                     ref_col = fk['referred_columns'][0] if fk['referred_columns'] else 'id'
                     fk_info.append(f"{fk_col} -> {ref_table}.{ref_col}")
             
+            fk_info.sort()
+            
             # Add primary and foreign key info to schema string
             pk_info = f"Primary key: {', '.join(pk_columns)}" if pk_columns else ""
             fk_str = f"Foreign keys: {', '.join(fk_info)}" if fk_info else ""
@@ -133,27 +272,252 @@ def get_db_schema(db_config: dict) -> tuple:
         return schema_str, schema_dict
     
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} Schema retrieval error: {str(e)}")
+        log.error(f"Schema retrieval error: {str(e)}")
         raise ValueError(f"Failed to retrieve schema: {str(e)}")
 
 def execute_sql(sql: str, db_config: dict) -> dict:
     """Execute SQL query and return results"""
-    print(f"{C.SQL}[SQL]{C.RESET} Executing query: {sql}")
+    log.debug(f"Executing query: {truncate(sql)}")
     
     try:
-        # Build connection string and create engine
-        conn_string = build_connection_string(db_config)
-        engine = create_engine(conn_string)
-        
-        # Execute query
-        with engine.connect() as conn:
-            result = conn.execute(text(sql))
-            columns = result.keys()
+        # Execute query on a pooled connection
+        with get_engine(db_config).connect() as conn:
+            result = conn.execute(sqlalchemy.text(sql))
+            columns = list(result.keys())
             rows = result.fetchall()
             
-            print(f"{C.SQL}[SQL]{C.RESET} Query executed, returned {len(rows)} rows")
+            log.debug(f"Query executed, returned {len(rows)} rows")
             return {"columns": columns, "rows": [list(row) for row in rows]}
     
     except Exception as e:
-        print(f"{C.ERROR}[ERROR]{C.RESET} SQL execution error: {str(e)}")
-        raise ValueError(f"SQL execution failed: {str(e)}")
\ No newline at end of file
+        log.error(f"SQL execution error: {str(e)}")
+        raise ValueError(f"SQL execution failed: {str(e)}")
+
+def stream_sql(sql: str, db_config: dict, batch_rows: int, on_connect=None):
+    """Execute a query and yield (columns, rows) batches as the driver fetches them
+
+    `on_connect(dbapi_connection)` is called before the statement starts so another
+    thread can interrupt it (see interrupt_connection).
+    """
+    log.debug(f"Streaming query: {truncate(sql)}")
+    with get_engine(db_config).connect() as conn:
+        if on_connect is not None:
+            on_connect(conn.connection.dbapi_connection)
+        result = conn.execution_options(stream_results=True).execute(sqlalchemy.text(sql))
+        columns = list(result.keys())
+        empty = True
+        for partition in result.partitions(batch_rows):
+            empty = False
+            yield columns, [list(row) for row in partition]
+        if empty:
+            yield columns, []
+
+# Statement timeouts and cancels, which drivers raise as OperationalError: Postgres query_canceled,
+# MySQL query interrupted / max_execution_time exceeded, MariaDB max_statement_time exceeded
+_CANCELLED_CODES = {"57014", 1317, 3024, 1969}
+
+def is_statement_cancelled(dbapi_error) -> bool:
+    """Whether a DBAPI error says the server stopped the statement (timeout or cancel), not that the connection broke"""
+    code = getattr(dbapi_error, "pgcode", None) or getattr(dbapi_error, "sqlstate", None)
+    if code is None and getattr(dbapi_error, "args", None):
+        code = dbapi_error.args[0]
+    return code in _CANCELLED_CODES or str(dbapi_error) == "interrupted"  # sqlite3
+
+def is_connection_error(error: BaseException) -> bool:
+    """Whether an error (or one it was raised from) means the server or connection failed, not the statement"""
+    while error is not None:
+        if isinstance(error, (sqlalchemy.exc.DisconnectionError, sqlalchemy.exc.TimeoutError)):
+            return True
+        if isinstance(error, sqlalchemy.exc.DBAPIError):
+            if error.connection_invalidated:
+                return True
+            return isinstance(
+                error, (sqlalchemy.exc.OperationalError, sqlalchemy.exc.InterfaceError)
+            ) and not is_statement_cancelled(error.orig)
+        error = error.__cause__ or error.__context__
+    return False
+
+def interrupt_connection(dbapi_connection) -> bool:
+    """Abort the statement running on a DBAPI connection from another thread, where the driver allows it"""
+    if hasattr(dbapi_connection, "interrupt"):  # sqlite3
+        dbapi_connection.interrupt()
+        return True
+    if hasattr(dbapi_connection, "cancel"):  # psycopg2
+        dbapi_connection.cancel()
+        return True
+    return False
+
+
+# Which schema_dict column types profile_table samples, and how
+_COLUMN_ENTRY = re.compile(r"^(.+) \((.+)\)$")
+_TEXT_TYPES = re.compile(r"CHAR|TEXT|STRING|ENUM|CLOB", re.IGNORECASE)
+_RANGE_TYPES = re.compile(r"INT|NUM|DEC|FLOAT|REAL|DOUBLE|MONEY|DATE|TIME", re.IGNORECASE)
+
+def profile_kind(column_type: str):
+    """'text' for columns worth listing values of, 'range' for numbers and dates, else None"""
+    if _TEXT_TYPES.search(column_type):
+        return "text"
+    if _RANGE_TYPES.search(column_type) and "INTERVAL" not in column_type.upper():
+        return "range"
+    return None
+
+def profile_table(db_config: dict, table_name: str, columns: list, sample_rows: int, max_distinct: int) -> dict:
+    """Sampled value hints for one table's `columns` (schema_dict entries, "name (TYPE)")
+
+    Every query reads a LIMIT-bounded sample, never the whole table. Returns
+    {column: {"values": [...]}} for text columns with at most `max_distinct` values in the
+    sample (most frequent first), and {column: {"min": ..., "max": ...}} for numbers and dates.
+    """
+    kinds = {}
+    for entry in columns:
+        match = _COLUMN_ENTRY.match(entry)
+        kind = profile_kind(match.group(2)) if match else None
+        if kind:
+            kinds[match.group(1)] = kind
+    if not kinds:
+        return {}
+    
+    table = sqlalchemy.table(table_name, *(sqlalchemy.column(name) for name in kinds))
+    sample = sqlalchemy.select(*table.c).limit(sample_rows).subquery()
+    count = sqlalchemy.func.count()
+    hints = {}
+    with get_engine(db_config).connect() as conn:
+        ranged = [name for name, kind in kinds.items() if kind == "range"]
+        if ranged:
+            bounds = sqlalchemy.select(*(
+                agg(sample.c[name]) for name in ranged for agg in (sqlalchemy.func.min, sqlalchemy.func.max)
+            ))
+            row = conn.execute(bounds).one()
+            for i, name in enumerate(ranged):
+                low, high = row[2 * i], row[2 * i + 1]
+                if low is not None:
+                    hints[name] = {"min": str(low), "max": str(high)}
+        
+        for name in (name for name, kind in kinds.items() if kind == "text"):
+            column = sample.c[name]
+            values = conn.execute(
+                sqlalchemy.select(column, count).where(column.isnot(None))
+                .group_by(column).order_by(count.desc()).limit(max_distinct + 1)
+            ).all()
+            if values and len(values) <= max_distinct:
+                hints[name] = {"values": [str(value) for value, _ in values]}
+    return hints
+
+_SQL_LITERALS = re.compile(r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]", re.DOTALL)
+_SQL_WORD = re.compile(r"[a-z_]+")
+READ_ONLY_STATEMENTS = {'select', 'with', 'show', 'explain', 'describe', 'desc', 'values'}
+# Anywhere in a statement these mean it writes, locks or has side effects (SELECT ... INTO, FOR UPDATE, ...)
+WRITE_KEYWORDS = {
+    'insert', 'update', 'delete', 'merge', 'upsert', 'into', 'create', 'alter', 'drop', 'truncate',
+    'grant', 'revoke', 'lock', 'call', 'exec', 'execute', 'copy', 'vacuum', 'analyze', 'set',
+    'begin', 'commit', 'rollback', 'savepoint', 'pragma', 'attach', 'detach', 'reindex', 'refresh',
+    'nextval', 'setval',
+}
+# Row-locking reads (FOR UPDATE / NO KEY UPDATE / SHARE / KEY SHARE) need a writable server
+_LOCKING_CLAUSE = re.compile(r"\bfor\s+(?:no\s+key\s+update|update|key\s+share|share)\b")
+
+def split_statements(sql: str) -> list:
+    """The statements in `sql`, with comments, string literals and quoted identifiers blanked out"""
+    return [s for s in _SQL_LITERALS.sub(" ", sql).split(";") if s.strip()]
+
+def is_read_only(sql: str) -> bool:
+    """Whether a statement only reads: one SELECT/WITH/SHOW/... with no writing or locking keywords
+
+    Comments, string literals and quoted identifiers are ignored. Anything ambiguous counts as a write.
+    """
+    statements = split_statements(sql)
+    if len(statements) != 1:
+        return False
+    statement = statements[0].lower()
+    words = _SQL_WORD.findall(statement)
+    if not words or words[0] not in READ_ONLY_STATEMENTS:
+        return False
+    return not WRITE_KEYWORDS.intersection(words) and not _LOCKING_CLAUSE.search(statement)
+
+EXPLAIN_PREFIXES = {
+    'sqlite': "EXPLAIN QUERY PLAN ",
+    'postgres': "EXPLAIN ",
+    'mysql': "EXPLAIN ",
+}
+
+def explain_query(sql: str, db_config: dict) -> list:
+    """Plan a statement without running it; raises if the database rejects it"""
+    db_type = db_config.get('db_type', '')
+    prefix = EXPLAIN_PREFIXES.get(db_type)
+    if prefix is None:
+        raise ValueError(f"EXPLAIN is not supported for {db_type}")
+    
+    with get_engine(db_config).connect() as conn:
+        return [list(row) for row in conn.execute(sqlalchemy.text(prefix + sql.strip().rstrip(";")))]
+
+def explain_plan(sql: str, db_config: dict, analyze: bool = False, timeout_s: float = 30.0) -> dict:
+    """EXPLAIN a statement in the most detailed format the dialect offers: {"format", "plan"}
+
+    With `analyze` the statement really runs (callers only allow read-only ones), rolled back
+    and stopped after `timeout_s`. SQLite has no EXPLAIN ANALYZE, so the statement is run once
+    and "actual_rows"/"actual_time_ms" are measured for the query as a whole.
+    """
+    db_type = db_config.get('db_type', '')
+    statement = sql.strip().rstrip(";")
+    log.debug(f"Explaining query{' (analyze)' if analyze else ''}: {truncate(statement)}")
+    
+    with get_engine(db_config).connect() as conn:
+        if db_type == 'postgres':
+            with conn.begin() as transaction:
+                if analyze:
+                    conn.execute(sqlalchemy.text("SET TRANSACTION READ ONLY"))
+                    conn.execute(sqlalchemy.text(f"SET LOCAL statement_timeout = {int(timeout_s * 1000)}"))
+                options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+                plan = conn.execute(sqlalchemy.text(f"EXPLAIN ({options}) {statement}")).scalar()
+                transaction.rollback()
+            return {"format": "postgres", "plan": plan}
+        
+        if db_type == 'mysql':
+            if analyze:
+                conn.execute(sqlalchemy.text(f"SET SESSION max_execution_time = {int(timeout_s * 1000)}"))
+                try:
+                    return {"format": "mysql_tree", "plan": conn.execute(sqlalchemy.text("EXPLAIN ANALYZE " + statement)).scalar()}
+                finally:
+                    conn.execute(sqlalchemy.text("SET SESSION max_execution_time = DEFAULT"))
+            try:
+                return {"format": "mysql_tree", "plan": conn.execute(sqlalchemy.text("EXPLAIN FORMAT=TREE " + statement)).scalar()}
+            except sqlalchemy.exc.DBAPIError:
+                # Before MySQL 8.0.16: the tabular plan, one row per table access
+                result = conn.execute(sqlalchemy.text("EXPLAIN " + statement))
+                return {"format": "mysql_table", "plan": [dict(row._mapping) for row in result]}
+        
+        if db_type == 'sqlite':
+            explained = {
+                "format": "sqlite",
+                "plan": [list(row) for row in conn.execute(sqlalchemy.text("EXPLAIN QUERY PLAN " + statement))],
+            }
+            if analyze:
+                timer = threading.Timer(timeout_s, interrupt_connection, (conn.connection.dbapi_connection,))
+                start = time.perf_counter()
+                timer.start()
+                try:
+                    result = conn.execute(sqlalchemy.text(statement))
+                    explained["actual_rows"] = sum(len(rows) for rows in result.partitions(1000))
+                finally:
+                    timer.cancel()
+                explained["actual_time_ms"] = (time.perf_counter() - start) * 1000
+            return explained
+    
+    raise ValueError(f"EXPLAIN is not supported for {db_type}")
+
+def get_table_keys(db_config: dict, table_names: list) -> dict:
+    """Primary key, foreign keys and indexes (unique constraints included) of each table, as column lists"""
+    inspector = sqlalchemy.inspect(get_engine(db_config))
+    keys = {}
+    for table_name in table_names:
+        indexes = [index["column_names"] for index in inspector.get_indexes(table_name)]
+        try:
+            indexes += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)]
+        except NotImplementedError:
+            pass
+        keys[table_name] = {
+            "primary_key": inspector.get_pk_constraint(table_name).get("constrained_columns") or [],
+            "foreign_keys": [fk["constrained_columns"] for fk in inspector.get_foreign_keys(table_name) if fk["constrained_columns"]],
+            "indexes": indexes,  # None stands for an expression column
+        }
+    return keys
@@ -0,0 +1,27 @@
+# app/utils/lazy.py
+import importlib
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access
+
+    Keeps heavy provider and driver packages (boto3, httpx, SQLAlchemy) and the modules built
+    on them out of app startup; /health answers before any of them is loaded. Check
+    `name in sys.modules` to see whether the real module has been imported yet.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        module = self._module
+        if module is None:
+            # import_module holds the import lock, so concurrent first uses load the module once
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -0,0 +1,77 @@
+# app/utils/llm_cassette.py
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from app.utils.logger import get_logger
+
+log = get_logger("llm")
+
+def prompt_key(prompt: str) -> str:
+    """Content hash used to look up a recorded completion"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+# Each recording is appended as its own gzip member, so recording is O(1) per call and
+# the file stays readable with gzip.open. On load, later entries for a key win.
+class Cassette:
+    """Prompt -> completion recordings stored as gzip-compressed JSON lines"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self._entries is not None:
+            return self._entries
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+            entries = {}
+            if os.path.exists(self.path):
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries[entry["key"]] = entry
+                log.info(f"Loaded {len(entries)} recorded completions from {self.path}")
+            self._entries = entries
+            return entries
+
+    def lookup(self, prompt: str):
+        """Return the recorded entry for a prompt, or None"""
+        return self._load().get(prompt_key(prompt))
+
+    def record(self, prompt: str, completion: str, provider: str, model: str, duration: float):
+        """Append a prompt -> completion pair"""
+        entries = self._load()
+        entry = {
+            "key": prompt_key(prompt),
+            "provider": provider,
+            "model": model,
+            "completion": completion,
+            "duration": round(duration, 4),
+            "recorded_at": round(time.time(), 3),
+        }
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode("utf-8")
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(gzip.compress(line))
+            entries[entry["key"]] = entry
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+_cassettes = {}
+
+def get_cassette(path: str) -> Cassette:
+    """Return the shared cassette for a path"""
+    cassette = _cassettes.get(path)
+    if cassette is None:
+        cassette = _cassettes.setdefault(path, Cassette(path))
+    return cassette
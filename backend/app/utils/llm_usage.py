@@ -0,0 +1,69 @@
+# app/utils/llm_usage.py
+#
+# What one LLM call cost: provider-reported tokens (input, output, prompt-cache reads and
+# writes) and timings (time to first token, total, generation). Provider adapters return a
+# Completion carrying its Usage; app.services.usage_service accounts for it.
+from typing import Optional
+
+class Usage:
+    """Tokens and timings of one LLM call, or the sum of several"""
+
+    def __init__(self, provider: str = "", model: str = "", input_tokens: int = 0, output_tokens: int = 0,
+                 cache_read_tokens: int = 0, cache_write_tokens: int = 0, ttft_s: Optional[float] = None,
+                 total_s: float = 0.0, generation_s: Optional[float] = None, calls: int = 1):
+        self.provider = provider
+        self.model = model or ""
+        self.input_tokens = input_tokens or 0
+        self.output_tokens = output_tokens or 0
+        self.cache_read_tokens = cache_read_tokens or 0
+        self.cache_write_tokens = cache_write_tokens or 0
+        self.ttft_s = ttft_s  # None when the provider doesn't stream or report it
+        self.total_s = total_s
+        self.generation_s = generation_s  # Time spent producing output tokens, when known
+        self.calls = calls
+
+    @property
+    def tokens_used(self) -> int:
+        """Every token billed for the call(s); Anthropic counts cached prompt tokens apart from input"""
+        return self.input_tokens + self.cache_read_tokens + self.cache_write_tokens + self.output_tokens
+
+    def add(self, other: "Usage"):
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_read_tokens += other.cache_read_tokens
+        self.cache_write_tokens += other.cache_write_tokens
+        if self.ttft_s is None:
+            self.ttft_s = other.ttft_s  # The first call's first token is the first token the user saw
+        self.total_s += other.total_s
+        if other.generation_s is not None:
+            self.generation_s = (self.generation_s or 0.0) + other.generation_s
+        self.calls += other.calls
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cache_read_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "tokens_used": self.tokens_used,
+            "ttft_ms": round(self.ttft_s * 1000, 1) if self.ttft_s is not None else None,
+            "total_ms": round(self.total_s * 1000, 1),
+            "output_tokens_per_s": (
+                round(self.output_tokens / self.generation_s, 1) if self.generation_s else None
+            ),
+        }
+
+def total(usages: list) -> Usage:
+    summed = Usage(calls=0)
+    for usage in usages:
+        summed.add(usage)
+    return summed
+
+class Completion(str):
+    """A completion's text that remembers its Usage (as Prompt remembers its cacheable prefix)"""
+
+    def __new__(cls, text: str, usage: Usage):
+        completion = super().__new__(cls, text)
+        completion.usage = usage
+        return completion
@@ -0,0 +1,195 @@
+# app/utils/logger.py
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from app.config import settings
+from app.utils.colors import Colors as C
+
+# Request ID for the current task, set once by the request middleware
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Category -> color, matching the existing [API]/[SQL]/[LLM] prefixes
+CATEGORY_COLORS = {
+    "api": C.API,
+    "sql": C.SQL,
+    "llm": C.LLM,
+    "bedrock": C.LLM,
+    "parser": C.PARSER,
+    "request": C.REQUEST,
+    "response": C.RESPONSE,
+}
+
+_ROOT = "app"
+_queue = queue.SimpleQueue()
+_listener = None
+
+def new_request_id() -> str:
+    """Generate a short request ID"""
+    return uuid.uuid4().hex[:8]
+
+def get_request_id() -> str:
+    """Return the request ID of the current request, or a fresh one outside a request"""
+    return request_id_var.get() or new_request_id()
+
+def truncate(value, limit: int = None) -> str:
+    """Shorten long values (SQL text, LLM responses) before they are logged"""
+    text = str(value)
+    limit = limit if limit is not None else settings.LOG_MAX_FIELD_CHARS
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} more chars]"
+    return text
+
+def _parse_sampling(spec: str) -> dict:
+    """Parse LOG_SAMPLING, e.g. 'sql=0.1,parser=0'"""
+    rates = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        category, rate = part.split("=", 1)
+        try:
+            rates[category.strip().lower()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+class TextFormatter(logging.Formatter):
+    """Render records as '[CATEGORY:request_id] message' with service colors"""
+
+    def __init__(self, use_color: bool = True):
+        super().__init__()
+        self.use_color = use_color
+
+    def format(self, record: logging.LogRecord) -> str:
+        category = getattr(record, "category", record.name.rsplit(".", 1)[-1])
+        if record.levelno >= logging.ERROR:
+            label, color = "ERROR", C.ERROR
+        elif record.levelno >= logging.WARNING:
+            label, color = "WARNING", C.WARNING
+        else:
+            label, color = category.upper(), CATEGORY_COLORS.get(category, C.WHITE)
+
+        rid = getattr(record, "request_id", None)
+        tag = f"[{label}:{rid}]" if rid else f"[{label}]"
+        if self.use_color:
+            tag = f"{color}{tag}{C.RESET}"
+
+        line = f"{tag} {record.getMessage()}"
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line for the log shipper"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "category": getattr(record, "category", record.name),
+            "request_id": getattr(record, "request_id", None),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class OffLoopQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that defers formatting and I/O to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args and tracebacks here so the record is safe to hand over;
+        # everything else (formatting, colors, JSON) happens off the event loop
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class StructuredLogger:
+    """Category logger with level filtering, sampling and request-id tagging"""
+
+    def __init__(self, category: str):
+        self.category = category
+        self._logger = logging.getLogger(f"{_ROOT}.{category}")
+
+    def _log(self, level: int, msg: str, exc_info=None, fields: dict = None):
+        if not self._logger.isEnabledFor(level):
+            return
+        # Sampling only ever drops DEBUG/INFO; warnings and errors always go out
+        if level < logging.WARNING:
+            rate = (_sampling if _sampling is not None else _load_sampling()).get(self.category, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                return
+        self._logger.log(
+            level, msg, exc_info=exc_info,
+            extra={"category": self.category, "request_id": request_id_var.get(), "fields": fields},
+        )
+
+    def debug(self, msg: str, **fields):
+        self._log(logging.DEBUG, msg, fields=fields)
+
+    def info(self, msg: str, **fields):
+        self._log(logging.INFO, msg, fields=fields)
+
+    def warning(self, msg: str, **fields):
+        self._log(logging.WARNING, msg, fields=fields)
+
+    def error(self, msg: str, **fields):
+        self._log(logging.ERROR, msg, fields=fields)
+
+    def exception(self, msg: str, **fields):
+        self._log(logging.ERROR, msg, exc_info=True, fields=fields)
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+_sampling = None  # category -> rate; read from settings on first use, not at import
+
+def _load_sampling() -> dict:
+    global _sampling
+    _sampling = _parse_sampling(settings.LOG_SAMPLING)
+    return _sampling
+
+def get_logger(category: str) -> StructuredLogger:
+    """Get a structured logger for a service category (api, sql, llm, ...)"""
+    return StructuredLogger(category)
+
+def start_logging():
+    """Attach the queue handler and start the background listener thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    _load_sampling()
+    root = logging.getLogger(_ROOT)
+    root.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+    root.propagate = False
+    root.handlers = [OffLoopQueueHandler(_queue)]
+
+    stream = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT.lower() == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter(use_color=settings.LOG_COLOR))
+
+    _listener = logging.handlers.QueueListener(_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+def stop_logging():
+    """Flush pending records and stop the listener thread"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+
+atexit.register(stop_logging)
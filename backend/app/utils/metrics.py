@@ -0,0 +1,296 @@
+# app/utils/metrics.py
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from app.utils.tracing import span
+
+# ASGI scope of the current request, set by the request middleware; the router fills in
+# scope["route"] once it has matched, which gives a bounded endpoint label
+request_scope_var = contextvars.ContextVar("request_scope", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with a fixed set of label names"""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        return self._values.get(key, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+class Gauge:
+    """Point-in-time value; either set directly or read from a callback at scrape time"""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def remove(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        with self._lock:
+            self._values.pop(key, None)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        if self.callback is not None:
+            # Callback returns {label_tuple: value}
+            items = list(self.callback().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+class Histogram:
+    """Bucketed histogram; observe() is a bisect and two additions under a lock"""
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series = {}  # key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        series = self._series.get(key)
+        return sum(series[:-1]) if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += bucket_count
+                le = f'le="{_format_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+_registry = []
+
+def register(metric):
+    """Add a metric to the /metrics exposition"""
+    _registry.append(metric)
+    return metric
+
+def render() -> str:
+    """Render all registered metrics in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# HTTP
+http_requests_total = register(Counter(
+    "sql_assistant_http_requests_total", "HTTP requests by endpoint, method and status",
+    ("endpoint", "method", "status"),
+))
+http_request_duration = register(Histogram(
+    "sql_assistant_http_request_duration_seconds", "End-to-end HTTP request latency",
+    ("endpoint", "method", "status"),
+))
+
+_requests_in_flight = 0
+
+def request_started():
+    global _requests_in_flight
+    _requests_in_flight += 1
+
+def request_finished():
+    global _requests_in_flight
+    _requests_in_flight -= 1
+
+def requests_in_flight() -> int:
+    """HTTP requests currently being handled (the middleware runs on the event loop, so no lock)"""
+    return _requests_in_flight
+
+http_requests_in_flight = register(Gauge(
+    "sql_assistant_http_requests_in_flight", "HTTP requests currently being handled",
+    callback=lambda: {(): _requests_in_flight},
+))
+
+# Pipeline stages: schema, prompt, llm, parse, db, serialize
+stage_duration = register(Histogram(
+    "sql_assistant_stage_duration_seconds", "Latency of each request stage",
+    ("stage", "endpoint", "provider", "status"),
+))
+prompt_tokens = register(Histogram(
+    "sql_assistant_prompt_tokens", "Estimated prompt size in tokens (chars / 4)",
+    ("endpoint",), buckets=TOKEN_BUCKETS,
+))
+
+# LLM calls
+llm_requests_total = register(Counter(
+    "sql_assistant_llm_requests_total", "LLM calls by provider, model and status",
+    ("provider", "model", "status"),
+))
+llm_request_duration = register(Histogram(
+    "sql_assistant_llm_request_duration_seconds", "LLM call latency by provider and model",
+    ("provider", "model", "status"),
+))
+
+llm_tokens_total = register(Counter(
+    "sql_assistant_llm_tokens_total",
+    "Tokens reported by the provider: input, output, cache_read (served from prompt cache), cache_write",
+    ("provider", "model", "kind"),
+))
+llm_endpoint_tokens_total = register(Counter(
+    "sql_assistant_llm_endpoint_tokens_total", "Provider-reported tokens by the endpoint that spent them",
+    ("endpoint", "kind"),
+))
+llm_time_to_first_token = register(Histogram(
+    "sql_assistant_llm_time_to_first_token_seconds", "Time until the first output token, where the provider reports or streams it",
+    ("provider", "model"),
+))
+
+# Provider router
+llm_fallbacks_total = register(Counter(
+    "sql_assistant_llm_fallbacks_total", "Requests served by a fallback target instead of the one asked for",
+    ("from_provider", "to_provider"),
+))
+
+# Hedged / multi-candidate generation
+llm_hedge_total = register(Counter(
+    "sql_assistant_llm_hedge_total", "Hedged generations by mode and which attempt won",
+    ("mode", "winner"),
+))
+llm_hedge_extra_calls_total = register(Counter(
+    "sql_assistant_llm_hedge_extra_calls_total", "LLM calls made beyond the first because of hedging",
+    ("mode",),
+))
+llm_hedge_extra_tokens_total = register(Counter(
+    "sql_assistant_llm_hedge_extra_tokens_total", "Estimated prompt tokens spent on those extra calls",
+    ("mode",),
+))
+
+# Database results
+db_rows_returned = register(Histogram(
+    "sql_assistant_db_rows_returned", "Rows returned per executed statement",
+    ("endpoint",), buckets=(1, 10, 100, 1000, 10000, 100000, 1000000),
+))
+
+def current_endpoint() -> str:
+    """Route template of the current request (e.g. /conversations/{conversation_id})"""
+    scope = request_scope_var.get()
+    if scope is None:
+        return ""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt-size metrics"""
+    return len(text) // 4
+
+@contextmanager
+def track_stage(stage: str, provider: str = ""):
+    """Time a pipeline stage, record it with the current endpoint and outcome, and trace it"""
+    start = time.perf_counter()
+    status = "ok"
+    attrs = {"provider": provider} if provider else {}
+    try:
+        with span(stage, timing=True, **attrs):
+            yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        stage_duration.observe(
+            time.perf_counter() - start,
+            stage=stage, endpoint=current_endpoint(), provider=provider, status=status,
+        )
+
+def observe_prompt(prompt: str):
+    """Record the size of a prompt that is about to be sent to the LLM"""
+    prompt_tokens.observe(estimate_tokens(prompt), endpoint=current_endpoint())
+
+def observe_llm_call(provider: str, model: str, status: str, duration: float):
+    """Record one LLM round trip"""
+    llm_requests_total.inc(provider=provider, model=model, status=status)
+    llm_request_duration.observe(duration, provider=provider, model=model, status=status)
+
+def observe_llm_usage(provider: str, model: str, input_tokens: int = 0, output_tokens: int = 0,
+                      cache_read_tokens: int = 0, cache_write_tokens: int = 0, ttft: float = None,
+                      endpoint: str = None):
+    """Record provider-reported token usage (and time to first token, if known) for one call"""
+    if endpoint is None:
+        endpoint = current_endpoint()
+    for kind, count in (("input", input_tokens), ("output", output_tokens),
+                        ("cache_read", cache_read_tokens), ("cache_write", cache_write_tokens)):
+        if count:
+            llm_tokens_total.inc(count, provider=provider, model=model, kind=kind)
+            llm_endpoint_tokens_total.inc(count, endpoint=endpoint, kind=kind)
+    if ttft is not None:
+        llm_time_to_first_token.observe(ttft, provider=provider, model=model)
+
+def observe_hedge(mode: str, winner: str, launched: int, prompt: str):
+    """Record the outcome and extra cost of one hedged generation"""
+    llm_hedge_total.inc(mode=mode, winner=winner)
+    if launched > 1:
+        llm_hedge_extra_calls_total.inc(launched - 1, mode=mode)
+        llm_hedge_extra_tokens_total.inc((launched - 1) * estimate_tokens(prompt), mode=mode)
+
+def observe_request(endpoint: str, method: str, status: int, duration: float):
+    """Record one completed HTTP request"""
+    http_requests_total.inc(endpoint=endpoint, method=method, status=str(status))
+    http_request_duration.observe(duration, endpoint=endpoint, method=method, status=str(status))
@@ -1,59 +1,126 @@
 # app/utils/prompt_builder.py
-def build_llm_prompt(user_prompt: str, schema: str) -> str:
-    """Build a prompt for a single user query"""
-    return f"""
+
+# Prompts are built as a stable prefix (instructions + schema) followed by a variable suffix
+# (history + request). For a given schema the prefix is byte-identical across requests, so
+# providers with prompt caching (Bedrock/Anthropic) can reuse it; see invoke_anthropic_bedrock.
+class Prompt(str):
+    """A prompt string that remembers where its cacheable prefix ends"""
+
+    def __new__(cls, prefix: str, suffix: str = ""):
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix = prefix
+        prompt.suffix = suffix
+        return prompt
+
+SQL_INSTRUCTIONS = """
 You are an expert SQL assistant.
-Given the following database schema and a user request, write a correct SQL query that fulfills the request.
+Given the following database schema, the conversation so far (if any) and the user's current request, write a correct SQL query that fulfills the request.
+
+Return the SQL query as a JSON object with a "query" field:
+{{"query": "your_sql_query_here"}}
 
 Schema:
 {schema}
+"""
 
-User request:
-{user_prompt}
+REGENERATION_INSTRUCTIONS = """
+You are an expert SQL assistant.
+A previous SQL query failed. Using the database schema below, the user's request and the error message, write a corrected query.
 
-Return the SQL query as a JSON object with a "query" field:
-{{"query": "your_sql_query_here"}}
+Generate a corrected SQL query as a JSON object:
+{{"query": "your_corrected_sql_query"}}
+
+Schema:
+{schema}
 """
 
-def build_llm_prompt_with_history(user_prompt: str, schema: str, message_history=None) -> str:
-    """Build a prompt for a query with chat history context"""
-    history_text = ""
-    
+CHAT_INSTRUCTIONS = """
+You are a helpful SQL assistant.
+Respond naturally to the user's message. If they ask for SQL, provide it. If they ask a general question, answer it helpfully.
+
+Schema: {schema}
+"""
+
+def build_summary_text(summary=None) -> str:
+    """Render a rolled-up conversation summary (see summary_service) for a prompt"""
+    if not summary or not (summary.get("summary") or summary.get("sql")):
+        return ""
+
+    text = ""
+    if summary.get("summary"):
+        text += f"Summary of earlier conversation:\n{summary['summary']}\n"
+    if summary.get("sql"):
+        text += "SQL already produced in this conversation:\n"
+        text += "".join(f"- {sql}\n" for sql in summary["sql"])
+    return text + "\n"
+
+def build_history_text(message_history=None, summary=None) -> str:
+    """Summary plus verbatim recent messages (ChatMessage objects or dicts)"""
+    history_text = build_summary_text(summary)
+
     if message_history and len(message_history) > 0:
-        history_text = "Previous conversation:\n"
+        history_text += "Previous conversation:\n"
         for msg in message_history:
-            role = "User" if msg.role == "user" else "Assistant"
-            history_text += f"{role}: {msg.content}\n"
-        
+            role = msg.get("role") if isinstance(msg, dict) else msg.role
+            content = msg.get("content", "") if isinstance(msg, dict) else msg.content
+            history_text += f"{'User' if role == 'user' else 'Assistant'}: {content}\n"
+
         history_text += "\n"
-    
-    return f"""
-You are an expert SQL assistant.
-Given the following database schema and chat history, write a correct SQL query that fulfills the user's request.
 
-Schema:
-{schema}
+    return history_text
+
+def build_examples_text(examples=None) -> str:
+    """Render retrieved few-shot examples (see example_store); they vary per question, so they go in the suffix"""
+    if not examples:
+        return ""
+
+    text = "Examples of questions answered correctly on this database:\n"
+    for example in examples:
+        text += f"Question: {example['question']}\nSQL: {example['sql']}\n\n"
+    return text
+
+def build_column_hints_text(column_hints=None) -> str:
+    """Render sampled column values (see column_profiler) for the tables a question is about"""
+    if not column_hints:
+        return ""
+
+    text = "Column values (sampled):\n"
+    for table, columns in column_hints.items():
+        for column, hint in columns.items():
+            if "values" in hint:
+                values = ", ".join("'" + value.replace("'", "''") + "'" for value in hint["values"])
+                text += f"{table}.{column}: {values}\n"
+            else:
+                text += f"{table}.{column}: {hint['min']} to {hint['max']}\n"
+    return text + "\n"
+
+def build_llm_prompt(user_prompt: str, schema: str, examples=None, column_hints=None) -> Prompt:
+    """Build a prompt for a single user query"""
+    return build_llm_prompt_with_history(user_prompt, schema, examples=examples, column_hints=column_hints)
 
-{history_text}Current request:
+def build_llm_prompt_with_history(user_prompt: str, schema: str, message_history=None, summary=None, examples=None,
+                                  column_hints=None) -> Prompt:
+    """Build a prompt for a query with chat history context"""
+    prefix = SQL_INSTRUCTIONS.format(schema=schema)
+    suffix = f"""
+{build_column_hints_text(column_hints)}{build_examples_text(examples)}{build_history_text(message_history, summary)}Current request:
 {user_prompt}
-
-Return the SQL query as a JSON object with a "query" field:
-{{"query": "your_sql_query_here"}}
 """
+    return Prompt(prefix, suffix)
 
 def build_visualization_prompt(user_question: str, columns: list, rows: list) -> str:
     """Build a prompt to get visualization recommendations for query results"""
-    
+
     # Format sample rows for readability
     sample_rows = rows[:5] if len(rows) > 5 else rows
     sample_data = "\n".join([str(row) for row in sample_rows])
-    
+
     return f"""
 I executed a SQL query for the question: "{user_question}"
 
 Results:
 Columns: {columns}
-Sample data: 
+Sample data:
 {sample_data}
 
 Analyze this data and recommend the best visualization type.
@@ -69,26 +136,12 @@ Return response as JSON:
 }}
 """
 
-def build_llm_prompt_for_regeneration(user_prompt: str, schema: str, message_history, failed_sql: str, error_message: str) -> str:
+def build_llm_prompt_for_regeneration(user_prompt: str, schema: str, message_history, failed_sql: str, error_message: str,
+                                      summary=None, column_hints=None) -> Prompt:
     """Build a prompt for regenerating SQL after a failed attempt"""
-    history_text = ""
-    
-    if message_history and len(message_history) > 0:
-        history_text = "Previous conversation:\n"
-        for msg in message_history:
-            role = "User" if msg.role == "user" else "Assistant"
-            history_text += f"{role}: {msg.content}\n"
-        
-        history_text += "\n"
-    
-    return f"""
-You are an expert SQL assistant.
-The previous SQL query failed. Please fix it based on the error message.
-
-Schema:
-{schema}
-
-{history_text}User request:
+    prefix = REGENERATION_INSTRUCTIONS.format(schema=schema)
+    suffix = f"""
+{build_column_hints_text(column_hints)}{build_history_text(message_history, summary)}User request:
 {user_prompt}
 
 Failed SQL:
@@ -96,28 +149,14 @@ Failed SQL:
 
 Error message:
 {error_message}
-
-Generate a corrected SQL query as a JSON object:
-{{"query": "your_corrected_sql_query"}}
 """
+    return Prompt(prefix, suffix)
 
 
-def build_chat_prompt(user_prompt: str, schema: str, conversation_history=None) -> str:
+def build_chat_prompt(user_prompt: str, schema: str, conversation_history=None, summary=None) -> Prompt:
     """Build a chat prompt for general conversation"""
-    history_text = ""
-    
-    if conversation_history:
-        history_text = "Previous conversation:\n"
-        for msg in conversation_history:
-            role = "User" if msg.get("role") == "user" else "Assistant"
-            history_text += f"{role}: {msg.get('content', '')}\n"
-        history_text += "\n"
-    
-    return f"""
-You are a helpful SQL assistant.
-Schema: {schema}
-
-{history_text}User: {user_prompt}
-
-Respond naturally to the user's message. If they ask for SQL, provide it. If they ask a general question, answer it helpfully.
-"""
\ No newline at end of file
+    prefix = CHAT_INSTRUCTIONS.format(schema=schema)
+    suffix = f"""
+{build_history_text(conversation_history, summary)}User: {user_prompt}
+"""
+    return Prompt(prefix, suffix)
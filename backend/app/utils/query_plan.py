@@ -0,0 +1,505 @@
+# app/utils/query_plan.py
+#
+# EXPLAIN output (see db_utils.explain_plan) normalized into one tree of PlanNodes whatever the
+# dialect, the nodes that cost the most, and candidate indexes.
+#
+# Postgres (FORMAT JSON) and MySQL (FORMAT=TREE, EXPLAIN ANALYZE) give an estimated cost per
+# node and, when analyzed, actual rows and times; hotspots are the nodes with the largest share
+# of those, net of their children. SQLite's EXPLAIN QUERY PLAN (and MySQL's old tabular EXPLAIN)
+# give neither, so there the hotspots are the steps known to be costly: full table scans,
+# automatic indexes and temporary B-trees.
+#
+# Index candidates come from full table scans: the columns the query filters that table on
+# (equalities first, then one range column), else the columns it is joined on. Conditions are
+# read from the plan, where the dialect reports them, and from the WHERE/ON clauses of the SQL.
+# A candidate is dropped when an existing index or the primary key already leads with its
+# first column; a joined foreign key without any index is always worth one.
+import json
+import re
+
+class PlanNode:
+    """One step of a query plan"""
+
+    def __init__(self, operation: str, detail: str = None, table: str = None, alias: str = None,
+                 index: str = None, conditions: list = None, estimated_rows: float = None,
+                 estimated_cost: float = None, full_scan: bool = False):
+        self.id = None
+        self.operation = operation
+        self.detail = detail  # The dialect's own description, when it has one
+        self.table = table  # Known table name (Postgres); else resolved from `alias` and the SQL
+        self.alias = alias  # The name the plan shows for the table
+        self.index = index
+        self.conditions = conditions or []
+        self.estimated_rows = estimated_rows
+        self.estimated_cost = estimated_cost  # Cumulative, children included
+        self.actual_rows = None
+        self.actual_time_ms = None  # Cumulative over all loops, children included
+        self.loops = None
+        self.full_scan = full_scan  # Reads the whole table
+        self.hot = False
+        self.children = []
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    @property
+    def self_cost(self):
+        if self.estimated_cost is None:
+            return None
+        return max(self.estimated_cost - sum(c.estimated_cost or 0.0 for c in self.children), 0.0)
+
+    @property
+    def self_time_ms(self):
+        if self.actual_time_ms is None:
+            return None
+        return max(self.actual_time_ms - sum(c.actual_time_ms or 0.0 for c in self.children), 0.0)
+
+    def to_dict(self) -> dict:
+        node = {
+            "id": self.id,
+            "operation": self.operation,
+            "detail": self.detail,
+            "table": self.table or self.alias,
+            "alias": self.alias if self.table and self.alias != self.table else None,
+            "index": self.index,
+            "conditions": self.conditions or None,
+            "full_scan": self.full_scan or None,
+            "estimated_rows": self.estimated_rows,
+            "estimated_cost": _round(self.estimated_cost),
+            "self_cost": _round(self.self_cost),
+            "actual_rows": self.actual_rows,
+            "actual_time_ms": _round(self.actual_time_ms),
+            "self_time_ms": _round(self.self_time_ms),
+            "loops": self.loops,
+            "hot": self.hot or None,
+        }
+        node = {key: value for key, value in node.items() if value is not None}
+        node["children"] = [child.to_dict() for child in self.children]
+        return node
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+def normalize(explained: dict) -> PlanNode:
+    """The PlanNode tree of a db_utils.explain_plan result, numbered depth-first from 1"""
+    parse = {
+        "postgres": parse_postgres,
+        "mysql_tree": parse_mysql_tree,
+        "mysql_table": parse_mysql_table,
+        "sqlite": parse_sqlite,
+    }[explained["format"]]
+    root = parse(explained["plan"])
+    if "actual_time_ms" in explained:
+        root.actual_rows = explained.get("actual_rows")
+        root.actual_time_ms = explained["actual_time_ms"]
+    for number, node in enumerate(root.walk(), start=1):
+        node.id = number
+    return root
+
+# Postgres: EXPLAIN (FORMAT JSON)
+
+PG_CONDITIONS = ("Index Cond", "Recheck Cond", "TID Cond", "Filter", "Join Filter", "Hash Cond", "Merge Cond")
+
+def parse_postgres(plan) -> PlanNode:
+    if isinstance(plan, (str, bytes)):
+        plan = json.loads(plan)
+    if isinstance(plan, list):
+        plan = plan[0]
+    return _postgres_node(plan["Plan"])
+
+def _postgres_node(p: dict) -> PlanNode:
+    node = PlanNode(
+        p["Node Type"],
+        table=p.get("Relation Name"),
+        alias=p.get("Alias"),
+        index=p.get("Index Name"),
+        conditions=[p[key] for key in PG_CONDITIONS if p.get(key)],
+        estimated_rows=p.get("Plan Rows"),
+        estimated_cost=p.get("Total Cost"),
+        full_scan=p["Node Type"] == "Seq Scan",
+    )
+    loops = p.get("Actual Loops")
+    if loops is not None:
+        # Rows and times are reported per loop
+        node.loops = loops
+        node.actual_rows = p.get("Actual Rows", 0) * loops
+        node.actual_time_ms = p.get("Actual Total Time", 0.0) * loops
+    node.children = [_postgres_node(child) for child in p.get("Plans", [])]
+    return node
+
+# MySQL: EXPLAIN FORMAT=TREE and EXPLAIN ANALYZE (8.0.16+), or the tabular EXPLAIN before that
+
+_MYSQL_LINE = re.compile(r"^(?P<indent> *)-> (?P<text>.*)$")
+_MYSQL_COST = re.compile(r"\s*\(cost=(?:[\d.e+-]+\.\.)?(?P<cost>[\d.e+-]+) rows=(?P<rows>[\d.e+-]+)\)")
+_MYSQL_ACTUAL = re.compile(
+    r"\s*\(actual time=[\d.e+-]+\.\.(?P<time>[\d.e+-]+) rows=(?P<rows>[\d.e+-]+) loops=(?P<loops>\d+)\)"
+)
+_MYSQL_NEVER_EXECUTED = re.compile(r"\s*\(never executed\)")
+_MYSQL_ACCESS = re.compile(
+    r"^(?P<op>[\w -]*(?:scan|lookup)) on (?P<table>\S+)(?: using (?P<index>\S+))?"
+    r"(?: over \((?P<range>.*)\)| \((?P<cond>.*)\))?(?:, with index condition: (?P<icp>.*))?",
+    re.IGNORECASE,
+)
+_MYSQL_JOIN = re.compile(r"^(?P<op>.* join) \((?P<cond>.*)\)$")
+
+def parse_mysql_tree(text: str) -> PlanNode:
+    roots, stack = [], []
+    for line in text.splitlines():
+        match = _MYSQL_LINE.match(line)
+        if match is None:
+            continue  # Wrapped description text
+        node = _mysql_node(match.group("text"))
+        depth = len(match.group("indent"))
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        if stack:
+            stack[-1][1].children.append(node)
+        else:
+            roots.append(node)
+        stack.append((depth, node))
+    if len(roots) == 1:
+        return roots[0]
+    root = PlanNode("Query")
+    root.children = roots
+    return root
+
+def _mysql_node(text: str) -> PlanNode:
+    detail = text
+    estimated_cost = estimated_rows = None
+    actual = None
+    match = _MYSQL_COST.search(text)
+    if match:
+        estimated_cost, estimated_rows = float(match.group("cost")), float(match.group("rows"))
+        text = text[:match.start()] + text[match.end():]
+    match = _MYSQL_ACTUAL.search(text)
+    if match:
+        actual = match
+        text = text[:match.start()] + text[match.end():]
+    never_executed = _MYSQL_NEVER_EXECUTED.search(text)
+    if never_executed:
+        text = text[:never_executed.start()] + text[never_executed.end():]
+    text = text.strip()
+    detail = detail.strip() if detail.strip() != text else None
+
+    node = PlanNode(text, detail=detail, estimated_rows=estimated_rows, estimated_cost=estimated_cost)
+    access = _MYSQL_ACCESS.match(text)
+    join = _MYSQL_JOIN.match(text)
+    if text.startswith("Filter: "):
+        node.operation, node.conditions = "Filter", [text[len("Filter: "):]]
+    elif access:
+        node.operation = access.group("op")
+        node.alias = access.group("table")
+        node.index = access.group("index")
+        node.conditions = [c for c in (access.group("range"), access.group("cond"), access.group("icp")) if c]
+        node.full_scan = node.operation.lower() == "table scan"
+    elif join:
+        node.operation, node.conditions = join.group("op"), [join.group("cond")]
+    elif ": " in text:
+        node.operation = text.split(": ", 1)[0]
+
+    if actual is not None:
+        # Like Postgres, per-loop averages
+        node.loops = int(actual.group("loops"))
+        node.actual_rows = float(actual.group("rows")) * node.loops
+        node.actual_time_ms = float(actual.group("time")) * node.loops
+    elif never_executed:
+        node.loops, node.actual_rows, node.actual_time_ms = 0, 0, 0.0
+    return node
+
+def parse_mysql_table(rows: list) -> PlanNode:
+    root = PlanNode("Query")
+    for row in rows:
+        access = row.get("type") or "none"
+        root.children.append(PlanNode(
+            f"{access} access",
+            detail=row.get("Extra"),
+            alias=row.get("table"),
+            index=row.get("key"),
+            estimated_rows=row.get("rows"),
+            full_scan=access == "ALL",
+        ))
+    return root
+
+# SQLite: EXPLAIN QUERY PLAN rows (id, parent, notused, detail)
+
+_SQLITE_ACCESS = re.compile(
+    r"^(?P<op>SCAN|SEARCH) (?:TABLE )?(?P<table>[^\s()]+)(?: AS (?P<alias>\S+))?"
+    r"(?: USING (?P<using>[A-Z ]*?INDEX(?: (?P<index>[^\s(]\S*))?|INTEGER PRIMARY KEY|PRIMARY KEY))?(?: \((?P<cond>[^()]*)\))?$"
+)
+
+def parse_sqlite(rows: list) -> PlanNode:
+    root = PlanNode("Query")
+    nodes = {0: root}
+    for node_id, parent, _, detail in rows:
+        node = PlanNode(detail, detail=detail)
+        access = _SQLITE_ACCESS.match(detail)
+        if access and access.group("table") not in ("CONSTANT", "SUBQUERY"):
+            using = access.group("using") or ""
+            node.operation = access.group("op")
+            node.alias = access.group("alias") or access.group("table")
+            node.index = access.group("index") or ("rowid" if "PRIMARY KEY" in using else None)
+            node.conditions = [access.group("cond")] if access.group("cond") else []
+            # An automatic index is built by reading the whole table, for every run of the query
+            node.full_scan = (node.operation == "SCAN" and not using) or "AUTOMATIC" in using
+            if "AUTOMATIC" in using:
+                node.index = "automatic"
+        nodes.get(parent, root).children.append(node)
+        nodes[node_id] = node
+    return root
+
+# Hotspots
+
+def mark_hotspots(root: PlanNode, limit: int) -> list:
+    """Flag (node.hot) and describe the `limit` costliest nodes, by actual time when analyzed, else by estimated cost"""
+    nodes = list(root.walk())
+    if any(node.actual_time_ms is not None for node in nodes[1:]):
+        metric, label = "self_time_ms", "time"
+    elif any(node.estimated_cost is not None for node in nodes):
+        metric, label = "self_cost", "estimated cost"
+    else:
+        return _mark_costly_steps(nodes, limit)
+
+    total = sum(getattr(node, metric) or 0.0 for node in nodes)
+    ranked = sorted((node for node in nodes if getattr(node, metric)), key=lambda node: getattr(node, metric), reverse=True)
+    hotspots = []
+    for node in ranked[:limit]:
+        node.hot = True
+        share = 100.0 * getattr(node, metric) / total if total else None
+        reason = f"{share:.0f}% of the plan's {label}" if share is not None else f"highest {label}"
+        if node.full_scan:
+            reason += "; full table scan"
+        hotspots.append({
+            "node_id": node.id,
+            "operation": node.operation,
+            "table": node.table or node.alias,
+            metric: _round(getattr(node, metric)),
+            "share_pct": round(share, 1) if share is not None else None,
+            "reason": reason,
+        })
+    return hotspots
+
+def _mark_costly_steps(nodes: list, limit: int) -> list:
+    """Hotspots for plans without costs: full scans, automatic indexes and temporary B-trees, in plan order"""
+    hotspots = []
+    for node in nodes:
+        if node.index == "automatic":
+            reason = "automatic index built on every run"
+        elif node.full_scan:
+            reason = "full table scan"
+        elif (node.detail or "").startswith("USE TEMP B-TREE") or "temporary" in (node.detail or "").lower():
+            reason = "sorts or groups in a temporary table"
+        else:
+            continue
+        node.hot = True
+        hotspots.append({
+            "node_id": node.id,
+            "operation": node.operation,
+            "table": node.table or node.alias,
+            "reason": reason,
+        })
+        if len(hotspots) >= limit:
+            break
+    return hotspots
+
+# Index recommendations
+
+_SQL_STRINGS = re.compile(r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'", re.DOTALL)
+_QUOTES = re.compile(r"[\"`\[\]]")
+_CASTS = re.compile(r"::[a-z_]+(?: varying| precision| (?:with|without) time zone)?(?:\[\])?")
+_COMPARISON = re.compile(
+    r"(?P<left>[\w.$?]+)\s*(?P<op><>|!=|<=|>=|=|<|>|\bnot\s+in\b|\bin\b|\bnot\s+i?like\b|\bi?like\b|\bbetween\b|\bis\b)"
+    r"\s*(?P<right>[\w.$?]+)?"
+)
+_EQUALITY_OPS = {"=", "in", "is"}
+_RANGE_OPS = {"<", ">", "<=", ">=", "between", "like", "ilike"}
+_NOT_COLUMNS = {
+    "null", "true", "false", "not", "and", "or", "any", "all", "some", "array", "exists", "select",
+    "current_date", "current_time", "current_timestamp", "now",
+}
+_FROM_ITEMS = re.compile(
+    r"\b(?P<keyword>from|join)\s+(?P<items>.*?)(?=\b(?:where|on|using|join|inner|left|right|full|cross|natural"
+    r"|group|order|limit|having|union|intersect|except|window|offset|fetch)\b|[();]|$)",
+    re.DOTALL,
+)
+_PREDICATE_CLAUSES = re.compile(
+    r"\b(where|on|having|group\s+by|order\s+by|limit|offset|fetch|union|intersect|except|window|returning"
+    r"|join|inner|left|right|full|cross|natural|using)\b"
+)
+
+def _clean(text: str) -> str:
+    """Lower-cased, with string literals as ? and quotes, casts and parentheses removed"""
+    text = _SQL_STRINGS.sub(" ? ", text.lower())
+    text = _CASTS.sub("", _QUOTES.sub("", text))
+    return re.sub(r"[(),]", " ", text)
+
+def _operand(text: str):
+    """(qualifier, column) for a column reference; None for literals, parameters and keywords"""
+    if not text or text in _NOT_COLUMNS or text[0] in "?$" or text[0].isdigit():
+        return None
+    qualifier, _, column = text.rpartition(".")
+    return qualifier.rsplit(".", 1)[-1] or None, column
+
+def predicates(condition: str) -> list:
+    """((qualifier, column), kind) for each column compared in a condition; kind is eq, range or join"""
+    found = []
+    for match in _COMPARISON.finditer(_clean(condition)):
+        op = " ".join(match.group("op").split())
+        left, right = _operand(match.group("left")), _operand(match.group("right"))
+        if left and right:
+            if op == "=":
+                found += [(left, "join"), (right, "join")]
+        elif left or right:
+            if op in _EQUALITY_OPS:
+                found.append((left or right, "eq"))
+            elif op in _RANGE_OPS:
+                found.append((left or right, "range"))
+    return found
+
+def table_aliases(sql: str) -> dict:
+    """Lower-cased alias (or table name) -> table name for each table in the FROM and JOIN clauses"""
+    aliases = {}
+    for match in _FROM_ITEMS.finditer(_SQL_STRINGS.sub(" ", _QUOTES.sub("", sql.lower()))):
+        items = match.group("items").split(",") if match.group("keyword") == "from" else [match.group("items")]
+        for item in items:
+            words = item.split()
+            if not words:
+                continue
+            table = words[0].rsplit(".", 1)[-1]
+            aliases[words[-1]] = table
+            aliases.setdefault(table, table)
+    return aliases
+
+def sql_conditions(sql: str) -> list:
+    """The WHERE and ON clause texts of a statement, subqueries' included"""
+    parts = _PREDICATE_CLAUSES.split(_SQL_STRINGS.sub(" ? ", sql.lower()))
+    return [text for keyword, text in zip(parts[1::2], parts[2::2]) if keyword in ("where", "on")]
+
+def column_names(schema_dict: dict) -> dict:
+    """Table -> column names, from get_db_schema's {table: ["name (TYPE)", ...]}"""
+    return {table: [entry.rsplit(" (", 1)[0] for entry in entries] for table, entries in schema_dict.items()}
+
+class _Resolver:
+    """Maps plan nodes and column references to schema tables"""
+
+    def __init__(self, root: PlanNode, sql: str, columns: dict):
+        self.aliases = table_aliases(sql)
+        self.tables = {table.lower(): table for table in columns}
+        self.columns = {table: {column.lower(): column for column in names} for table, names in columns.items()}
+        in_query = {self.tables.get(name) for name in self.aliases.values()}
+        in_query.update(self.table(node) for node in root.walk())
+        in_query.discard(None)
+        self.owners = {}
+        for table in in_query:
+            for column in self.columns[table]:
+                self.owners.setdefault(column, set()).add(table)
+
+    def table(self, node: PlanNode):
+        if node.table:
+            return self.tables.get(node.table.lower())
+        if not node.alias:
+            return None
+        alias = _QUOTES.sub("", node.alias.lower())
+        return self.tables.get(self.aliases.get(alias, alias))
+
+    def qualifiers(self, node: PlanNode, table: str) -> set:
+        return {name for name in (table.lower(), (node.alias or "").lower()) if name}
+
+def scanned_tables(root: PlanNode, sql: str, columns: dict) -> list:
+    """Schema tables the plan reads in full: the ones whose keys and indexes recommend_indexes needs"""
+    resolver = _Resolver(root, sql, columns)
+    tables = {resolver.table(node) for node in root.walk() if node.full_scan}
+    return sorted(table for table in tables if table)
+
+def recommend_indexes(root: PlanNode, sql: str, columns: dict, keys: dict, dialect: str) -> list:
+    """Candidate indexes for the plan's full table scans
+
+    `columns` is column_names() of the schema; `keys` is db_utils.get_table_keys() of scanned_tables().
+    """
+    resolver = _Resolver(root, sql, columns)
+    nodes = list(root.walk())
+    # (predicates, the scan node whose table unqualified columns belong to, or None)
+    sources = [(predicates(condition), node if resolver.table(node) else None) for node in nodes for condition in node.conditions]
+    sources += [(predicates(condition), None) for condition in sql_conditions(sql)]
+
+    recommendations = {}
+    for node in nodes:
+        table = resolver.table(node) if node.full_scan else None
+        if table is None or table not in keys:
+            continue
+        filters, joins = _scan_columns(node, table, resolver, sources)
+        table_keys = keys[table]
+        leading = {
+            index_columns[0].lower()
+            for index_columns in table_keys["indexes"] + [table_keys["primary_key"]]
+            if index_columns and index_columns[0]
+        }
+        foreign_keys = {fk_columns[0].lower() for fk_columns in table_keys["foreign_keys"]}
+
+        candidate = [column for column, kind in filters.items() if kind == "eq"]
+        candidate += [column for column, kind in filters.items() if kind == "range"][:1]
+        candidate = candidate[:3]
+        if candidate and candidate[0] not in leading:
+            names = ", ".join(resolver.columns[table][column] for column in candidate)
+            _add(recommendations, node, table, candidate, resolver, dialect, f"{node.operation} on {table} filters on {names}")
+            leading.add(candidate[0])
+        for column in joins:
+            if column in leading or (candidate and column not in foreign_keys):
+                continue
+            name = resolver.columns[table][column]
+            reason = f"{node.operation} on {table} joins on {name}"
+            if column in foreign_keys:
+                reason += ", a foreign key without an index"
+            _add(recommendations, node, table, [column], resolver, dialect, reason)
+            leading.add(column)
+    return list(recommendations.values())
+
+def _scan_columns(node: PlanNode, table: str, resolver: _Resolver, sources: list) -> tuple:
+    """({column: eq|range} filtered on, [columns joined on]) for a scanned table, lower-cased"""
+    qualifiers = resolver.qualifiers(node, table)
+    table_columns = resolver.columns[table]
+    filters, joins = {}, []
+    for found, owner in sources:
+        for (qualifier, column), kind in found:
+            if column not in table_columns:
+                continue
+            if qualifier is not None:
+                if qualifier not in qualifiers:
+                    continue
+            elif owner is not None:
+                if resolver.table(owner) != table:
+                    continue
+            elif len(resolver.owners.get(column, ())) > 1:
+                continue  # Ambiguous without a qualifier
+            if kind == "join":
+                if column not in joins:
+                    joins.append(column)
+            elif filters.get(column) != "eq":
+                filters[column] = kind
+    return filters, joins
+
+def _add(recommendations: dict, node: PlanNode, table: str, candidate: list, resolver: _Resolver, dialect: str, reason: str):
+    key = (table, tuple(candidate))
+    if key in recommendations:
+        recommendations[key]["node_ids"].append(node.id)
+        return
+    names = [resolver.columns[table][column] for column in candidate]
+    index_name = f"ix_{table}_{'_'.join(names)}".lower()[:63]
+    concurrently = " CONCURRENTLY" if dialect == "postgres" else ""  # Postgres can build it without blocking writes
+    recommendations[key] = {
+        "table": table,
+        "columns": names,
+        "statement": (
+            f"CREATE INDEX{concurrently} {_quote(index_name, dialect)} ON {_quote(table, dialect)} "
+            f"({', '.join(_quote(name, dialect) for name in names)})"
+        ),
+        "reason": reason,
+        "node_ids": [node.id],
+    }
+
+def _quote(name: str, dialect: str) -> str:
+    if re.fullmatch(r"[a-z_][a-z0-9_]*", name):
+        return name
+    quote = "`" if dialect == "mysql" else '"'
+    return f"{quote}{name}{quote}"
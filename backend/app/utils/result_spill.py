@@ -0,0 +1,173 @@
+# app/utils/result_spill.py
+#
+# Columnar spill files for large query results:
+#
+#   magic "SQLRES01"
+#   row groups, each holding per column: (rows + 1) little-endian uint32 offsets, then
+#                                         the column's cells as JSON, back to back
+#   footer (JSON)   columns, total rows, per group [first row, row count, [column offsets]], meta
+#   footer length (uint64) + magic
+#
+# Files are written once and memory-mapped for reading: a page decodes only the row groups
+# it touches, and aggregations read only the columns they use, so memory stays bounded
+# by the page, not the result.
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from app.utils import serialization
+
+try:
+    import orjson
+except ImportError:  # optional; see app.utils.serialization
+    orjson = None
+
+MAGIC = b"SQLRES01"
+TRAILER = struct.Struct("<Q8s")
+FORMAT_VERSION = 1
+
+class SpillError(ValueError):
+    """A spill file is truncated, unfinished or not a spill file"""
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(bytes(data))
+
+def _offsets_array(values) -> array.array:
+    offsets = array.array("I", values)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets
+
+class SpillWriter:
+    """Writes row groups to a temp file; close() adds the footer and moves it into place"""
+
+    def __init__(self, path: str, columns: list, meta: dict = None):
+        self.path = path
+        self.columns = list(columns)
+        self.meta = meta or {}
+        self.row_count = 0
+        self._groups = []
+        self._tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(MAGIC)
+
+    def write_rows(self, rows: list):
+        if not rows:
+            return
+        column_offsets = []
+        for index in range(len(self.columns)):
+            cells = [serialization.dumps(row[index]) for row in rows]
+            offsets = [0]
+            for cell in cells:
+                offsets.append(offsets[-1] + len(cell))
+            column_offsets.append(self._file.tell())
+            self._file.write(_offsets_array(offsets).tobytes())
+            self._file.write(b"".join(cells))
+        self._groups.append([self.row_count, len(rows), column_offsets])
+        self.row_count += len(rows)
+
+    def close(self) -> str:
+        footer = json.dumps({
+            "version": FORMAT_VERSION, "columns": self.columns, "rows": self.row_count,
+            "groups": self._groups, "meta": self.meta,
+        }, separators=(",", ":")).encode("utf-8")
+        self._file.write(footer)
+        self._file.write(TRAILER.pack(len(footer), MAGIC))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+class SpillFile:
+    """A memory-mapped spill file; use as a context manager"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SpillError("Empty spill file")
+        try:
+            if len(self._map) < len(MAGIC) + TRAILER.size or self._map[:len(MAGIC)] != MAGIC:
+                raise SpillError("Not a spill file")
+            footer_len, magic = TRAILER.unpack_from(self._map, len(self._map) - TRAILER.size)
+            if magic != MAGIC:
+                raise SpillError("Spill file has no footer")
+            footer_start = len(self._map) - TRAILER.size - footer_len
+            footer = json.loads(self._map[footer_start:footer_start + footer_len])
+        except BaseException:
+            self._map.close()
+            raise
+        if footer.get("version") != FORMAT_VERSION:
+            self._map.close()
+            raise SpillError("Spill file from another format version")
+        self.columns = footer["columns"]
+        self.row_count = footer["rows"]
+        self.meta = footer["meta"]
+        self._groups = footer["groups"]
+        self._group_starts = [group[0] for group in self._groups]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def _column_cells(self, group: list, index: int, start: int, stop: int):
+        """Raw JSON bytes of rows [start, stop) (relative to the group) of one column"""
+        rows = group[1]
+        base = group[2][index]
+        offsets = memoryview(self._map)[base:base + 4 * (rows + 1)].cast("I")
+        data = base + 4 * (rows + 1)
+        cells = [self._map[data + offsets[i]:data + offsets[i + 1]] for i in range(start, stop)]
+        offsets.release()
+        return cells
+
+    def _slices(self, offset: int, limit: int):
+        """(group, start, stop) pieces covering rows [offset, offset + limit)"""
+        end = min(offset + limit, self.row_count)
+        position = bisect.bisect_right(self._group_starts, offset) - 1
+        while offset < end and 0 <= position < len(self._groups):
+            group = self._groups[position]
+            start = offset - group[0]
+            stop = min(group[1], end - group[0])
+            yield group, start, stop
+            offset = group[0] + stop
+            position += 1
+
+    def encoded_rows(self, offset: int = 0, limit: int = None):
+        """Each row as a JSON array (bytes), without decoding the cells"""
+        limit = self.row_count if limit is None else limit
+        for group, start, stop in self._slices(offset, limit):
+            columns = [self._column_cells(group, index, start, stop) for index in range(len(self.columns))]
+            for cells in zip(*columns):
+                yield b"[" + b",".join(cells) + b"]"
+
+    def rows(self, offset: int = 0, limit: int = None) -> list:
+        return [loads(row) for row in self.encoded_rows(offset, limit)]
+
+    def iter_rows(self, batch_rows: int = 5000):
+        """All rows, decoded a batch at a time"""
+        for offset in range(0, self.row_count, batch_rows):
+            yield from self.rows(offset, batch_rows)
+
+    def column(self, name: str):
+        """Decoded values of one column, reading only that column's sections"""
+        index = self.columns.index(name)
+        for group in self._groups:
+            for cell in self._column_cells(group, index, 0, group[1]):
+                yield loads(cell)
@@ -0,0 +1,142 @@
+# app/utils/schema_snapshot.py
+#
+# On-disk schema snapshots, one file per connection fingerprint:
+#
+#   header   <8s H H d 16s H Q I Q I>  magic, format version, codec, created_at, fingerprint,
+#                                      catalog version length, schema text length + crc32,
+#                                      schema dict length + crc32
+#   catalog version (utf-8)
+#   schema text (utf-8)      -- what the prompt builders need
+#   schema dict (codec)      -- msgpack when installed, JSON otherwise
+#
+# Files are memory-mapped; each section is decoded and CRC-checked only on first access.
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from app.utils.logger import get_logger
+
+try:
+    import msgpack
+except ImportError:  # optional; JSON is only slightly larger for schema dicts
+    msgpack = None
+
+log = get_logger("sql")
+
+MAGIC = b"SQLSNAP1"
+FORMAT_VERSION = 1
+CODEC_JSON, CODEC_MSGPACK = 0, 1
+HEADER = struct.Struct("<8sHHd16sHQIQI")
+
+class SnapshotError(ValueError):
+    """A snapshot file is missing, truncated, from another format version or corrupt"""
+
+def _encode(value, codec: int) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+def _decode(data, codec: int):
+    if codec == CODEC_MSGPACK:
+        if msgpack is None:
+            raise SnapshotError("Snapshot was written with msgpack, which is not installed")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(bytes(data))
+
+class SchemaSnapshot:
+    """A memory-mapped snapshot; schema_str and schema_dict are decoded lazily"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError("Empty snapshot file")
+
+        if len(self._map) < HEADER.size:
+            raise SnapshotError("Truncated snapshot header")
+        (magic, version, self.codec, self.created_at, fingerprint, version_len,
+         self._str_len, self._str_crc, self._dict_len, self._dict_crc) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError("Not a schema snapshot (or from another format version)")
+        if HEADER.size + version_len + self._str_len + self._dict_len != len(self._map):
+            raise SnapshotError("Snapshot size does not match its header")
+
+        self.fingerprint = fingerprint.rstrip(b"\0").decode("ascii")
+        offset = HEADER.size
+        self.catalog_version = self._map[offset:offset + version_len].decode("utf-8")
+        self._str_offset = offset + version_len
+        self._dict_offset = self._str_offset + self._str_len
+        self._schema_str = None
+        self._schema_dict = None
+
+    def _section(self, offset: int, length: int, crc: int) -> memoryview:
+        data = memoryview(self._map)[offset:offset + length]
+        if zlib.crc32(data) != crc:
+            raise SnapshotError(f"Checksum mismatch in {self.path}")
+        return data
+
+    @property
+    def schema_str(self) -> str:
+        if self._schema_str is None:
+            self._schema_str = str(self._section(self._str_offset, self._str_len, self._str_crc), "utf-8")
+        return self._schema_str
+
+    @property
+    def schema_dict(self) -> dict:
+        if self._schema_dict is None:
+            self._schema_dict = _decode(self._section(self._dict_offset, self._dict_len, self._dict_crc), self.codec)
+        return self._schema_dict
+
+    def close(self):
+        self._map.close()
+
+def snapshot_path(directory: str, fingerprint: str) -> str:
+    return os.path.join(directory, f"{fingerprint}.snap")
+
+def write_snapshot(directory: str, fingerprint: str, catalog_version: str, schema_str: str, schema_dict: dict) -> str:
+    """Atomically write a snapshot (temp file + rename), so concurrent readers never see a partial file"""
+    os.makedirs(directory, exist_ok=True)
+    codec = CODEC_MSGPACK if msgpack is not None else CODEC_JSON
+    version_bytes = catalog_version.encode("utf-8")
+    str_bytes = schema_str.encode("utf-8")
+    dict_bytes = _encode(schema_dict, codec)
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, codec, time.time(), fingerprint.encode("ascii")[:16], len(version_bytes),
+        len(str_bytes), zlib.crc32(str_bytes), len(dict_bytes), zlib.crc32(dict_bytes),
+    )
+
+    path = snapshot_path(directory, fingerprint)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{fingerprint}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header + version_bytes + str_bytes + dict_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return path
+
+def read_snapshot(directory: str, fingerprint: str):
+    """The snapshot for a fingerprint, or None if there is no usable one"""
+    path = snapshot_path(directory, fingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = SchemaSnapshot(path)
+    except (OSError, SnapshotError) as e:
+        log.warning(f"Ignoring unreadable schema snapshot {path}: {str(e)}")
+        return None
+    if snapshot.fingerprint != fingerprint[:16]:
+        snapshot.close()
+        return None
+    return snapshot
@@ -0,0 +1,100 @@
+# app/utils/serialization.py
+#
+# Fast path for large query results: rows go straight from the DBAPI to JSON bytes
+# (orjson when installed) without per-row pydantic validation or jsonable_encoder,
+# and big bodies are compressed with zstd or gzip depending on Accept-Encoding.
+import base64
+import decimal
+import gzip
+import json
+import zlib
+from fastapi.responses import Response, StreamingResponse
+from pydantic_core import to_jsonable_python
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder gives the same output, only slower
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+def encode_value(value):
+    """JSON form of values orjson/json don't handle natively, as the pydantic path renders them"""
+    if isinstance(value, decimal.Decimal):
+        return str(value)  # exact, like pydantic; floats would lose digits of NUMERIC columns
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            return base64.b64encode(value).decode("ascii")
+    # datetime, UUID, timedelta, sets... as pydantic serializes them
+    return to_jsonable_python(value)
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=encode_value)
+    return json.dumps(content, default=encode_value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codings the client accepts (q=0 excluded)"""
+    codings = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            codings.add(coding)
+    return codings
+
+def choose_encoding(accept_encoding: str):
+    """zstd if the client takes it and zstandard is installed, else gzip if accepted, else None"""
+    codings = accepted_encodings(accept_encoding)
+    if zstandard is not None and "zstd" in codings:
+        return "zstd"
+    if "gzip" in codings:
+        return "gzip"
+    return None
+
+def compress(body: bytes, accept_encoding: str) -> tuple:
+    """(body, content-encoding or None); bodies under RESPONSE_COMPRESS_MIN_BYTES are left alone"""
+    if len(body) < settings.RESPONSE_COMPRESS_MIN_BYTES:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.RESPONSE_ZSTD_LEVEL).compress(body), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL), encoding
+    return body, None
+
+def compress_stream(chunks, encoding: str):
+    """Compress an iterable of byte chunks incrementally"""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=settings.RESPONSE_ZSTD_LEVEL).compressobj()
+    else:
+        compressor = zlib.compressobj(settings.RESPONSE_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def json_response(content, accept_encoding: str = "", status_code: int = 200) -> Response:
+    """A JSON response serialized in one pass, compressed when large enough"""
+    body, encoding = compress(dumps(content), accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+def streaming_response(chunks, accept_encoding: str = "", media_type: str = "application/json",
+                       headers: dict = None) -> StreamingResponse:
+    """A response streamed from byte chunks (e.g. a spilled result), always compressed if the client allows"""
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        chunks = compress_stream(chunks, encoding)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
@@ -0,0 +1,104 @@
+# app/utils/tracing.py
+import contextvars
+import json
+import time
+from contextlib import contextmanager
+from starlette.responses import Response
+
+# Innermost open span of the current request; None outside a traced request
+current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """A timed section of a request; stage spans also feed the Server-Timing header"""
+
+    __slots__ = ("name", "attrs", "timing", "start", "end", "children")
+
+    def __init__(self, name: str, timing: bool = False, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.timing = timing
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def to_dict(self, origin: float = None) -> dict:
+        origin = self.start if origin is None else origin
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round(self.duration_ms, 2),
+        }
+        if self.attrs:
+            node["attrs"] = self.attrs
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+@contextmanager
+def span(name: str, timing: bool = False, **attrs):
+    """Open a child span of the current span; a no-op outside a traced request"""
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, timing=timing, **attrs)
+    parent.children.append(child)
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        child.finish()
+        current_span.reset(token)
+
+def start_trace(name: str = "request"):
+    """Start a root span for a request; returns (root, token) for end_trace"""
+    root = Span(name)
+    return root, current_span.set(root)
+
+def end_trace(root: Span, token):
+    root.finish()
+    current_span.reset(token)
+
+def server_timing(root: Span) -> str:
+    """Build a Server-Timing header value, summing stage spans that share a name"""
+    totals = {}
+    stack = list(root.children)
+    while stack:
+        node = stack.pop(0)
+        if node.timing:
+            totals[node.name] = totals.get(node.name, 0.0) + node.duration_ms
+        stack.extend(node.children)
+
+    entries = [f"{name};dur={duration:.1f}" for name, duration in totals.items()]
+    entries.append(f"total;dur={root.duration_ms:.1f}")
+    return ", ".join(entries)
+
+async def attach_trace(response: Response, root: Span) -> Response:
+    """Return a copy of a JSON object response with the span tree added under "_trace" """
+    if not response.headers.get("content-type", "").startswith("application/json") or "content-encoding" in response.headers:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return Response(body, status_code=response.status_code, headers=headers)
+
+    if isinstance(payload, dict):
+        payload["_trace"] = root.to_dict()
+        body = json.dumps(payload, default=str).encode()
+    return Response(body, status_code=response.status_code, headers=headers)
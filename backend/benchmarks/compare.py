@@ -0,0 +1,37 @@
+# benchmarks/compare.py
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+def compare(old: dict, new: dict) -> list:
+    """Return rows of (endpoint, metric, old, new, change %) for two benchmark reports"""
+    rows = []
+    sections = [("overall", old.get("overall", {}), new.get("overall", {}))]
+    for endpoint in sorted(set(old.get("endpoints", {})) | set(new.get("endpoints", {}))):
+        sections.append((endpoint, old["endpoints"].get(endpoint, {}), new["endpoints"].get(endpoint, {})))
+
+    for name, before, after in sections:
+        for metric in METRICS:
+            a, b = before.get(metric), after.get(metric)
+            change = round((b - a) / a * 100, 1) if a and b is not None else None
+            rows.append((name, metric, a, b, change))
+    return rows
+
+def main(argv):
+    if len(argv) != 2:
+        print("usage: python -m benchmarks.compare OLD.json NEW.json")
+        return 2
+    with open(argv[0]) as f:
+        old = json.load(f)
+    with open(argv[1]) as f:
+        new = json.load(f)
+
+    print(f"{'endpoint':<26} {'metric':<15} {'old':>10} {'new':>10} {'change':>8}")
+    for name, metric, a, b, change in compare(old, new):
+        change_str = f"{change:+.1f}%" if change is not None else "-"
+        print(f"{name:<26} {metric:<15} {str(a):>10} {str(b):>10} {change_str:>8}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
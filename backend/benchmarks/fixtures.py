@@ -0,0 +1,59 @@
+# benchmarks/fixtures.py
+import os
+import random
+import sqlite3
+
+STATUSES = ["active", "inactive", "pending", "archived"]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+# name -> (table count, rows per table, extra text columns)
+PROFILES = {
+    "small": (5, 100, 1),
+    "medium": (25, 2000, 3),
+    "large": (100, 5000, 6),
+}
+
+def table_name(index: int) -> str:
+    return f"{WORDS[index % len(WORDS)]}_{index}"
+
+def make_database(path: str, tables: int, rows: int, text_columns: int = 2, seed: int = 0) -> str:
+    """Create a SQLite database with a chain of FK-linked tables; reuses the file if present"""
+    if os.path.exists(path):
+        return path
+
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        for t in range(tables):
+            name = table_name(t)
+            columns = ["id INTEGER PRIMARY KEY", "status TEXT", "amount REAL", "created_at TEXT"]
+            columns += [f"note_{c} TEXT" for c in range(text_columns)]
+            if t > 0:
+                parent = table_name(t - 1)
+                columns.append(f"{parent}_id INTEGER REFERENCES {parent}(id)")
+            conn.execute(f"CREATE TABLE {name} ({', '.join(columns)})")
+
+            placeholders = ", ".join("?" * (4 + text_columns + (1 if t > 0 else 0)))
+            batch = []
+            for i in range(1, rows + 1):
+                row = [i, rng.choice(STATUSES), round(rng.uniform(1, 1000), 2), f"2025-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"]
+                row += [" ".join(rng.choices(WORDS, k=4)) for _ in range(text_columns)]
+                if t > 0:
+                    row.append(rng.randint(1, rows))
+                batch.append(row)
+            conn.executemany(f"INSERT INTO {name} VALUES ({placeholders})", batch)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+def make_profiles(directory: str, names=None) -> dict:
+    """Create (or reuse) one database per profile; returns {profile: db_connection dict}"""
+    connections = {}
+    for name in names or PROFILES:
+        tables, rows, text_columns = PROFILES[name]
+        path = os.path.join(directory, f"bench_{name}_{tables}x{rows}.db")
+        make_database(path, tables, rows, text_columns)
+        connections[name] = {"db_type": "sqlite", "db_name": path}
+    return connections
@@ -0,0 +1,70 @@
+# benchmarks/importtime.py
+#
+# Cold-start import budget: imports app.main in a fresh interpreter under -X importtime
+# and fails if it is over budget or if a module that should load lazily was imported.
+#
+#   cd backend
+#   python -m benchmarks.importtime --budget-ms 800 --runs 3
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Provider SDKs and database drivers load on first use (app.utils.lazy), never at import
+LAZY_MODULES = ("boto3", "botocore", "cryptography", "httpx", "sqlalchemy")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def parse_importtime(stderr: str) -> list:
+    """(module, self µs, cumulative µs, depth) for each line of -X importtime output"""
+    modules = []
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return modules
+
+def measure(target: str) -> list:
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time budget for the SQL Assistant API")
+    parser.add_argument("--target", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=800.0, help="Fail if the best run's total exceeds this")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to run; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    args = parser.parse_args(argv)
+
+    best = None
+    for _ in range(max(args.runs, 1)):
+        modules = measure(args.target)
+        total = next(cumulative for name, _, cumulative, _ in modules if name == args.target)
+        if best is None or total < best[0]:
+            best = (total, modules)
+    total, modules = best
+
+    print(f"import {args.target}: {total / 1000:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    direct = sorted((m for m in modules if m[3] == 1), key=lambda m: m[2], reverse=True)
+    for name, _, cumulative, _ in direct[:args.top]:
+        print(f"  {name:<40} {cumulative / 1000:>8.1f}ms")
+
+    failures = []
+    if total / 1000 > args.budget_ms:
+        failures.append(f"over budget by {total / 1000 - args.budget_ms:.1f}ms")
+    eager = sorted({name.split(".")[0] for name, _, _, _ in modules} & set(LAZY_MODULES))
+    if eager:
+        failures.append(f"imported at startup but should be lazy: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,204 @@
+# benchmarks/run.py
+#
+# Offline load test: boots the FastAPI app in-process, points it at a local
+# Ollama-compatible stub and generated SQLite databases, and writes a JSON report.
+#
+#   cd backend
+#   python -m benchmarks.run --requests 500 --concurrency 16 --output bench.json
+#   python -m benchmarks.compare old.json new.json
+#   python -m benchmarks.importtime --budget-ms 800
+#   python -m benchmarks.serialization --rows 200000
+#
+# --llm record captures the stub's completions into a cassette; --llm replay then
+# serves them through the app's "replay" provider with no LLM server at all.
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Keep the app quiet unless asked otherwise; must be set before app.config is imported
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+from benchmarks.fixtures import PROFILES, make_profiles, table_name
+from benchmarks.stub_llm import StubConfig, StubServer
+
+DEFAULT_MIX = "generate_sql=4,execute_sql=4,get_db_schema=1,recommend_visualization=1"
+
+def parse_mix(spec: str) -> list:
+    """Parse 'endpoint=weight,...' into [(endpoint, weight)]"""
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples: list, wall_time: float) -> dict:
+    """Build per-endpoint and overall latency/throughput stats from (endpoint, ms, ok) samples"""
+    def stats(latencies: list, errors: int) -> dict:
+        ordered = sorted(latencies)
+        return {
+            "requests": len(ordered),
+            "errors": errors,
+            "throughput_rps": round(len(ordered) / wall_time, 2) if wall_time else 0.0,
+            "mean_ms": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+            "p50_ms": round(percentile(ordered, 50), 2),
+            "p95_ms": round(percentile(ordered, 95), 2),
+            "p99_ms": round(percentile(ordered, 99), 2),
+            "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        }
+
+    endpoints = {}
+    for endpoint in sorted({s[0] for s in samples}):
+        subset = [s for s in samples if s[0] == endpoint]
+        endpoints[endpoint] = stats([s[1] for s in subset], sum(1 for s in subset if not s[2]))
+    return {
+        "overall": stats([s[1] for s in samples], sum(1 for s in samples if not s[2])),
+        "endpoints": endpoints,
+    }
+
+def build_request(endpoint: str, db: dict, llm_config: dict, rng: random.Random, table: str) -> tuple:
+    """Return (path, json body) for one request of the given endpoint"""
+    if endpoint == "generate_sql":
+        return "/generate_sql", {
+            "user_prompt": f"Show the active rows in {table}",
+            "db_connection": db,
+            "llm_config": llm_config,
+        }
+    if endpoint == "execute_sql":
+        limit = rng.choice([10, 100, 1000])
+        return "/execute_sql", {"sql": f"SELECT * FROM {table} LIMIT {limit}", "db_connection": db}
+    if endpoint == "get_db_schema":
+        return "/get_db_schema", db
+    if endpoint == "recommend_visualization":
+        rows = [[status, rng.randint(1, 100)] for status in ("active", "inactive", "pending")]
+        return "/recommend_visualization", {
+            "question": "count by status", "columns": ["status", "count"], "rows": rows, "llm_config": llm_config,
+        }
+    raise ValueError(f"Unknown endpoint in mix: {endpoint}")
+
+async def drive(app, connections: dict, llm_config: dict, mix: list, total: int, concurrency: int,
+                duration: float, seed: int) -> tuple:
+    """Closed-loop load: `concurrency` workers issue requests until `total` or `duration` is reached"""
+    rng = random.Random(seed)
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    profiles = list(connections)
+    samples = []
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+        async def worker():
+            nonlocal issued
+            while (not total or issued < total) and (deadline is None or time.perf_counter() < deadline):
+                issued += 1
+                endpoint = rng.choices(names, weights)[0]
+                profile = rng.choice(profiles)
+                tables, _, _ = PROFILES[profile]
+                table = table_name(rng.randrange(tables))
+                path, body = build_request(endpoint, connections[profile], llm_config, rng, table)
+
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=body)
+                    payload = response.json()
+                    # /get_db_schema reports failures in the body with a 200
+                    ok = response.status_code < 400 and not (isinstance(payload, dict) and payload.get("success") is False)
+                except Exception:
+                    ok = False
+                samples.append((endpoint, (time.perf_counter() - start) * 1000, ok))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_time = time.perf_counter() - start
+
+    return samples, wall_time
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def main(argv=None) -> dict:
+    parser = argparse.ArgumentParser(description="Offline load test for the SQL Assistant API")
+    parser.add_argument("--requests", type=int, default=300, help="Total requests (0 = run for --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="Seconds to run (0 = run for --requests)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted endpoint mix, e.g. generate_sql=4,execute_sql=4")
+    parser.add_argument("--profiles", default="small,medium", help=f"Database profiles: {', '.join(PROFILES)}")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--llm-token-rate", type=float, default=200.0, help="Stub output tokens per second")
+    parser.add_argument("--llm", choices=("stub", "record", "replay"), default="stub", help="LLM backend for the run")
+    parser.add_argument("--cassette", default=os.path.join(tempfile.gettempdir(), "sql_assistant_bench", "llm.jsonl.gz"))
+    parser.add_argument("--fixtures-dir", default=os.path.join(tempfile.gettempdir(), "sql_assistant_bench"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench.json")
+    args = parser.parse_args(argv)
+
+    connections = make_profiles(args.fixtures_dir, [p.strip() for p in args.profiles.split(",") if p.strip()])
+    stub_config = StubConfig(args.llm_latency_ms, args.llm_jitter_ms, args.llm_token_rate, seed=args.seed)
+
+    # app.config reads these at import time
+    if args.llm != "stub":
+        os.environ["LLM_REPLAY_MODE"] = args.llm
+        os.environ["LLM_REPLAY_UPSTREAM"] = "ollama"
+        os.environ["LLM_CASSETTE_PATH"] = args.cassette
+
+    from app.main import app
+
+    def run(llm_config: dict):
+        return asyncio.run(drive(
+            app, connections, llm_config, parse_mix(args.mix),
+            args.requests, args.concurrency, args.duration, args.seed,
+        ))
+
+    if args.llm == "replay":
+        samples, wall_time = run({"provider": "replay", "model": "stub"})
+    else:
+        with StubServer(stub_config) as stub:
+            provider = "replay" if args.llm == "record" else "ollama"
+            samples, wall_time = run({"provider": provider, "model": "stub", "url": stub.url})
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "wall_time_s": round(wall_time, 3),
+        },
+        **summarize(samples, wall_time),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    overall = report["overall"]
+    print(f"{overall['requests']} requests in {wall_time:.2f}s ({overall['throughput_rps']} req/s), "
+          f"p50 {overall['p50_ms']}ms p95 {overall['p95_ms']}ms p99 {overall['p99_ms']}ms, "
+          f"{overall['errors']} errors -> {args.output}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"  {endpoint:<26} n={stats['requests']:<5} p50={stats['p50_ms']:<8} p95={stats['p95_ms']:<8} "
+              f"p99={stats['p99_ms']:<8} err={stats['errors']}")
+    return report
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+# benchmarks/serialization.py
+#
+# /execute_sql result encoding: pydantic validation + jsonable_encoder + JSONResponse
+# versus the fast path (app.utils.serialization), on synthetic rows with the value
+# types DBAPI drivers return (int, float, str, Decimal, datetime, date, UUID, bytes, None).
+#
+#   cd backend
+#   python -m benchmarks.serialization --rows 200000 --runs 3
+import argparse
+import datetime
+import decimal
+import os
+import random
+import sys
+import time
+import uuid
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.models.sql import ExecuteSQLResponse
+from app.utils import serialization
+
+COLUMNS = ["id", "amount", "price", "status", "created_at", "due_on", "ref", "payload", "note"]
+
+def make_result(rows: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    base = datetime.datetime(2024, 1, 1)
+    data = []
+    for i in range(rows):
+        data.append([
+            i,
+            rng.random() * 1000,
+            decimal.Decimal(rng.randint(0, 10 ** 6)) / 100,
+            rng.choice(["active", "inactive", "pending", "archived"]),
+            base + datetime.timedelta(seconds=rng.randint(0, 10 ** 7)),
+            (base + datetime.timedelta(days=rng.randint(0, 365))).date(),
+            uuid.UUID(int=rng.getrandbits(128)),
+            f"row-{i}".encode(),
+            None if i % 3 else "note",
+        ])
+    return {"columns": COLUMNS, "rows": data}
+
+def pydantic_path(result: dict, accept_encoding: str) -> bytes:
+    return JSONResponse(jsonable_encoder(ExecuteSQLResponse(**result))).body
+
+def fast_path(result: dict, accept_encoding: str) -> bytes:
+    return serialization.json_response(result, accept_encoding).body
+
+def best_of(runs: int, fn, *args) -> tuple:
+    best, output = None, None
+    for _ in range(max(runs, 1)):
+        start = time.perf_counter()
+        output = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare /execute_sql result serialization paths")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per path; the fastest counts")
+    args = parser.parse_args(argv)
+
+    result = make_result(args.rows)
+    print(f"{args.rows} rows x {len(COLUMNS)} columns "
+          f"(orjson {'yes' if serialization.orjson else 'no'}, zstandard {'yes' if serialization.zstandard else 'no'})")
+    print(f"{'path':<24} {'time ms':>10} {'bytes':>12}")
+
+    baseline, body = best_of(args.runs, pydantic_path, result, "")
+    print(f"{'pydantic + encoder':<24} {baseline * 1000:>10.1f} {len(body):>12}")
+    rows = [("fast", ""), ("fast + gzip", "gzip")]
+    if serialization.zstandard is not None:
+        rows.append(("fast + zstd", "zstd"))
+    for name, accept_encoding in rows:
+        elapsed, fast_body = best_of(args.runs, fast_path, result, accept_encoding)
+        print(f"{name:<24} {elapsed * 1000:>10.1f} {len(fast_body):>12}   {baseline / elapsed:.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
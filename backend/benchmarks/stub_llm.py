@@ -0,0 +1,123 @@
+# benchmarks/stub_llm.py
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+class StubConfig:
+    """Latency model for the stub: fixed latency + jitter, then tokens at a fixed rate"""
+
+    def __init__(self, latency_ms: float = 200.0, jitter_ms: float = 50.0, tokens_per_sec: float = 200.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.rng = random.Random(seed)
+
+    def delay_for(self, completion: str) -> float:
+        tokens = max(1, len(completion) // 4)
+        generation = tokens / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, (self.latency_ms + jitter) / 1000 + generation)
+
+def fake_completion(prompt: str) -> str:
+    """Produce a plausible completion for the prompt builders in app/utils/prompt_builder.py"""
+    if "recommend the best visualization" in prompt:
+        columns = re.search(r"Columns: \[(.*?)\]", prompt)
+        names = re.findall(r"'([^']+)'", columns.group(1)) if columns else []
+        x_axis = names[0] if names else "x"
+        y_axis = names[1] if len(names) > 1 else x_axis
+        return json.dumps({
+            "visualization": True, "chartType": "bar", "xAxis": x_axis, "yAxis": y_axis,
+            "title": f"{y_axis} by {x_axis}", "explanation": "stub",
+        })
+
+    tables = re.findall(r"^Table: (\w+)", prompt, re.MULTILINE)
+    if not tables:
+        return json.dumps({"query": "SELECT 1"})
+
+    # Prefer a table named in the request text, otherwise pick one deterministically
+    request_text = prompt.rsplit("request:", 1)[-1].lower()
+    mentioned = [t for t in tables if t.lower() in request_text]
+    table = mentioned[0] if mentioned else tables[len(prompt) % len(tables)]
+    return json.dumps({"query": f"SELECT * FROM {table} WHERE status = 'active' LIMIT 50"})
+
+def create_stub_app(config: StubConfig) -> FastAPI:
+    """Ollama-compatible /api/generate and /api/tags"""
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "stub"}]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        prompt = body.get("prompt", "")
+        completion = fake_completion(prompt)
+        delay = config.delay_for(completion)
+        prompt_tokens = len(prompt) // 4
+        output_tokens = max(1, len(completion) // 4)
+
+        if not body.get("stream", True):
+            await asyncio.sleep(delay)
+            return {
+                "model": body.get("model", "stub"), "response": completion, "done": True,
+                "prompt_eval_count": prompt_tokens, "eval_count": output_tokens,
+                "eval_duration": int(delay * 1e9), "total_duration": int(delay * 1e9),
+            }
+
+        async def stream():
+            pieces = [completion[i:i + 4] for i in range(0, len(completion), 4)]
+            per_piece = delay / max(1, len(pieces))
+            for piece in pieces:
+                await asyncio.sleep(per_piece)
+                yield json.dumps({"model": body.get("model", "stub"), "response": piece, "done": False}) + "\n"
+            yield json.dumps({
+                "model": body.get("model", "stub"), "response": "", "done": True,
+                "prompt_eval_count": prompt_tokens, "eval_count": output_tokens,
+                "eval_duration": int(delay * 1e9), "total_duration": int(delay * 1e9),
+            }) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class StubServer:
+    """Run the stub on a background thread; use as a context manager"""
+
+    def __init__(self, config: StubConfig = None, port: int = None):
+        self.config = config or StubConfig()
+        self.port = port or _free_port()
+        self.app = create_stub_app(self.config)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/generate"
+
+    def __enter__(self):
+        self._thread.start()
+        deadline = time.time() + 10
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("Stub LLM server did not start")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)